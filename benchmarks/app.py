@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""Application benchmarked: the Person / Computer api of examples/api.py on a SQLite database of configurable size"""
+
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship, backref
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import StaticPool
+from marshmallow_jsonapi.flask import Schema, Relationship
+from marshmallow_jsonapi import fields
+
+from flask_rest_jsonapi import Api, ResourceDetail, ResourceList, ResourceRelationship
+
+Base = declarative_base()
+
+COMPUTERS_PER_PERSON = 3
+
+
+class Person(Base):
+    __tablename__ = 'person'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    email = Column(String)
+    birth_date = Column(Date)
+    password = Column(String)
+
+
+class Computer(Base):
+    __tablename__ = 'computer'
+
+    id = Column(Integer, primary_key=True)
+    serial = Column(String)
+    person_id = Column(Integer, ForeignKey('person.id'), index=True)
+    person = relationship('Person', backref=backref('computers'))
+
+
+class PersonSchema(Schema):
+    class Meta:
+        type_ = 'person'
+        self_view = 'person_detail'
+        self_view_kwargs = {'id': '<id>'}
+        self_view_many = 'person_list'
+
+    id = fields.Integer(as_string=True, dump_only=True)
+    name = fields.Str(required=True)
+    email = fields.Email()
+    birth_date = fields.Date()
+    computers = Relationship(self_view='person_computers',
+                             self_view_kwargs={'id': '<id>'},
+                             related_view='computer_list',
+                             related_view_kwargs={'id': '<id>'},
+                             many=True,
+                             schema='ComputerSchema',
+                             type_='computer')
+
+
+class ComputerSchema(Schema):
+    class Meta:
+        type_ = 'computer'
+        self_view = 'computer_detail'
+        self_view_kwargs = {'id': '<id>'}
+
+    id = fields.Integer(as_string=True, dump_only=True)
+    serial = fields.Str(required=True)
+    owner = Relationship(attribute='person',
+                         self_view='computer_person',
+                         self_view_kwargs={'id': '<id>'},
+                         related_view='person_detail',
+                         related_view_kwargs={'id': '<id>'},
+                         schema='PersonSchema',
+                         type_='person')
+
+
+def create_app(size):
+    """Create the benchmarked application and its database
+
+    :param int size: the number of persons
+    :return tuple: the flask application and the sqlalchemy session
+    """
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+
+    populate(session, size, COMPUTERS_PER_PERSON)
+
+    class PersonList(ResourceList):
+        schema = PersonSchema
+        allow_bulk_create = True
+        data_layer = {'session': session,
+                      'model': Person}
+
+    class PersonDetail(ResourceDetail):
+        schema = PersonSchema
+        data_layer = {'session': session,
+                      'model': Person}
+
+    class PersonRelationship(ResourceRelationship):
+        schema = PersonSchema
+        data_layer = {'session': session,
+                      'model': Person}
+
+    class ComputerList(ResourceList):
+        schema = ComputerSchema
+        data_layer = {'session': session,
+                      'model': Computer}
+
+    class ComputerDetail(ResourceDetail):
+        schema = ComputerSchema
+        data_layer = {'session': session,
+                      'model': Computer}
+
+    class ComputerRelationship(ResourceRelationship):
+        schema = ComputerSchema
+        data_layer = {'session': session,
+                      'model': Computer}
+
+    app = Flask(__name__)
+    app.config['DEBUG'] = True
+
+    api = Api(app)
+    api.route(PersonList, 'person_list', '/persons')
+    api.route(PersonDetail, 'person_detail', '/persons/<int:id>')
+    api.route(PersonRelationship, 'person_computers', '/persons/<int:id>/relationships/computers')
+    api.route(ComputerList, 'computer_list', '/computers', '/persons/<int:id>/computers')
+    api.route(ComputerDetail, 'computer_detail', '/computers/<int:id>')
+    api.route(ComputerRelationship, 'computer_person', '/computers/<int:id>/relationships/owner')
+    api.operations()
+
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        session.remove()
+
+    return app, session
+
+
+def populate(session, size, computers_per_person):
+    """Fill the database with persons and their computers
+
+    :param Session session: a sqlalchemy session
+    :param int size: the number of persons
+    :param int computers_per_person: the number of computers of each person
+    """
+    persons = []
+    computers = []
+    for index in range(1, size + 1):
+        persons.append({'id': index,
+                        'name': 'person {}'.format(index),
+                        'email': 'person{}@example.com'.format(index),
+                        'birth_date': date(1950 + index % 50, 1 + index % 12, 1 + index % 28),
+                        'password': 'secret'})
+        for number in range(computers_per_person):
+            computers.append({'id': (index - 1) * computers_per_person + number + 1,
+                              'serial': 'serial {}-{}'.format(index, number),
+                              'person_id': index})
+
+    session.bulk_insert_mappings(Person, persons)
+    session.bulk_insert_mappings(Computer, computers)
+    session.commit()
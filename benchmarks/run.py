@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the request pipeline
+
+Each scenario sends the same request several times through the test client of the application of benchmarks/app.py
+and reports the median time of the whole request and of its phases: schema computation, querystring parsing, filter
+creation, sql queries, serialization, pagination links and encoding. Phases may overlap, for example sql queries
+lazy loading relationships during serialization. Allocations are measured with tracemalloc in separate runs so they
+don't slow down the timed runs.
+
+Usage::
+
+    python -m benchmarks.run --size 1000 --save baseline.json
+    python -m benchmarks.run --size 1000 --compare baseline.json
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from functools import wraps
+
+from flask import json as flask_json
+from marshmallow import Schema
+from sqlalchemy import event
+
+import flask_rest_jsonapi.resource
+import flask_rest_jsonapi.data_layers.alchemy
+from flask_rest_jsonapi.querystring import QueryStringManager
+
+from benchmarks.app import create_app, Person, Computer, COMPUTERS_PER_PERSON
+
+CONTENT_TYPE = 'application/vnd.api+json'
+ATOMIC_CONTENT_TYPE = 'application/vnd.api+json; ext="https://jsonapi.org/ext/atomic"'
+
+PHASES = ('request', 'compute_schema', 'querystring', 'create_filters', 'sql', 'dump', 'pagination_links', 'encode')
+
+
+class Timings(object):
+    """Accumulator of the time spent in each phase of a request"""
+
+    def __init__(self):
+        """Initialize timings"""
+        self.totals = defaultdict(float)
+        self.active = set()
+
+    def timed(self, phase, func):
+        """Wrap a function to add its duration to a phase
+
+        :param str phase: the name of the phase
+        :param callable func: the function
+        :return callable: the wrapped function
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # nested calls, like the dump of included objects, are part of the outermost call
+            if phase in self.active:
+                return func(*args, **kwargs)
+
+            self.active.add(phase)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.totals[phase] += time.perf_counter() - start
+                self.active.discard(phase)
+        return wrapper
+
+    def reset(self):
+        """Forget the timings of the previous request"""
+        self.totals.clear()
+
+
+def instrument(app, session, timings):
+    """Wrap the functions of each phase of the request pipeline
+
+    :param Flask app: the benchmarked application
+    :param Session session: the sqlalchemy session of the application
+    :param Timings timings: the accumulator of the timings
+    """
+    flask_rest_jsonapi.resource.compute_schema = timings.timed('compute_schema',
+                                                               flask_rest_jsonapi.resource.compute_schema)
+    flask_rest_jsonapi.resource.add_pagination_links = timings.timed('pagination_links',
+                                                                     flask_rest_jsonapi.resource.add_pagination_links)
+    flask_rest_jsonapi.data_layers.alchemy.create_filters = timings.timed('create_filters',
+                                                                          flask_rest_jsonapi.data_layers.alchemy
+                                                                          .create_filters)
+    QueryStringManager.parsed = property(timings.timed('querystring', QueryStringManager.parsed.fget))
+    Schema.dump = timings.timed('dump', Schema.dump)
+
+    encoder = app.extensions['flask-rest-jsonapi']['json_encoder']
+    encoder.encode = timings.timed('encode', encoder.encode)
+
+    engine = session.get_bind()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        timings.totals['sql'] += time.perf_counter() - conn.info['query_start'].pop()
+
+
+def scenarios(size):
+    """Compute the benchmarked requests
+
+    :param int size: the number of persons of the database
+    :return list: the name, method, url, payload and content type of each request and a cleanup function
+    """
+    middle = max(size // 2, 1)
+
+    complex_filter = json.dumps([{'or': [{'name': 'name', 'op': 'like', 'val': '%1%'},
+                                         {'and': [{'name': 'birth_date', 'op': 'gt', 'val': '1980-01-01'},
+                                                  {'name': 'computers', 'op': 'any',
+                                                   'val': {'name': 'serial', 'op': 'ilike', 'val': '%-2'}}]}]},
+                                 {'name': 'email', 'op': 'ilike', 'val': '%example%'}])
+
+    bulk = {'data': [{'type': 'person', 'attributes': {'name': 'bulk {}'.format(index),
+                                                       'email': 'bulk{}@example.com'.format(index)}}
+                     for index in range(50)]}
+
+    operations = {'atomic:operations': [
+        {'op': 'add', 'data': {'type': 'person', 'lid': 'p', 'attributes': {'name': 'atomic'}}},
+        {'op': 'add', 'data': {'type': 'computer', 'attributes': {'serial': 'atomic'},
+                               'relationships': {'owner': {'data': {'type': 'person', 'lid': 'p'}}}}},
+        {'op': 'update', 'data': {'type': 'person', 'lid': 'p', 'attributes': {'name': 'atomic updated'}}}
+    ]}
+
+    relationship = {'data': [{'type': 'computer', 'id': str(id_)}
+                             for id_ in range((middle - 1) * COMPUTERS_PER_PERSON + 1,
+                                              middle * COMPUTERS_PER_PERSON + 1)]}
+
+    def delete_created(session):
+        session.query(Computer).filter(Computer.id > size * COMPUTERS_PER_PERSON).delete(synchronize_session=False)
+        session.query(Person).filter(Person.id > size).delete(synchronize_session=False)
+        session.commit()
+
+    return [
+        ('list_page', 'GET', '/persons?page[size]=30&page[number]=2', None, CONTENT_TYPE, None),
+        ('list_sorted', 'GET', '/persons?sort=-birth_date,name&page[size]=30', None, CONTENT_TYPE, None),
+        ('list_include', 'GET', '/persons?include=computers&page[size]=30', None, CONTENT_TYPE, None),
+        ('list_deep_include', 'GET', '/persons?include=computers.owner.computers&page[size]=30', None, CONTENT_TYPE,
+         None),
+        ('list_complex_filters', 'GET', '/persons?page[size]=30&filter=' + complex_filter, None, CONTENT_TYPE, None),
+        ('list_sparse_fieldsets', 'GET', '/persons?include=computers&fields[person]=name,computers'
+                                         '&fields[computer]=serial&page[size]=30', None, CONTENT_TYPE, None),
+        ('list_large_page', 'GET', '/persons?page[size]=500', None, CONTENT_TYPE, None),
+        ('detail_include', 'GET', '/persons/{}?include=computers'.format(middle), None, CONTENT_TYPE, None),
+        ('relationship_get', 'GET', '/persons/{}/relationships/computers'.format(middle), None, CONTENT_TYPE, None),
+        ('relationship_patch', 'PATCH', '/persons/{}/relationships/computers'.format(middle), relationship,
+         CONTENT_TYPE, None),
+        ('bulk_create', 'POST', '/persons', bulk, CONTENT_TYPE, delete_created),
+        ('atomic_operations', 'POST', '/operations', operations, ATOMIC_CONTENT_TYPE, delete_created),
+    ]
+
+
+def run(size, repeat, allocations_repeat):
+    """Run every scenario
+
+    :param int size: the number of persons of the database
+    :param int repeat: the number of timed requests of each scenario
+    :param int allocations_repeat: the number of requests of each scenario measured with tracemalloc
+    :return dict: the results of each scenario
+    """
+    app, session = create_app(size)
+    timings = Timings()
+    instrument(app, session, timings)
+    client = app.test_client()
+
+    results = dict()
+    for name, method, url, payload, content_type, cleanup in scenarios(size):
+        def send():
+            data = flask_json.dumps(payload) if payload is not None else None
+            response = client.open(url, method=method, data=data, content_type=content_type,
+                                   headers={'Accept': CONTENT_TYPE})
+            if response.status_code >= 400:
+                raise Exception("{} failed with {}: {}".format(name, response.status_code, response.get_data()))
+
+        def clean():
+            if cleanup is not None:
+                cleanup(session)
+
+        # warm up caches
+        send()
+        clean()
+
+        samples = defaultdict(list)
+        for _ in range(repeat):
+            timings.reset()
+            start = time.perf_counter()
+            send()
+            timings.totals['request'] = time.perf_counter() - start
+            clean()
+            for phase in PHASES:
+                samples[phase].append(timings.totals.get(phase, 0.0) * 1000)
+
+        peaks = []
+        tracemalloc.start()
+        for _ in range(allocations_repeat):
+            tracemalloc.clear_traces()
+            send()
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            clean()
+        tracemalloc.stop()
+
+        results[name] = {phase: median(values) for (phase, values) in samples.items()}
+        results[name]['peak_kib'] = median(peaks) if peaks else 0.0
+
+    return results
+
+
+def median(values):
+    """Compute the median of values
+
+    :param list values: the values
+    :return float: the median
+    """
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def report(results, baseline=None, threshold=0.1):
+    """Print the results and their variation from a baseline
+
+    :param dict results: the results of each scenario
+    :param dict baseline: the results of a previous run
+    :param float threshold: the relative slowdown reported as a regression
+    :return list: the regressions
+    """
+    columns = PHASES + ('peak_kib',)
+    print('{:<24}'.format('scenario (ms, KiB)') + ''.join('{:>18}'.format(column) for column in columns))
+
+    regressions = []
+    for name, result in results.items():
+        cells = []
+        for column in columns:
+            cell = '{:.2f}'.format(result[column])
+            previous = (baseline or dict()).get(name, dict()).get(column)
+            if previous:
+                variation = (result[column] - previous) / previous
+                cell += ' {:+.0%}'.format(variation)
+                if column in ('request', 'peak_kib') and variation > threshold:
+                    regressions.append((name, column, previous, result[column]))
+            cells.append('{:>18}'.format(cell))
+        print('{:<24}'.format(name) + ''.join(cells))
+
+    for name, column, previous, current in regressions:
+        print("Regression of {} {}: {:.2f} -> {:.2f}".format(name, column, previous, current))
+
+    return regressions
+
+
+def main(argv=None):
+    """Run the benchmark from the command line
+
+    :param list argv: the command line arguments
+    :return int: the exit status, 1 if a regression was found
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size', type=int, default=1000, help="number of persons of the database")
+    parser.add_argument('--repeat', type=int, default=30, help="number of timed requests of each scenario")
+    parser.add_argument('--allocations-repeat', type=int, default=3,
+                        help="number of requests of each scenario measured with tracemalloc")
+    parser.add_argument('--save', help="save the results as a baseline in this file")
+    parser.add_argument('--compare', help="compare the results with the baseline saved in this file")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative slowdown of a request or increase of its peak memory reported as a regression")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = run(args.size, args.repeat, args.allocations_repeat)
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
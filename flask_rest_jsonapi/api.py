@@ -8,23 +8,37 @@ import inspect
 from functools import wraps
 
 from flask_rest_jsonapi.resource import ResourceList, ResourceRelationship
+from flask_rest_jsonapi.schema import schema_cache
+from flask_rest_jsonapi.data_layers.filtering.alchemy import filter_cache
+from flask_rest_jsonapi.encoders import get_default_encoder
+from flask_rest_jsonapi.operations import Operations
 
 
 class Api(object):
     """The main class of the Api"""
 
-    def __init__(self, app=None, blueprint=None, decorators=None):
+    def __init__(self, app=None, blueprint=None, decorators=None, json_encoder=None, metrics_callback=None,
+                 cache_backend=None):
         """Initialize an instance of the Api
 
         :param app: the flask application
         :param blueprint: a flask blueprint
         :param tuple decorators: a tuple of decorators plugged to each resource methods
+        :param JSONEncoder json_encoder: the encoder used to serialize responses, the fastest available by default
+        :param callable metrics_callback: a function called after each request with the endpoint, the method, the
+                                          status code and the durations of the phases of the request
+        :param cache_backend: the backend of the cache of the responses of resource managers with a cache_ttl
         """
         self.app = app
         self.blueprint = blueprint
         self.resources = []
         self.resource_registry = []
+        self.operations_routes = []
+        self.method_decorators = []
         self.decorators = decorators or tuple()
+        self.json_encoder = json_encoder or get_default_encoder()
+        self.metrics_callback = metrics_callback
+        self.cache_backend = cache_backend
 
         if app is not None:
             self.init_app(app, blueprint)
@@ -46,10 +60,26 @@ class Api(object):
                        *resource['urls'],
                        url_rule_options=resource['url_rule_options'])
 
+        for url, view in self.operations_routes:
+            self.operations(url, view)
+
         if self.blueprint is not None:
             self.app.register_blueprint(self.blueprint)
 
         self.app.config.setdefault('PAGE_SIZE', 30)
+        self.app.config.setdefault('SCHEMA_CACHE_SIZE', schema_cache.maxsize)
+        schema_cache.maxsize = self.app.config['SCHEMA_CACHE_SIZE']
+        self.app.config.setdefault('FILTER_CACHE_SIZE', filter_cache.maxsize)
+        filter_cache.maxsize = self.app.config['FILTER_CACHE_SIZE']
+
+        self.app.config.setdefault('SERVER_TIMING', False)
+        self.app.config.setdefault('QUERY_COUNTER', False)
+        self.app.config.setdefault('N_PLUS_ONE_THRESHOLD', 5)
+
+        extension = self.app.extensions.setdefault('flask-rest-jsonapi', dict())
+        extension['json_encoder'] = self.json_encoder
+        extension['metrics_callback'] = self.metrics_callback
+        extension['cache_backend'] = self.cache_backend
 
     def route(self, resource, view, *urls, **kwargs):
         """Create an api view.
@@ -84,18 +114,35 @@ class Api(object):
 
         self.resource_registry.append(resource)
 
+    def operations(self, url='/operations', view='operations'):
+        """Create the endpoint of the Atomic Operations extension. Operations are processed by the data layers of the
+        registered resource managers in a single transaction.
+
+        :param str url: the url of the endpoint
+        :param str view: the view name
+        """
+        view_func = Operations.as_view(view, api=self)
+        for decorator in self.decorators:
+            view_func = decorator(view_func)
+
+        if self.blueprint is not None:
+            self.blueprint.add_url_rule(url, view_func=view_func)
+        elif self.app is not None:
+            self.app.add_url_rule(url, view_func=view_func)
+        else:
+            self.operations_routes.append((url, view))
+
     def oauth_manager(self, oauth_manager):
         """Use the oauth manager to enable oauth for API
 
         :param oauth_manager: the oauth manager
         """
-        for resource in self.resource_registry:
-            if getattr(resource, 'disable_oauth', None) is not True:
-                for method in getattr(resource, 'methods', ('GET', 'POST', 'PATCH', 'DELETE')):
-                    scope = self.get_scope(resource, method)
-                    setattr(resource,
-                            method.lower(),
-                            oauth_manager.require_oauth(scope)(getattr(resource, method.lower())))
+        def decorator(resource, method, view):
+            if getattr(resource, 'disable_oauth', None) is True:
+                return view
+            return oauth_manager.require_oauth(self.get_scope(resource, method))(view)
+
+        self.add_method_decorator(decorator)
 
     def scope_setter(self, func):
         """Plug oauth scope setter function to the API
@@ -133,12 +180,40 @@ class Api(object):
         """
         self.check_permissions = permission_manager
 
+        def decorator(resource, method, view):
+            if getattr(resource, 'disable_permission', None) is True:
+                return view
+            return self.has_permission()(view)
+
+        self.add_method_decorator(decorator)
+
+    def add_method_decorator(self, decorator):
+        """Plug a decorator to the methods of the registered resource managers. The decorator is kept to be plugged
+        to the operations processed by the methods of the resource managers.
+
+        :param callable decorator: a function called with the resource manager, the http method and the method of the
+                                   resource manager returning the decorated method
+        """
+        self.method_decorators.append(decorator)
+
         for resource in self.resource_registry:
-            if getattr(resource, 'disable_permission', None) is not True:
-                for method in getattr(resource, 'methods', ('GET', 'POST', 'PATCH', 'DELETE')):
-                    setattr(resource,
-                            method.lower(),
-                            self.has_permission()(getattr(resource, method.lower())))
+            for method in getattr(resource, 'methods', ('GET', 'POST', 'PATCH', 'DELETE')):
+                setattr(resource,
+                        method.lower(),
+                        decorator(resource, method, getattr(resource, method.lower())))
+
+    def decorate_method(self, resource, method, view):
+        """Plug the decorators of the methods of the resource managers to a function
+
+        :param Resource resource: the resource manager
+        :param str method: an http method
+        :param callable view: the function processing the method
+        :return callable: the decorated function
+        """
+        for decorator in self.method_decorators:
+            view = decorator(resource, method, view)
+
+        return view
 
     def has_permission(self, *args, **kwargs):
         """Decorator used to check permissions before to call resource manager method"""
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+"""Response cache of GET requests. Entries are keyed by the view, its kwargs, the managed querystring and the
+generations of the resource types of the document. The data layers increment the generation of their type each time
+they commit a write so the entries of the type are never read again and expire.
+"""
+
+import json
+import threading
+import hashlib
+from collections import OrderedDict
+from timeit import default_timer
+
+from flask import current_app, has_app_context
+from marshmallow.base import SchemaABC
+from marshmallow_jsonapi.fields import Relationship
+
+from flask_rest_jsonapi.schema import get_related_schema_cls
+
+# pseudo resource type every cached response depends on, invalidated by writes of resources with an unknown type
+ALL_TYPES = '*'
+
+
+class MemoryCacheBackend(object):
+    """In-process LRU cache backend with a time to live, shared by the threads of a worker"""
+
+    def __init__(self, maxsize=1024):
+        """Initialize a memory cache backend
+
+        :param int maxsize: the maximum number of responses kept
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._generations = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retrieve a cached response
+
+        :param str key: the key of the response
+        :return dict: the response or None if it is not cached or expired
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= default_timer():
+                return None
+            self._entries[key] = entry
+
+        return value
+
+    def set(self, key, value, ttl):
+        """Store a response and evict the least recently used ones
+
+        :param str key: the key of the response
+        :param dict value: the response
+        :param int ttl: the time to live of the response in seconds
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (default_timer() + ttl, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_generations(self, types):
+        """Retrieve the generations of resource types
+
+        :param list types: the resource types
+        :return list: the generation of each type
+        """
+        return [self._generations.get(type_, 0) for type_ in types]
+
+    def incr_generation(self, type_):
+        """Increment the generation of a resource type
+
+        :param str type_: the resource type
+        """
+        with self._lock:
+            self._generations[type_] = self._generations.get(type_, 0) + 1
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCacheBackend(object):
+    """Cache backend shared by the workers of a deployment through a redis client (redis-py or compatible)"""
+
+    def __init__(self, client, prefix='flask_rest_jsonapi:'):
+        """Initialize a redis cache backend
+
+        :param client: the redis client
+        :param str prefix: the prefix of the redis keys
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        """Retrieve a cached response
+
+        :param str key: the key of the response
+        :return dict: the response or None if it is not cached or expired
+        """
+        value = self.client.get(self.prefix + key)
+
+        return json.loads(value.decode('utf-8') if isinstance(value, bytes) else value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        """Store a response, redis evicts it after its time to live
+
+        :param str key: the key of the response
+        :param dict value: the response
+        :param int ttl: the time to live of the response in seconds
+        """
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl))
+
+    def get_generations(self, types):
+        """Retrieve the generations of resource types
+
+        :param list types: the resource types
+        :return list: the generation of each type
+        """
+        return [int(generation or 0) for generation in
+                self.client.mget([self.prefix + 'generation:' + type_ for type_ in types])]
+
+    def incr_generation(self, type_):
+        """Increment the generation of a resource type
+
+        :param str type_: the resource type
+        """
+        self.client.incr(self.prefix + 'generation:' + type_)
+
+
+def get_cache_backend():
+    """Return the cache backend of the Api of the current application
+
+    :return: the cache backend or None if responses are not cached
+    """
+    if has_app_context():
+        return current_app.extensions.get('flask-rest-jsonapi', dict()).get('cache_backend')
+
+
+def get_cache_types(schema, include):
+    """Compute the resource types a document depends on: the type of the schema, the types of its relationships and
+    the types of the included documents
+
+    :param Schema schema: the schema of the resource
+    :param list include: the include paths of the querystring
+    :return list: the sorted resource types or None if an include path is not a path of relationships
+    """
+    types = {schema.opts.type_}
+    types.update(field.type_ for field in schema._declared_fields.values() if isinstance(field, Relationship))
+
+    for path in include:
+        related_schema = schema
+        for field in path.split('.'):
+            if not isinstance(related_schema._declared_fields.get(field), Relationship):
+                return None
+            related_schema = get_related_schema_cls(related_schema, field)
+            types.add(related_schema.opts.type_)
+            types.update(related_field.type_ for related_field in related_schema._declared_fields.values()
+                         if isinstance(related_field, Relationship))
+
+    return sorted(types)
+
+
+def make_cache_key(view, view_kwargs, querystring, vary, types, generations):
+    """Compute the key of a cached response
+
+    :param str view: the endpoint of the view
+    :param dict view_kwargs: kwargs from the resource view
+    :param dict querystring: the managed querystring parameters
+    :param str vary: the request header values the response depends on
+    :param list types: the resource types of the document
+    :param list generations: the generation of each type
+    :return str: the key
+    """
+    key = repr((view, sorted(view_kwargs.items()), sorted(querystring.items()), vary,
+                list(zip(types, generations))))
+
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def invalidate(type_):
+    """Invalidate the cached responses depending on a resource type
+
+    :param str type_: the resource type
+    """
+    backend = get_cache_backend()
+    if backend is not None and type_ is not None:
+        backend.incr_generation(type_)
+
+
+def invalidate_resource(resource):
+    """Invalidate the cached responses depending on the resource type of a resource manager. The type of a schema
+    chosen by the get_schema method of the resource manager is unknown so every cached response is invalidated.
+
+    :param Resource resource: the resource manager
+    """
+    schema = getattr(resource, 'schema', None)
+    if schema is None:
+        return
+
+    if isinstance(schema, type) and issubclass(schema, SchemaABC):
+        invalidate(schema.opts.type_)
+    else:
+        invalidate(ALL_TYPES)
@@ -2,19 +2,52 @@
 
 """This module is a CRUD interface between resource managers and the sqlalchemy ORM"""
 
-from sqlalchemy.orm.exc import NoResultFound
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import chain, count
+
+from sqlalchemy.orm.exc import NoResultFound, UnmappedColumnError
+from sqlalchemy.exc import CompileError, DBAPIError
 from sqlalchemy.orm.collections import InstrumentedList
 from sqlalchemy.inspection import inspect
-from sqlalchemy.orm import joinedload
-from marshmallow import class_registry
-from marshmallow.base import SchemaABC
-
-from flask import current_app
+from sqlalchemy.orm import joinedload, selectinload, subqueryload, raiseload, load_only, ColumnProperty,\
+    RelationshipProperty, make_transient_to_detached, with_parent
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.interfaces import MANYTOONE
+from sqlalchemy import and_, or_, false, tuple_, literal, func, text, Integer, Numeric,\
+    __version__ as sqlalchemy_version
+
+from flask import current_app, request, g, has_request_context, after_this_request
 from flask_rest_jsonapi.data_layers.base import BaseDataLayer
 from flask_rest_jsonapi.exceptions import RelationNotFound, RelatedObjectNotFound, JsonApiException,\
-    InvalidSort, ObjectNotFound, InvalidInclude
+    InvalidSort, ObjectNotFound, InvalidInclude, BadRequest, InvalidGroup
 from flask_rest_jsonapi.data_layers.filtering.alchemy import create_filters
-from flask_rest_jsonapi.schema import get_model_field, get_related_schema, get_relationships, get_schema_field
+from flask_rest_jsonapi.pagination import encode_cursor, decode_cursor, UnknownCount
+from flask_rest_jsonapi.timing import timed
+from flask_rest_jsonapi.cache import invalidate_resource
+from flask_rest_jsonapi.schema import get_model_field, get_related_schema_cls, get_relationships, get_schema_field
+
+# key of the session info flag set while operations are processed in a single transaction
+ATOMIC_OPERATIONS = 'flask_rest_jsonapi.atomic_operations'
+
+# cookie holding the time of the last write of a client, its reads are sent to the writer session for a while
+READ_YOUR_WRITES_COOKIE = 'jsonapi_last_write'
+
+# request methods served by the reader sessions
+READ_METHODS = ('GET', 'HEAD')
+
+# count policies of collections from the cheapest to the most expensive
+COUNT_POLICIES = ('none', 'estimated', 'exact')
+
+# session.execute takes bind_arguments instead of bind since sqlalchemy 1.4
+SQLALCHEMY_VERSION = tuple(int(part) for part in sqlalchemy_version.split('.')[:2])
+
+LOADER_STRATEGIES = {'joined': joinedload,
+                     'selectin': selectinload,
+                     'subquery': subqueryload,
+                     'raise': raiseload}
 
 
 class SqlalchemyDataLayer(BaseDataLayer):
@@ -33,6 +66,92 @@ class SqlalchemyDataLayer(BaseDataLayer):
         if not hasattr(self, 'model'):
             raise Exception("You must provide a model in data_layer_kwargs to use sqlalchemy data layer in {}"
                             .format(self.resource.__name__))
+        if getattr(self, 'reader_selection', 'round_robin') not in ('round_robin', 'least_loaded'):
+            raise Exception("reader_selection must be round_robin or least_loaded in data_layer_kwargs of {}"
+                            .format(self.resource.__name__))
+
+        self._reader_counter = count()
+
+    @property
+    def session(self):
+        """Return the session of the current request: a reader session for GET and HEAD requests if reader sessions
+        are provided, the writer session for other requests
+
+        :return Session: the session
+        """
+        writer_session = self._session
+
+        if not getattr(self, 'reader_sessions', None) or not has_request_context() \
+                or request.method not in READ_METHODS or self.reads_pinned():
+            return writer_session
+
+        readers = getattr(g, '_flask_rest_jsonapi_readers', None)
+        if readers is None:
+            readers = g._flask_rest_jsonapi_readers = dict()
+        if id(self) not in readers:
+            readers[id(self)] = self.select_reader_session()
+
+        return readers[id(self)]
+
+    @session.setter
+    def session(self, session):
+        """Set the writer session
+
+        :param Session session: the session
+        """
+        self._session = session
+
+    def select_reader_session(self):
+        """Select the reader session of a request, the same session is used for every query of the request
+
+        :return Session: the reader session
+        """
+        if getattr(self, 'reader_selection', 'round_robin') == 'least_loaded':
+            return min(self.reader_sessions, key=self.get_session_load)
+
+        return self.reader_sessions[next(self._reader_counter) % len(self.reader_sessions)]
+
+    @staticmethod
+    def get_session_load(session):
+        """Compute the load of a session: the number of connections checked out of the pool of its engine
+
+        :param Session session: a session
+        :return int: the load of the session
+        """
+        checkedout = getattr(session.get_bind().pool, 'checkedout', None)
+
+        return checkedout() if checkedout is not None else 0
+
+    def reads_pinned(self):
+        """Check if the reads of the client must be sent to the writer session because it wrote recently
+
+        :return bool: True if reads must use the writer session
+        """
+        window = getattr(self, 'read_your_writes', None)
+        if not window:
+            return False
+
+        try:
+            last_write = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, ''))
+        except ValueError:
+            return False
+
+        return 0 <= time.time() - last_write < window
+
+    def pin_reads(self):
+        """Send the next reads of the client to the writer session if read_your_writes is enabled"""
+        if not getattr(self, 'read_your_writes', None) or not has_request_context() \
+                or getattr(g, '_flask_rest_jsonapi_wrote', False) is True:
+            return
+
+        g._flask_rest_jsonapi_wrote = True
+        last_write = time.time()
+        max_age = int(self.read_your_writes) + 1
+
+        @after_this_request
+        def set_cookie(response):
+            response.set_cookie(READ_YOUR_WRITES_COOKIE, '{:.3f}'.format(last_write), max_age=max_age, httponly=True)
+            return response
 
     def create_object(self, data, view_kwargs):
         """Create an object through sqlalchemy
@@ -50,7 +169,7 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         self.session.add(obj)
         try:
-            self.session.commit()
+            self.commit()
         except Exception as e:
             self.session.rollback()
             raise JsonApiException("Object creation error: " + str(e), source={'pointer': '/data'})
@@ -59,6 +178,33 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         return obj
 
+    def create_objects(self, data, view_kwargs):
+        """Create several objects through sqlalchemy in one transaction
+
+        :param list data: the data of each object validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return list: objects from sqlalchemy
+        """
+        for item in data:
+            self.before_create_object(item, view_kwargs)
+
+        relationship_fields = get_relationships(self.resource.schema, model_field=True)
+        objects = [self.model(**{key: value for (key, value) in item.items() if key not in relationship_fields})
+                   for item in data]
+        self.apply_relationships_many(list(zip(data, objects)))
+
+        self.session.add_all(objects)
+        try:
+            self.commit()
+        except Exception as e:
+            self.session.rollback()
+            raise JsonApiException("Object creation error: " + str(e), source={'pointer': '/data'})
+
+        for item, obj in zip(data, objects):
+            self.after_create_object(obj, item, view_kwargs)
+
+        return objects
+
     def get_object(self, view_kwargs, qs=None):
         """Retrieve an object through sqlalchemy
 
@@ -80,9 +226,11 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         if qs is not None:
             query = self.eagerload_includes(query, qs)
+            query = self.load_only_fields_query(query, qs)
 
         try:
-            obj = query.one()
+            with timed('query'):
+                obj = query.one()
         except NoResultFound:
             obj = None
 
@@ -95,7 +243,7 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         :param QueryStringManager qs: a querystring manager to retrieve information from url
         :param dict view_kwargs: kwargs from the resource view
-        :return tuple: the number of object and the list of objects
+        :return tuple: the number of object (an UnknownCount unless counted exactly) and the list of objects
         """
         self.before_get_collection(qs, view_kwargs)
 
@@ -104,22 +252,178 @@ class SqlalchemyDataLayer(BaseDataLayer):
         if qs.filters:
             query = self.filter_query(query, qs.filters, self.model)
 
+        if qs.search:
+            query, rank = self.search_query(query, qs.search)
+
         if qs.sorting:
             query = self.sort_query(query, qs.sorting)
+        elif qs.search and 'after' not in qs.pagination and 'before' not in qs.pagination:
+            query = query.order_by(rank)
+
+        query = self.load_only_fields_query(query, qs)
 
-        object_count = query.count()
+        count_policy = getattr(self, 'count_policy', 'exact')
+        if COUNT_POLICIES.index(qs.pagination.get('count', count_policy)) < COUNT_POLICIES.index(count_policy):
+            # a client can only ask for a cheaper count than the policy of the data layer
+            count_policy = qs.pagination['count']
+
+        with timed('count'), self.search_errors(qs):
+            if count_policy == 'exact':
+                object_count = query.count()
+            elif count_policy == 'estimated':
+                object_count = UnknownCount(False, self.estimate_count(query))
+            else:
+                object_count = UnknownCount(False)
 
         if getattr(self, 'eagerload_includes', True):
             query = self.eagerload_includes(query, qs)
 
-        query = self.paginate_query(query, qs.pagination)
+        query = self.paginate_query(query, qs.pagination, qs.sorting)
 
-        collection = query.all()
+        if isinstance(object_count, UnknownCount) and int(qs.pagination.get('size', 1)) != 0:
+            # fetch one more object than the page size to know if objects follow the page
+            page_size = int(qs.pagination.get('size', 0)) or current_app.config['PAGE_SIZE']
+            with timed('query'), self.search_errors(qs):
+                collection = query.limit(page_size + 1).all()
+            object_count.has_next = len(collection) > page_size
+            collection = collection[:page_size]
+        else:
+            with timed('query'), self.search_errors(qs):
+                collection = query.all()
+
+        if 'before' in qs.pagination:
+            collection.reverse()
 
         collection = self.after_get_collection(collection, qs, view_kwargs)
 
         return object_count, collection
 
+    def get_grouped_collection(self, qs, view_kwargs):
+        """Retrieve the number of objects and aggregates of each group of a collection with a GROUP BY query. Groups
+        are sorted by the group fields of the sort parameter then by the other group fields, and paginated if a page
+        size or number is requested.
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return list: a dict by group with the values of the group fields, the number of objects and the aggregates
+        """
+        query = self.query(view_kwargs)
+
+        if qs.filters:
+            query = self.filter_query(query, qs.filters, self.model)
+
+        if qs.search:
+            query = self.search_query(query, qs.search)[0]
+
+        group_columns = [self.get_group_column(field, 'group') for field in qs.grouping]
+        aggregates = []
+        for aggregate, fields in sorted(qs.aggregates.items()):
+            for field in fields:
+                column = self.get_group_column(field, 'aggregate[{}]'.format(aggregate))
+                aggregates.append((aggregate, field, getattr(func, aggregate)(column)))
+
+        order_by = []
+        for sort_opt in qs.sorting:
+            if sort_opt['field'] not in qs.grouping:
+                raise InvalidSort("You can only sort groups by the group fields", source={'parameter': 'sort'})
+            order_by.append(getattr(group_columns[qs.grouping.index(sort_opt['field'])], sort_opt['order'])())
+        sort_fields = [sort_opt['field'] for sort_opt in qs.sorting]
+        order_by += [column for (field, column) in zip(qs.grouping, group_columns) if field not in sort_fields]
+
+        query = query.order_by(None)\
+                     .with_entities(*(group_columns + [func.count()] + [column for (_, _, column) in aggregates]))\
+                     .group_by(*group_columns)\
+                     .order_by(*order_by)
+
+        if 'after' in qs.pagination or 'before' in qs.pagination:
+            raise BadRequest("Cursor pagination is not available on groups", source={'parameter': 'page'})
+        if 'size' in qs.pagination or 'number' in qs.pagination:
+            query = self.paginate_query(query, qs.pagination)
+
+        with self.search_errors(qs):
+            rows = query.all()
+
+        groups = []
+        for row in rows:
+            group = {'group': dict(zip(qs.grouping, row[:len(group_columns)])), 'count': row[len(group_columns)]}
+            for (aggregate, field, _), value in zip(aggregates, row[len(group_columns) + 1:]):
+                group.setdefault(aggregate, dict())[field] = float(value) if isinstance(value, Decimal) else value
+            groups.append(group)
+
+        return groups
+
+    def get_group_column(self, field, parameter):
+        """Get the column of a schema field to group or aggregate on
+
+        :param str field: the name of the schema field
+        :param str parameter: the querystring parameter the field comes from
+        :return InstrumentedAttribute: the column
+        """
+        try:
+            model_field = get_model_field(self.resource.schema, field)
+        except Exception as e:
+            raise InvalidGroup(str(e), source={'parameter': parameter})
+
+        if not isinstance(inspect(self.model).attrs.get(model_field), ColumnProperty):
+            raise InvalidGroup("{} is not a column of {}".format(field, self.model.__name__),
+                               source={'parameter': parameter})
+
+        return getattr(self.model, model_field)
+
+    def get_object_version(self, view_kwargs):
+        """Retrieve the value of the version field of an object
+
+        :param dict view_kwargs: kwargs from the resource view
+        :return: the version of the object or None if the object doesn't exist
+        """
+        id_field = getattr(self, 'id_field', inspect(self.model).primary_key[0].key)
+        url_field = getattr(self, 'url_field', 'id')
+
+        query = self.retrieve_object_query(view_kwargs, getattr(self.model, id_field), view_kwargs[url_field])
+
+        return query.with_entities(getattr(self.model, self.version_field)).scalar()
+
+    def get_collection_version(self, qs, view_kwargs):
+        """Retrieve the number of objects, the greatest value and the sum of the version field of a filtered
+        collection. The sum changes when any object is updated if the version field is a counter, the greatest value
+        if it is an update date, the sum of a column which isn't a number is not computed.
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return tuple: the number of objects, the greatest version and the sum of the versions
+        """
+        query = self.query(view_kwargs)
+
+        if qs.filters:
+            query = self.filter_query(query, qs.filters, self.model)
+
+        if qs.search:
+            query = self.search_query(query, qs.search)[0]
+
+        version_column = getattr(self.model, self.version_field)
+        if isinstance(version_column.type, (Integer, Numeric)):
+            version_sum = func.sum(version_column)
+        else:
+            version_sum = literal(None)
+
+        with self.search_errors(qs):
+            return tuple(query.order_by(None)
+                              .with_entities(func.count(), func.max(version_column), version_sum)
+                              .one())
+
+    def estimate_count(self, query):
+        """Estimate the number of objects of a query with the count_estimator of the data layer. Without estimator
+        the objects are not counted, counting them exactly is what the estimated count policy avoids.
+
+        :param Query query: sqlalchemy queryset
+        :return int: the estimated number of objects or None if the data layer has no count_estimator
+        """
+        count_estimator = getattr(self, 'count_estimator', None)
+        if count_estimator is not None:
+            return count_estimator(query)
+
+        return None
+
     def update_object(self, obj, data, view_kwargs):
         """Update an object through sqlalchemy
 
@@ -144,13 +448,340 @@ class SqlalchemyDataLayer(BaseDataLayer):
         self.apply_relationships(data, obj)
 
         try:
-            self.session.commit()
+            self.commit()
         except Exception as e:
             self.session.rollback()
             raise JsonApiException("Update object error: " + str(e), source={'pointer': '/data'})
 
         self.after_update_object(obj, data, view_kwargs)
 
+    def update_object_attributes(self, data, view_kwargs, qs=None):
+        """Update the columns of an object with a single UPDATE statement without loading it first. The updated row is
+        returned by an UPDATE ... RETURNING statement if the database supports it, else it is retrieved afterwards with
+        the includes of the querystring.
+
+        The fast path is only taken if the fast_update parameter of the data layer is True, data only holds columns and
+        neither the update hooks nor retrieve_object_query are rewritten.
+
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :return DeclarativeMeta: the updated object or None if the fast path can't be taken
+        """
+        if not self.can_update_attributes(data):
+            return None
+
+        mapper = inspect(self.model)
+        id_field = getattr(self, 'id_field', mapper.primary_key[0].key)
+        url_field = getattr(self, 'url_field', 'id')
+        filter_column = mapper.columns[mapper.get_property(id_field).columns[0].key]
+        values = {mapper.get_property(key).columns[0]: value for (key, value) in data.items()}
+
+        statement = mapper.local_table.update().where(filter_column == view_kwargs[url_field]).values(values)
+        returning = self.supports_update_returning() and not (qs is not None and qs.include)
+
+        try:
+            with timed('query'):
+                try:
+                    if returning:
+                        result = self.session.execute(statement.returning(*mapper.local_table.columns))
+                    else:
+                        result = self.session.execute(statement)
+                except CompileError:
+                    # the statement compiler of the dialect doesn't support UPDATE ... RETURNING
+                    returning = False
+                    result = self.session.execute(statement)
+                row = result.first() if returning else None
+            updated = row is not None if returning else result.rowcount > 0
+            if updated:
+                self.commit()
+        except Exception as e:
+            self.session.rollback()
+            raise JsonApiException("Update object error: " + str(e), source={'pointer': '/data'})
+
+        if not updated:
+            self.session.rollback()
+            raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, view_kwargs[url_field]),
+                                 source={'parameter': url_field})
+
+        if not returning:
+            return self.get_object(view_kwargs, qs=qs)
+
+        obj = mapper.class_manager.new_instance()
+        for column in mapper.local_table.columns:
+            set_committed_value(obj, mapper.get_property_by_column(column).key, row[column])
+        make_transient_to_detached(obj)
+
+        return self.session.merge(obj, load=False)
+
+    def supports_update_returning(self):
+        """Check if the database of the session supports UPDATE ... RETURNING statements. implicit_returning only tells
+        if INSERT statements can use RETURNING so update_returning (sqlalchemy 2.x) or full_returning (sqlalchemy 1.4)
+        is checked.
+
+        :return bool: True if the updated rows can be returned by the UPDATE statement
+        """
+        dialect = self.session.get_bind().dialect
+        return bool(getattr(dialect, 'update_returning', getattr(dialect, 'full_returning', False)))
+
+    def can_update_attributes(self, data):
+        """Check if an update can be made by update_object_attributes
+
+        :param dict data: the data validated by marshmallow
+        :return bool: True if the fast path can be taken
+        """
+        if getattr(self, 'fast_update', False) is not True or not data:
+            return False
+
+        return self.can_update_directly(data, hooks=('before_update_object', 'after_update_object',
+                                                     'retrieve_object_query'))
+
+    def can_update_directly(self, keys, hooks=('before_update_object', 'after_update_object')):
+        """Check if objects can be updated by an UPDATE statement without loading them: the keys are columns of the
+        table of the model and neither the hooks, the validators, the mapper events nor a version counter need the
+        instances
+
+        :param iterable keys: the model fields to update
+        :param tuple hooks: the methods of the data layer that need the instances if they are rewritten
+        :return bool: True if objects can be updated directly
+        """
+        if any(self.is_rewritten(method) for method in hooks):
+            return False
+
+        mapper = inspect(self.model)
+        if mapper.version_id_col is not None or mapper.dispatch.before_update or mapper.dispatch.after_update:
+            return False
+
+        for key in keys:
+            prop = mapper.attrs.get(key)
+            if not isinstance(prop, ColumnProperty) or len(prop.columns) != 1 \
+                    or prop.columns[0].table is not mapper.local_table or key in mapper.validators:
+                return False
+
+        return True
+
+    def update_objects(self, ids, data, view_kwargs):
+        """Update several objects in one transaction. If can_update_directly allows it, the objects are updated with
+        one UPDATE statement per chunk of objects changing the same fields, else they are retrieved with one query per
+        chunk and updated like update_object.
+
+        :param list ids: the identifier of each object
+        :param list data: the data of each object validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return int: the number of updated objects
+        """
+        mapper = inspect(self.model)
+        id_field = getattr(self, 'id_field', mapper.primary_key[0].key)
+        id_column = getattr(self.model, id_field)
+        chunk_size = getattr(self, 'bulk_update_chunk_size', 500)
+        direct = len(mapper.primary_key) == 1 and mapper.get_property_by_column(mapper.primary_key[0]).key == id_field\
+            and self.can_update_directly(set(chain.from_iterable(data)))
+
+        query = self.query(view_kwargs)
+        if direct is True:
+            query = query.with_entities(id_column)
+
+        objects = {}
+        unique_ids = list(OrderedDict((str(id_), id_) for id_ in ids).values())
+        with timed('query'):
+            for index in range(0, len(unique_ids), chunk_size):
+                for obj in query.filter(id_column.in_(unique_ids[index:index + chunk_size])):
+                    objects[str(getattr(obj, id_field))] = obj
+
+        for index, id_ in enumerate(ids):
+            if str(id_) not in objects:
+                raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, id_),
+                                     source={'pointer': '/data/{}/id'.format(index)})
+
+        try:
+            if direct is True:
+                mappings = [dict(item, **{id_field: getattr(objects[str(id_)], id_field)})
+                            for (id_, item) in zip(ids, data)]
+                with timed('query'):
+                    for index in range(0, len(mappings), chunk_size):
+                        self.session.bulk_update_mappings(self.model, mappings[index:index + chunk_size])
+            else:
+                items = [(item, objects[str(id_)]) for (id_, item) in zip(ids, data)]
+                self.update_objects_one_by_one(items, view_kwargs)
+            self.commit()
+        except JsonApiException as e:
+            self.session.rollback()
+            raise e
+        except Exception as e:
+            self.session.rollback()
+            raise JsonApiException("Update objects error: " + str(e), source={'pointer': '/data'})
+
+        if direct is False:
+            for item, obj in items:
+                self.after_update_object(obj, item, view_kwargs)
+
+        return len(ids)
+
+    def update_collection(self, qs, data, view_kwargs):
+        """Update the objects of a collection matching the filters of the querystring with the same data in one
+        transaction. A single UPDATE statement is used if can_update_directly allows it, else the objects are
+        retrieved and updated like update_object. The primary key of the objects is never updated.
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return int: the number of updated objects
+        """
+        mapper = inspect(self.model)
+        primary_key = {mapper.get_property_by_column(column).key for column in mapper.primary_key}
+        data = {key: value for (key, value) in data.items() if key not in primary_key}
+
+        query = self.filter_query(self.query(view_kwargs), qs.filters, self.model)
+
+        items = None
+        try:
+            if not data:
+                with timed('count'):
+                    count = query.count()
+            elif self.can_update_directly(data):
+                with timed('query'):
+                    count = query.update(data, synchronize_session=False)
+            else:
+                with timed('query'):
+                    items = [(data, obj) for obj in query]
+                self.update_objects_one_by_one(items, view_kwargs)
+                count = len(items)
+            self.commit()
+        except JsonApiException as e:
+            self.session.rollback()
+            raise e
+        except Exception as e:
+            self.session.rollback()
+            raise JsonApiException("Update objects error: " + str(e), source={'pointer': '/data'})
+
+        for item, obj in items or ():
+            self.after_update_object(obj, item, view_kwargs)
+
+        return count
+
+    def update_objects_one_by_one(self, items, view_kwargs):
+        """Update retrieved objects with the before_update_object hook, related objects of each relationship are
+        retrieved together
+
+        :param list items: a list of (the data validated by marshmallow, the sqlalchemy object to update)
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        relationship_fields = get_relationships(self.resource.schema, model_field=True)
+
+        for item, obj in items:
+            self.before_update_object(obj, item, view_kwargs)
+            for key, value in item.items():
+                if hasattr(obj, key) and key not in relationship_fields:
+                    setattr(obj, key, value)
+
+        self.apply_relationships_many(items)
+
+    def is_rewritten(self, method):
+        """Check if a method of the data layer is rewritten by the resource manager or a subclass
+
+        :param str method: the name of the method
+        :return bool: True if the method is rewritten
+        """
+        return method in self.__dict__ or getattr(type(self), method) is not getattr(SqlalchemyDataLayer, method)
+
+    def can_delete_directly(self, hooks=('before_delete_object', 'after_delete_object')):
+        """Check if objects can be deleted by a DELETE statement without loading them: neither the hooks, the ORM
+        cascades, the mapper events nor a version counter need the instances
+
+        :param tuple hooks: the methods of the data layer that need the instances if they are rewritten
+        :return bool: True if objects can be deleted directly
+        """
+        if any(self.is_rewritten(method) for method in hooks):
+            return False
+
+        mapper = inspect(self.model)
+        if mapper.version_id_col is not None or mapper.inherits is not None or len(mapper.self_and_descendants) > 1:
+            return False
+        if mapper.dispatch.before_delete or mapper.dispatch.after_delete:
+            return False
+
+        for relationship_property in mapper.relationships:
+            if relationship_property.viewonly:
+                continue
+            if relationship_property.direction is MANYTOONE:
+                if relationship_property.cascade.delete:
+                    return False
+            elif not relationship_property.passive_deletes:
+                return False
+
+        return True
+
+    def delete_object_directly(self, view_kwargs):
+        """Delete an object with a single DELETE statement without loading it first. The fast path is only taken if
+        the fast_delete parameter of the data layer is True and can_delete_directly allows it.
+
+        :param dict view_kwargs: kwargs from the resource view
+        :return bool: True if the object is deleted, False if it must be retrieved and deleted by delete_object
+        """
+        if getattr(self, 'fast_delete', False) is not True \
+                or not self.can_delete_directly(hooks=('before_delete_object', 'after_delete_object',
+                                                       'retrieve_object_query')):
+            return False
+
+        mapper = inspect(self.model)
+        id_field = getattr(self, 'id_field', mapper.primary_key[0].key)
+        url_field = getattr(self, 'url_field', 'id')
+        filter_column = mapper.columns[mapper.get_property(id_field).columns[0].key]
+
+        statement = mapper.local_table.delete().where(filter_column == view_kwargs[url_field])
+
+        try:
+            with timed('query'):
+                deleted = self.session.execute(statement).rowcount > 0
+            if deleted:
+                self.commit()
+        except Exception as e:
+            self.session.rollback()
+            raise JsonApiException("Delete object error: " + str(e))
+
+        if not deleted:
+            self.session.rollback()
+            raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, view_kwargs[url_field]),
+                                 source={'parameter': url_field})
+
+        return True
+
+    def delete_collection(self, qs, view_kwargs):
+        """Delete the objects of a collection matching the filters of the querystring in a single transaction. A
+        single DELETE statement is used if can_delete_directly allows it, else the objects are retrieved and deleted
+        one by one with the delete hooks.
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return int: the number of deleted objects
+        """
+        query = self.filter_query(self.query(view_kwargs), qs.filters, self.model)
+
+        objects = None
+        try:
+            if self.can_delete_directly():
+                with timed('query'):
+                    count = query.delete(synchronize_session=False)
+            else:
+                with timed('query'):
+                    objects = query.all()
+                for obj in objects:
+                    self.before_delete_object(obj, view_kwargs)
+                    self.session.delete(obj)
+                count = len(objects)
+            self.commit()
+        except JsonApiException as e:
+            self.session.rollback()
+            raise e
+        except Exception as e:
+            self.session.rollback()
+            raise JsonApiException("Delete collection error: " + str(e))
+
+        for obj in objects or ():
+            self.after_delete_object(obj, view_kwargs)
+
+        return count
+
     def delete_object(self, obj, view_kwargs):
         """Delete an object through sqlalchemy
 
@@ -167,7 +798,7 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         self.session.delete(obj)
         try:
-            self.session.commit()
+            self.commit()
         except Exception as e:
             self.session.rollback()
             raise JsonApiException("Delete object error: " + str(e))
@@ -203,11 +834,15 @@ class SqlalchemyDataLayer(BaseDataLayer):
         if isinstance(json_data['data'], list):
             obj_ids = {str(getattr(obj__, related_id_field)) for obj__ in getattr(obj, relationship_field)}
 
+            new_objs = []
             for obj_ in json_data['data']:
                 if obj_['id'] not in obj_ids:
-                    getattr(obj,
-                            relationship_field).append(self.get_related_object(related_model, related_id_field, obj_))
-                    updated = True
+                    obj_ids.add(obj_['id'])
+                    new_objs.append(obj_)
+
+            for related_object in self.get_related_objects(related_model, related_id_field, new_objs):
+                getattr(obj, relationship_field).append(related_object)
+                updated = True
         else:
             related_object = None
 
@@ -221,7 +856,7 @@ class SqlalchemyDataLayer(BaseDataLayer):
                 updated = True
 
         try:
-            self.session.commit()
+            self.commit()
         except Exception as e:
             self.session.rollback()
             raise JsonApiException("Create relationship error: " + str(e))
@@ -249,9 +884,17 @@ class SqlalchemyDataLayer(BaseDataLayer):
             raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, filter_value),
                                  source={'parameter': url_field})
 
-        if not hasattr(obj, relationship_field):
+        # the attribute is looked up on the class first: getattr on the object would load the related objects
+        if not hasattr(obj.__class__, relationship_field) and not hasattr(obj, relationship_field):
             raise RelationNotFound("{} has no attribute {}".format(obj.__class__.__name__, relationship_field))
 
+        if self.can_read_linkage(relationship_field, related_id_field):
+            related_ids = self.get_related_ids(obj, relationship_field, related_id_field)
+
+            if isinstance(related_ids, list):
+                return obj, [{'type': related_type_, 'id': id_} for id_ in related_ids]
+            return obj, {'type': related_type_, 'id': related_ids} if related_ids is not None else None
+
         related_objects = getattr(obj, relationship_field)
 
         if related_objects is None:
@@ -266,6 +909,62 @@ class SqlalchemyDataLayer(BaseDataLayer):
         else:
             return obj, {'type': related_type_, 'id': getattr(related_objects, related_id_field)}
 
+    def can_read_linkage(self, relationship_field, related_id_field):
+        """Check if the linkage of a relationship can be read without loading the related objects: the relationship
+        is mapped, the identifier of the related model is a column and after_get_relationship is not rewritten
+
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :return bool: True if the linkage can be read from the identifiers only
+        """
+        if self.is_rewritten('after_get_relationship'):
+            return False
+
+        relationship_property = inspect(self.model).relationships.get(relationship_field)
+        if relationship_property is None:
+            return False
+
+        return isinstance(relationship_property.mapper.attrs.get(related_id_field), ColumnProperty)
+
+    def get_related_ids(self, obj, relationship_field, related_id_field):
+        """Retrieve the identifiers of the related objects of a relationship. A to-one relationship is read from the
+        local foreign key, other relationships select the identifier column of the related objects only, through the
+        foreign key or the association table. Related objects already loaded are used as is.
+
+        :param DeclarativeMeta obj: an object from sqlalchemy
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :return: the list of identifiers of a to-many relationship, the identifier or None for a to-one relationship
+        """
+        relationship_property = inspect(self.model).relationships[relationship_field]
+        related_mapper = relationship_property.mapper
+
+        if relationship_field not in inspect(obj).unloaded:
+            related_objects = getattr(obj, relationship_field)
+            if relationship_property.uselist:
+                return [getattr(related_object, related_id_field) for related_object in related_objects]
+            return getattr(related_objects, related_id_field) if related_objects is not None else None
+
+        if relationship_property.direction is MANYTOONE and len(relationship_property.local_remote_pairs) == 1:
+            local_column, remote_column = relationship_property.local_remote_pairs[0]
+            if remote_column is related_mapper.get_property(related_id_field).columns[0]:
+                try:
+                    return getattr(obj, inspect(self.model).get_property_by_column(local_column).key)
+                except UnmappedColumnError:
+                    pass
+
+        query = self.session.query(getattr(related_mapper.class_, related_id_field))\
+                            .filter(with_parent(obj, getattr(self.model, relationship_field)))
+        if relationship_property.order_by:
+            query = query.order_by(*relationship_property.order_by)
+
+        with timed('query'):
+            related_ids = [row[0] for row in query]
+
+        if relationship_property.uselist:
+            return related_ids
+        return related_ids[0] if related_ids else None
+
     def update_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
         """Update a relationship
 
@@ -293,10 +992,7 @@ class SqlalchemyDataLayer(BaseDataLayer):
         updated = False
 
         if isinstance(json_data['data'], list):
-            related_objects = []
-
-            for obj_ in json_data['data']:
-                related_objects.append(self.get_related_object(related_model, related_id_field, obj_))
+            related_objects = self.get_related_objects(related_model, related_id_field, json_data['data'])
 
             obj_ids = {getattr(obj__, related_id_field) for obj__ in getattr(obj, relationship_field)}
             new_obj_ids = {getattr(related_object, related_id_field) for related_object in related_objects}
@@ -317,7 +1013,7 @@ class SqlalchemyDataLayer(BaseDataLayer):
                 updated = True
 
         try:
-            self.session.commit()
+            self.commit()
         except Exception as e:
             self.session.rollback()
             raise JsonApiException("Update relationship error: " + str(e))
@@ -352,19 +1048,20 @@ class SqlalchemyDataLayer(BaseDataLayer):
         updated = False
 
         if isinstance(json_data['data'], list):
-            obj_ids = {str(getattr(obj__, related_id_field)) for obj__ in getattr(obj, relationship_field)}
+            # objects to remove are already in the relationship so they don't have to be queried
+            related_objects = {str(getattr(obj__, related_id_field)): obj__
+                               for obj__ in getattr(obj, relationship_field)}
 
             for obj_ in json_data['data']:
-                if obj_['id'] in obj_ids:
-                    getattr(obj,
-                            relationship_field).remove(self.get_related_object(related_model, related_id_field, obj_))
+                if obj_['id'] in related_objects:
+                    getattr(obj, relationship_field).remove(related_objects.pop(obj_['id']))
                     updated = True
         else:
             setattr(obj, relationship_field, None)
             updated = True
 
         try:
-            self.session.commit()
+            self.commit()
         except Exception as e:
             self.session.rollback()
             raise JsonApiException("Delete relationship error: " + str(e))
@@ -392,6 +1089,80 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         return related_object
 
+    def get_related_objects(self, related_model, related_id_field, objs):
+        """Get related objects with one query per chunk of identifiers
+
+        :param Model related_model: an sqlalchemy model
+        :param str related_id_field: the identifier field of the related model
+        :param list objs: resource identifiers of the related objects
+        :return list: the related objects in the order of the identifiers
+        """
+        ids = [obj['id'] for obj in objs]
+        chunk_size = getattr(self, 'related_objects_chunk_size', 500)
+        id_column = getattr(related_model, related_id_field)
+
+        related_objects = {}
+        unique_ids = list(OrderedDict((str(id_), id_) for id_ in ids).values())
+        for index in range(0, len(unique_ids), chunk_size):
+            for related_object in self.session.query(related_model)\
+                                              .filter(id_column.in_(unique_ids[index:index + chunk_size])):
+                related_objects[str(getattr(related_object, related_id_field))] = related_object
+
+        for id_ in ids:
+            if str(id_) not in related_objects:
+                raise RelatedObjectNotFound("{}.{}: {} not found".format(related_model.__name__,
+                                                                         related_id_field,
+                                                                         id_))
+
+        return [related_objects[str(id_)] for id_ in ids]
+
+    def commit(self):
+        """Commit the session or only flush it while operations are processed atomically, the whole transaction is
+        then committed by commit_operations
+        """
+        with timed('commit'):
+            if self.session.info.get(ATOMIC_OPERATIONS) is True:
+                self.session.flush()
+            else:
+                self.session.commit()
+                self.pin_reads()
+                self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """Invalidate the cached responses depending on the resource type of the data layer"""
+        invalidate_resource(getattr(self, 'resource', None))
+
+    def get_transaction(self):
+        """Return what holds the transaction of the operations: the session, and the bind of the model unless the
+        session uses two-phase commits, because a session commits its binds one after the other
+
+        :return: the transaction
+        """
+        if self.session.twophase is True:
+            return self.session
+
+        return self.session, self.session.get_bind(mapper=inspect(self.model))
+
+    def begin_operations(self):
+        """Process the next operations in a single transaction"""
+        self.session.info[ATOMIC_OPERATIONS] = True
+
+    def commit_operations(self):
+        """Commit the transaction of the operations"""
+        self.session.info.pop(ATOMIC_OPERATIONS, None)
+        try:
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            raise JsonApiException("Operations error: " + str(e))
+        self.pin_reads()
+        self.invalidate_cache()
+
+    def rollback_operations(self):
+        """Rollback the transaction of the operations"""
+        self.session.info.pop(ATOMIC_OPERATIONS, None)
+        self.session.rollback()
+
     def apply_relationships(self, data, obj):
         """Apply relationship provided by data to obj
 
@@ -399,32 +1170,43 @@ class SqlalchemyDataLayer(BaseDataLayer):
         :param DeclarativeMeta obj: the sqlalchemy object to plug relationships to
         :return boolean: True if relationship have changed else False
         """
-        relationships_to_apply = []
-        relationship_fields = get_relationships(self.resource.schema, model_field=True)
-        for key, value in data.items():
-            if key in relationship_fields:
-                related_model = getattr(obj.__class__, key).property.mapper.class_
-                schema_field = get_schema_field(self.resource.schema, key)
-                related_id_field = self.resource.schema._declared_fields[schema_field].id_field
+        self.apply_relationships_many([(data, obj)])
 
-                if isinstance(value, list):
-                    related_objects = []
+    def apply_relationships_many(self, items):
+        """Apply relationships provided by data to several objects, the related objects of each relationship are
+        retrieved together
 
-                    for identifier in value:
-                        related_object = self.get_related_object(related_model, related_id_field, {'id': identifier})
-                        related_objects.append(related_object)
+        :param list items: a list of (data provided by the client, the sqlalchemy object to plug relationships to)
+        """
+        relationship_fields = get_relationships(self.resource.schema, model_field=True)
 
-                    relationships_to_apply.append({'field': key, 'value': related_objects})
-                else:
-                    related_object = None
+        for key in relationship_fields:
+            values = [(data[key], obj) for (data, obj) in items if key in data]
+            if not values:
+                continue
 
-                    if value is not None:
-                        related_object = self.get_related_object(related_model, related_id_field, {'id': value})
+            related_model = getattr(self.model, key).property.mapper.class_
+            schema_field = get_schema_field(self.resource.schema, key)
+            related_id_field = self.resource.schema._declared_fields[schema_field].id_field
 
-                    relationships_to_apply.append({'field': key, 'value': related_object})
+            identifiers = []
+            for value, obj in values:
+                if isinstance(value, list):
+                    identifiers.extend(value)
+                elif value is not None:
+                    identifiers.append(value)
 
-        for relationship in relationships_to_apply:
-            setattr(obj, relationship['field'], relationship['value'])
+            related_objects = self.get_related_objects(related_model,
+                                                       related_id_field,
+                                                       [{'id': identifier} for identifier in identifiers])
+            related_objects = {str(identifier): related_object
+                               for (identifier, related_object) in zip(identifiers, related_objects)}
+
+            for value, obj in values:
+                if isinstance(value, list):
+                    setattr(obj, key, [related_objects[str(identifier)] for identifier in value])
+                else:
+                    setattr(obj, key, related_objects[str(value)] if value is not None else None)
 
     def filter_query(self, query, filter_info, model):
         """Filter query according to jsonapi 1.0
@@ -441,6 +1223,33 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         return query
 
+    def search_query(self, query, terms):
+        """Restrict query to the objects matching full-text search terms with the search backend of the data layer
+
+        :param Query query: sqlalchemy query
+        :param str terms: the search terms
+        :return tuple: the query and an order by clause sorting objects by relevance
+        """
+        if getattr(self, 'search', None) is None:
+            raise BadRequest("Full-text search is not available on this resource", source={'parameter': 'q'})
+
+        return self.search.search_query(query, self.model, terms)
+
+    @contextmanager
+    def search_errors(self, qs):
+        """Turn the errors raised by the database because of the search terms into a BadRequest, some backends only
+        check the syntax of the terms when the query is executed
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        """
+        try:
+            yield
+        except DBAPIError as e:
+            error = self.search.search_error(e) if qs.search and getattr(self, 'search', None) is not None else None
+            if error is None:
+                raise
+            raise error
+
     def sort_query(self, query, sort_info):
         """Sort query according to jsonapi 1.0
 
@@ -455,13 +1264,17 @@ class SqlalchemyDataLayer(BaseDataLayer):
             query = query.order_by(getattr(getattr(self.model, field), sort_opt['order'])())
         return query
 
-    def paginate_query(self, query, paginate_info):
+    def paginate_query(self, query, paginate_info, sort_info=None):
         """Paginate query according to jsonapi 1.0
 
         :param Query query: sqlalchemy queryset
         :param dict paginate_info: pagination information
+        :param list sort_info: sort information, used to build the keyset of cursor pagination
         :return Query: the paginated query
         """
+        if 'after' in paginate_info or 'before' in paginate_info:
+            query = self.keyset_query(query, paginate_info, sort_info or [])
+
         if int(paginate_info.get('size', 1)) == 0:
             return query
 
@@ -472,6 +1285,98 @@ class SqlalchemyDataLayer(BaseDataLayer):
 
         return query
 
+    def keyset_query(self, query, paginate_info, sort_info):
+        """Restrict and order a query to the objects located after or before a cursor. Null values of nullable columns
+        are sorted after the other values in ascending order and before them in descending order.
+
+        :param Query query: sqlalchemy queryset
+        :param dict paginate_info: pagination information
+        :param list sort_info: sort information
+        :return Query: the query restricted to the objects after or before the cursor
+        """
+        parameter = 'page[after]' if 'after' in paginate_info else 'page[before]'
+        cursor = paginate_info.get('after', paginate_info.get('before'))
+        keyset = self.keyset(sort_info)
+        reverse = 'before' in paginate_info
+        ascending = [(order == 'asc') != reverse for (column, order) in keyset]
+        nullable = [self.is_nullable(column) for (column, order) in keyset]
+
+        if cursor:
+            values = decode_cursor(cursor, parameter)
+            if len(values) != len(keyset):
+                raise BadRequest("Cursor does not match the sort parameter", source={'parameter': parameter})
+            values = [literal(value, column.type) if value is not None else None
+                      for ((column, order), value) in zip(keyset, values)]
+
+            if len(set(ascending)) == 1 and not any(nullable):
+                columns = tuple_(*[column for (column, order) in keyset])
+                query = query.filter(columns > tuple_(*values) if ascending[0] else columns < tuple_(*values))
+            else:
+                criterions = []
+                for index, (column, order) in enumerate(keyset):
+                    equalities = [keyset[i][0].is_(None) if values[i] is None else keyset[i][0] == values[i]
+                                  for i in range(index)]
+                    if values[index] is None:
+                        # null values come last in ascending order
+                        comparison = false() if ascending[index] else column.isnot(None)
+                    elif ascending[index]:
+                        comparison = or_(column > values[index], column.is_(None)) if nullable[index]\
+                            else column > values[index]
+                    else:
+                        comparison = column < values[index]
+                    criterions.append(and_(*(equalities + [comparison])))
+                query = query.filter(or_(*criterions))
+
+        order_by = []
+        for (column, order), ascending_, nullable_ in zip(keyset, ascending, nullable):
+            clause = column.asc() if ascending_ else column.desc()
+            if nullable_:
+                clause = clause.nullslast() if ascending_ else clause.nullsfirst()
+            order_by.append(clause)
+
+        return query.order_by(None).order_by(*order_by)
+
+    @staticmethod
+    def is_nullable(column):
+        """Check if a column of a model can be null
+
+        :param column: an attribute of a model
+        :return bool: True if the column can be null
+        """
+        prop = getattr(column, 'property', None)
+
+        return isinstance(prop, ColumnProperty) and any(getattr(column_, 'nullable', False) is True
+                                                        for column_ in prop.columns)
+
+    def keyset(self, sort_info):
+        """Compute the columns identifying the position of an object in a sorted collection
+
+        :param list sort_info: sort information
+        :return list: a list of (column, order) with the identifier column last
+        """
+        id_field = getattr(self, 'id_field', inspect(self.model).primary_key[0].key)
+        keyset = [(getattr(self.model, sort_opt['field']), sort_opt['order']) for sort_opt in sort_info]
+
+        if id_field not in [sort_opt['field'] for sort_opt in sort_info]:
+            keyset.append((getattr(self.model, id_field), 'asc'))
+
+        return keyset
+
+    def get_cursors(self, collection, qs):
+        """Compute the cursors of the first and the last objects of a page
+
+        :param list collection: the objects of the page
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :return dict: the cursors of the first and the last objects or None if the page is empty
+        """
+        if not collection:
+            return None
+
+        keys = [column.key for (column, order) in self.keyset(qs.sorting)]
+
+        return {'first': encode_cursor([getattr(collection[0], key) for key in keys]),
+                'last': encode_cursor([getattr(collection[-1], key) for key in keys])}
+
     def eagerload_includes(self, query, qs):
         """Use eagerload feature of sqlalchemy to optimize data retrieval for include querystring parameter
 
@@ -480,41 +1385,122 @@ class SqlalchemyDataLayer(BaseDataLayer):
         :return Query: the query with includes eagerloaded
         """
         for include in qs.include:
-            joinload_object = None
+            loader = None
+            current_schema = self.resource.schema
+            current_model = self.model
+            path = []
 
-            if '.' in include:
-                current_schema = self.resource.schema
-                for obj in include.split('.'):
-                    try:
-                        field = get_model_field(current_schema, obj)
-                    except Exception as e:
-                        raise InvalidInclude(str(e))
+            for obj in include.split('.'):
+                try:
+                    field = get_model_field(current_schema, obj)
+                except Exception as e:
+                    raise InvalidInclude(str(e))
 
-                    if joinload_object is None:
-                        joinload_object = joinedload(field)
-                    else:
-                        joinload_object = joinload_object.joinedload(field)
+                # a relationship missing from the sparse fieldset is not serialized so its included data is not needed
+                if obj not in qs.fields.get(current_schema.opts.type_, (obj,)):
+                    break
 
-                    related_schema_cls = get_related_schema(current_schema, obj)
+                try:
+                    relationship_attribute = getattr(current_model, field)
+                    relationship_property = relationship_attribute.property
+                    current_model = relationship_property.mapper.class_
+                except AttributeError:
+                    raise InvalidInclude("{} has no relationship attribute {}".format(current_model.__name__, field))
+
+                path.append(obj)
+                strategy = self.get_loader_strategy('.'.join(path), relationship_property)
+
+                if strategy == 'raise':
+                    raise InvalidInclude("{} can't be included".format('.'.join(path)))
+                if strategy not in LOADER_STRATEGIES:
+                    raise Exception("Unknown loader strategy {} for {}".format(strategy, '.'.join(path)))
+
+                if loader is None:
+                    loader = LOADER_STRATEGIES[strategy](relationship_attribute)
+                else:
+                    loader = getattr(loader, LOADER_STRATEGIES[strategy].__name__)(relationship_attribute)
 
-                    if isinstance(related_schema_cls, SchemaABC):
-                        related_schema_cls = related_schema_cls.__class__
-                    else:
-                        related_schema_cls = class_registry.get_class(related_schema_cls)
+                current_schema = get_related_schema_cls(current_schema, obj)
 
-                    current_schema = related_schema_cls
-            else:
-                try:
-                    field = get_model_field(self.resource.schema, include)
-                except Exception as e:
-                    raise InvalidInclude(str(e))
+                columns = self.get_load_only_fields(current_schema, current_model, qs)
+                if columns is not None:
+                    loader = loader.load_only(*columns)
+
+            if loader is not None:
+                query = query.options(loader)
+
+        return query
+
+    def load_only_fields_query(self, query, qs):
+        """Load only the columns of the sparse fieldset of the resource
 
-                joinload_object = joinedload(field)
+        :param Query query: sqlalchemy query
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :return Query: the query loading only the needed columns
+        """
+        needed_fields = [getattr(self, 'id_field', inspect(self.model).primary_key[0].key)]
+        needed_fields += [sort_opt['field'] for sort_opt in qs.sorting]
+        if getattr(self, 'version_field', None) is not None:
+            needed_fields.append(self.version_field)
 
-            query = query.options(joinload_object)
+        columns = self.get_load_only_fields(self.resource.schema, self.model, qs, needed_fields)
+        if columns is not None:
+            query = query.options(load_only(*columns))
 
         return query
 
+    def get_load_only_fields(self, schema, model, qs, needed_fields=()):
+        """Compute the columns of a model needed to serialize the sparse fieldset of a schema
+
+        :param Schema schema: the schema of the model
+        :param DeclarativeMeta model: an sqlalchemy model
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param iterable needed_fields: model fields needed by the data layer
+        :return list: the names of the columns to load or None to load every column
+        """
+        if getattr(self, 'load_only_fields', True) is False or schema.opts.type_ not in qs.fields:
+            return None
+
+        mapper = inspect(model)
+        model_fields = [get_model_field(schema, field)
+                        for field in set(qs.fields[schema.opts.type_]) | {'id'}
+                        if field in schema._declared_fields]
+
+        columns = set()
+        for model_field in chain(model_fields, needed_fields):
+            model_property = mapper.attrs.get(model_field)
+            if isinstance(model_property, ColumnProperty):
+                columns.add(model_property.key)
+            elif isinstance(model_property, RelationshipProperty):
+                # load the foreign keys used to retrieve related objects
+                for column in model_property.local_columns:
+                    try:
+                        columns.add(mapper.get_property_by_column(column).key)
+                    except UnmappedColumnError:
+                        return None
+            else:
+                # an attribute that is not a column may need any column of the model
+                return None
+
+        return sorted(columns)
+
+    def get_loader_strategy(self, path, relationship_property):
+        """Get the loader strategy used to eagerload an included relationship
+
+        :param str path: the path of the relationship in the include querystring parameter
+        :param RelationshipProperty relationship_property: the sqlalchemy relationship
+        :return str: "joined", "selectin", "subquery" or "raise"
+        """
+        strategy = getattr(self, 'eagerload_strategy', None)
+
+        if isinstance(strategy, dict):
+            strategy = strategy.get(path)
+
+        if strategy is None:
+            strategy = 'selectin' if relationship_property.uselist else 'joined'
+
+        return strategy
+
     def retrieve_object_query(self, view_kwargs, filter_field, filter_value):
         """Build query to retrieve object
 
@@ -709,3 +1695,25 @@ class SqlalchemyDataLayer(BaseDataLayer):
         :param dict view_kwargs: kwargs from the resource view
         """
         pass
+
+
+def explain_count_estimator(query):
+    """Estimate the number of objects of a query from the statistics of the PostgreSQL planner
+
+    :param Query query: sqlalchemy queryset
+    :return int: the number of rows estimated by the planner
+    """
+    mapper = query.column_descriptions[0]['entity']
+    bind = query.session.get_bind(mapper=mapper, clause=query.statement)
+    if bind.dialect.name != 'postgresql':
+        raise Exception("explain_count_estimator requires PostgreSQL, {} can't estimate counts from the query plan"
+                        .format(bind.dialect.name))
+
+    statement = text('EXPLAIN (FORMAT JSON) ' + str(query.statement.compile(dialect=bind.dialect,
+                                                                            compile_kwargs={'literal_binds': True})))
+    if SQLALCHEMY_VERSION >= (1, 4):
+        plan = query.session.execute(statement, bind_arguments={'bind': bind}).scalar()
+    else:
+        plan = query.session.execute(statement, bind=bind).scalar()
+
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -52,6 +52,15 @@ class BaseDataLayer(object):
         """
         raise NotImplementedError
 
+    def create_objects(self, data, view_kwargs):
+        """Create several objects at once
+
+        :param list data: the data of each object validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return list: the objects
+        """
+        raise NotImplementedError
+
     def get_object(self, view_kwargs):
         """Retrieve an object
 
@@ -69,6 +78,15 @@ class BaseDataLayer(object):
         """
         raise NotImplementedError
 
+    def get_grouped_collection(self, qs, view_kwargs):
+        """Retrieve the number of objects and aggregates of each group of a collection
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return list: a dict by group
+        """
+        raise NotImplementedError
+
     def update_object(self, obj, data, view_kwargs):
         """Update an object
 
@@ -79,6 +97,16 @@ class BaseDataLayer(object):
         """
         raise NotImplementedError
 
+    def update_object_attributes(self, data, view_kwargs, qs=None):
+        """Update the attributes of an object without retrieving it first
+
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :return: the updated object or None if the object must be retrieved and updated by update_object
+        """
+        return None
+
     def replace_object(self, data, view_kwargs):
         """Replace an object
 
@@ -96,6 +124,43 @@ class BaseDataLayer(object):
         """
         raise NotImplementedError
 
+    def update_objects(self, ids, data, view_kwargs):
+        """Update several objects
+
+        :param list ids: the identifier of each object
+        :param list data: the data of each object validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return int: the number of updated objects
+        """
+        raise NotImplementedError
+
+    def update_collection(self, qs, data, view_kwargs):
+        """Update the objects of a collection matching the filters of the querystring with the same data
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return int: the number of updated objects
+        """
+        raise NotImplementedError
+
+    def delete_object_directly(self, view_kwargs):
+        """Delete an object without retrieving it first
+
+        :param dict view_kwargs: kwargs from the resource view
+        :return bool: True if the object is deleted, False if it must be retrieved and deleted by delete_object
+        """
+        return False
+
+    def delete_collection(self, qs, view_kwargs):
+        """Delete the objects of a collection matching the filters of the querystring
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return int: the number of deleted objects
+        """
+        raise NotImplementedError
+
     def create_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
         """Create a relationship
 
@@ -139,6 +204,54 @@ class BaseDataLayer(object):
         """
         raise NotImplementedError
 
+    def get_cursors(self, collection, qs):
+        """Compute the cursors of the first and the last objects of a page for cursor pagination
+
+        :param list collection: the objects of the page
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :return dict: the cursors of the first and the last objects or None if the page is empty
+        """
+        raise NotImplementedError
+
+    def get_transaction(self):
+        """Return what holds the transaction of the operations processed by the data layer. Operations are only
+        atomic if all their data layers return the same transaction.
+
+        :return: the transaction
+        """
+        raise NotImplementedError
+
+    def begin_operations(self):
+        """Process the next operations in a single transaction until commit_operations or rollback_operations is
+        called
+        """
+        raise NotImplementedError
+
+    def commit_operations(self):
+        """Commit the transaction of the operations"""
+        raise NotImplementedError
+
+    def rollback_operations(self):
+        """Rollback the transaction of the operations"""
+        raise NotImplementedError
+
+    def get_object_version(self, view_kwargs):
+        """Retrieve a cheap version of an object used to compute the ETag of its responses
+
+        :param dict view_kwargs: kwargs from the resource view
+        :return: the version of the object or None if it is unknown
+        """
+        raise NotImplementedError
+
+    def get_collection_version(self, qs, view_kwargs):
+        """Retrieve a cheap version of a collection used to compute the ETag of its responses
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return: the version of the collection or None if it is unknown
+        """
+        raise NotImplementedError
+
     def query(self, view_kwargs):
         """Construct the base query to retrieve wanted data
 
@@ -2,10 +2,154 @@
 
 """Helper to create sqlalchemy filters according to filter querystring parameter"""
 
+import threading
+from collections import OrderedDict
+
 from sqlalchemy import and_, or_, not_
 
 from flask_rest_jsonapi.exceptions import InvalidFilters
-from flask_rest_jsonapi.schema import get_relationships, get_model_field
+from flask_rest_jsonapi.schema import get_relationships, get_model_field, get_related_schema_cls
+
+
+class FilterCache(object):
+    """Bounded LRU cache of compiled filters shared by all threads
+
+    A compiled filter only holds resolved columns and operators, the values are read from the filter information each
+    time it is applied, so the same compiled filter is used for every filter with the same structure.
+    """
+
+    def __init__(self, maxsize=256):
+        """Initialize a filter cache
+
+        :param int maxsize: the maximum number of compiled filters, 0 disables the cache
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._filters = OrderedDict()
+
+    def get(self, key):
+        """Retrieve a compiled filter
+
+        :param tuple key: the key computed by filter_cache_key
+        :return list: the compiled filters or None
+        """
+        with self._lock:
+            compiled = self._filters.pop(key, None)
+            if compiled is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._filters[key] = compiled
+
+        return compiled
+
+    def set(self, key, compiled):
+        """Store compiled filters and evict the least recently used ones
+
+        :param tuple key: the key computed by filter_cache_key
+        :param list compiled: the compiled filters
+        """
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._filters[key] = compiled
+            while len(self._filters) > self.maxsize:
+                self._filters.popitem(last=False)
+
+    def clear(self):
+        """Drop compiled filters and reset counters"""
+        with self._lock:
+            self._filters.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+filter_cache = FilterCache()
+
+_column_operators = {}
+
+
+def get_column_operators(model, model_field, column):
+    """Return the lookup table of the operators of a column, the table is computed once per model column
+
+    An operator named "op" is available as "op", "op_" or "__op__" in that order of preference.
+
+    :param DeclarativeMeta model: the model
+    :param str model_field: the name of the column in the model
+    :param InstrumentedAttribute column: the column
+    :return dict: the attribute name of the column for each operator name
+    """
+    key = (model, model_field)
+    operators = _column_operators.get(key)
+
+    if operators is None:
+        names = set(dir(column))
+        if hasattr(column, 'comparator'):
+            names.update(dir(column.comparator))
+
+        preferences = {}
+        for name in names:
+            if name.startswith('__') and name.endswith('__'):
+                candidates = ((name[2:-2], 2), (name, 0))
+            elif name.endswith('_'):
+                candidates = ((name[:-1], 1), (name, 0))
+            else:
+                candidates = ((name, 0),)
+            for op, preference in candidates:
+                if op not in preferences or preference < preferences[op][0]:
+                    preferences[op] = (preference, name)
+
+        operators = _column_operators[key] = {op: name for (op, (preference, name)) in preferences.items()}
+
+    return operators
+
+
+def filter_structure(filter_):
+    """Return the structure of a filter without its values
+
+    :param dict filter_: filter information of a node and deeper nodes
+    :return tuple: the structure of the filter
+    """
+    if not isinstance(filter_, dict):
+        return filter_
+
+    if 'or' in filter_:
+        return ('or', tuple(filter_structure(filt) for filt in filter_['or']))
+    if 'and' in filter_:
+        return ('and', tuple(filter_structure(filt) for filt in filter_['and']))
+    if 'not' in filter_:
+        return ('not', filter_structure(filter_['not']))
+
+    if filter_.get('field') is not None:
+        value = None
+    elif 'val' not in filter_:
+        value = 'missing'
+    elif isinstance(filter_['val'], dict):
+        value = filter_structure(filter_['val'])
+    else:
+        value = 'val'
+
+    return (filter_.get('name'), filter_.get('op'), filter_.get('field'), value)
+
+
+def filter_cache_key(model, schema, filter_info):
+    """Compute the key of compiled filters in the filter cache
+
+    :param DeclarativeMeta model: the model to filter
+    :param Schema schema: the schema of the resource
+    :param list filter_info: filters information
+    :return tuple: the key or None if the filters can't be cached
+    """
+    try:
+        key = (model, schema, tuple(filter_structure(filter_) for filter_ in filter_info))
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
 
 
 def create_filters(model, filter_info, resource):
@@ -15,11 +159,15 @@ def create_filters(model, filter_info, resource):
     :param dict filter_info: current node filter information
     :param Resource resource: the resource
     """
-    filters = []
-    for filter_ in filter_info:
-        filters.append(Node(model, filter_, resource, resource.schema).resolve())
+    key = filter_cache_key(model, resource.schema, filter_info)
 
-    return filters
+    compiled = filter_cache.get(key) if key is not None else None
+    if compiled is None:
+        compiled = [Node(model, filter_, resource, resource.schema).compile() for filter_ in filter_info]
+        if key is not None:
+            filter_cache.set(key, compiled)
+
+    return [build(filter_) for (build, filter_) in zip(compiled, filter_info)]
 
 
 class Node(object):
@@ -40,26 +188,45 @@ class Node(object):
 
     def resolve(self):
         """Create filter for a particular node of the filter tree"""
+        return self.compile()(self.filter_)
+
+    def compile(self):
+        """Resolve columns and operators of the node and deeper nodes once
+
+        :return callable: a callable creating the filter from filter information with the same structure
+        """
         if 'or' not in self.filter_ and 'and' not in self.filter_ and 'not' not in self.filter_:
             value = self.value
 
             if isinstance(value, dict):
-                value = Node(self.related_model, value, self.resource, self.related_schema).resolve()
+                related = Node(self.related_model, value, self.resource, self.related_schema).compile()
+
+                def get_value(filter_):
+                    return related(filter_['val'])
+            elif self.filter_.get('field') is not None:
+                def get_value(filter_):
+                    return value
+            else:
+                def get_value(filter_):
+                    return filter_['val']
+
+            operator = getattr(self.column, self.operator)
 
             if '__' in self.filter_.get('name', ''):
-                value = {self.filter_['name'].split('__')[1]: value}
+                keyword = self.filter_['name'].split('__')[1]
+                return lambda filter_: operator(**{keyword: get_value(filter_)})
 
-            if isinstance(value, dict):
-                return getattr(self.column, self.operator)(**value)
-            else:
-                return getattr(self.column, self.operator)(value)
+            return lambda filter_: operator(get_value(filter_))
 
         if 'or' in self.filter_:
-            return or_(Node(self.model, filt, self.resource, self.schema).resolve() for filt in self.filter_['or'])
+            nodes = [Node(self.model, filt, self.resource, self.schema).compile() for filt in self.filter_['or']]
+            return lambda filter_: or_(*[node(filt) for (node, filt) in zip(nodes, filter_['or'])])
         if 'and' in self.filter_:
-            return and_(Node(self.model, filt, self.resource, self.schema).resolve() for filt in self.filter_['and'])
+            nodes = [Node(self.model, filt, self.resource, self.schema).compile() for filt in self.filter_['and']]
+            return lambda filter_: and_(*[node(filt) for (node, filt) in zip(nodes, filter_['and'])])
         if 'not' in self.filter_:
-            return not_(Node(self.model, self.filter_['not'], self.resource, self.schema).resolve())
+            node = Node(self.model, self.filter_['not'], self.resource, self.schema).compile()
+            return lambda filter_: not_(node(filter_['not']))
 
     @property
     def name(self):
@@ -114,13 +281,18 @@ class Node(object):
 
         :return callable: a callable to make operation on a column
         """
-        operators = (self.op, self.op + '_', '__' + self.op + '__')
+        column = self.column
+        operators = get_column_operators(self.model, column.key, column)
 
-        for op in operators:
-            if hasattr(self.column, op):
-                return op
+        try:
+            return operators[self.op]
+        except KeyError:
+            for op in (self.op, self.op + '_', '__' + self.op + '__'):
+                if hasattr(column, op):
+                    operators[self.op] = op
+                    return op
 
-        raise InvalidFilters("{} has no operator {}".format(self.column.key, self.op))
+        raise InvalidFilters("{} has no operator {}".format(column.key, self.op))
 
     @property
     def value(self):
@@ -165,4 +337,4 @@ class Node(object):
         if relationship_field not in get_relationships(self.schema):
             raise InvalidFilters("{} has no relationship attribute {}".format(self.schema.__name__, relationship_field))
 
-        return self.schema._declared_fields[relationship_field].schema.__class__
+        return get_related_schema_cls(self.schema, relationship_field)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""Helper to evaluate the filter querystring parameter on python objects with the same semantic as the sqlalchemy
+filters: comparisons with None are false, except eq and ne which test if a value is or isn't None
+"""
+
+import re
+
+from flask_rest_jsonapi.exceptions import InvalidFilters
+from flask_rest_jsonapi.schema import get_relationships, get_model_field, get_related_schema_cls
+
+
+def like(pattern, flags=0):
+    """Compile a sql like pattern into a regular expression
+
+    :param str pattern: the like pattern
+    :param int flags: the flags of the regular expression
+    :return callable: a function matching a value with the pattern
+    """
+    expression = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in pattern)
+    return re.compile(expression + r'\Z', flags | re.DOTALL).match
+
+
+def compare(operator):
+    """Create an operator returning False if a value is None like sql comparisons with NULL or if values can't be
+    compared
+
+    :param callable operator: the operator
+    :return callable: the operator
+    """
+    def compare_(value, other):
+        try:
+            return value is not None and other is not None and operator(value, other)
+        except TypeError:
+            return False
+    return compare_
+
+
+OPERATORS = {
+    'eq': lambda value, other: value is None if other is None else value is not None and value == other,
+    'ne': lambda value, other: value is not None if other is None else value is not None and value != other,
+    'lt': compare(lambda value, other: value < other),
+    'le': compare(lambda value, other: value <= other),
+    'gt': compare(lambda value, other: value > other),
+    'ge': compare(lambda value, other: value >= other),
+    'is_': lambda value, other: value is other,
+    'isnot': lambda value, other: value is not other,
+    'in_': lambda value, other: value is not None and value in other,
+    'notin_': lambda value, other: value is not None and value not in other,
+    'between': lambda value, other: value is not None and other[0] <= value <= other[1],
+    'startswith': compare(lambda value, other: value.startswith(other)),
+    'endswith': compare(lambda value, other: value.endswith(other)),
+    'contains': compare(lambda value, other: other in value),
+}
+
+# like operators compile their pattern once: flags of the regular expression and negation
+LIKE_OPERATORS = {'like': (0, False), 'ilike': (re.IGNORECASE, False), 'notlike': (0, True),
+                  'notilike': (re.IGNORECASE, True)}
+
+ALIASES = {'==': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge', 'is': 'is_', 'in': 'in_',
+           'notin': 'notin_', 'not_in': 'notin_', 'isnot_': 'isnot', 'is_not': 'isnot', 'not_like': 'notlike',
+           'not_ilike': 'notilike'}
+
+
+def create_filters(filter_info, schema):
+    """Create a predicate from filters information
+
+    :param list filter_info: filters information
+    :param Schema schema: the schema of the resource
+    :return callable: a function returning True if an object matches every filter
+    """
+    predicates = [Node(filter_, schema).compile() for filter_ in filter_info]
+
+    return lambda obj: all(predicate(obj) for predicate in predicates)
+
+
+class Node(object):
+    """Helper to recursively create a predicate according to filter querystring parameter"""
+
+    def __init__(self, filter_, schema):
+        """Initialize an instance of a filter node
+
+        :param dict filter_: filters information of the current node and deeper nodes
+        :param Schema schema: the serializer of the objects
+        """
+        self.filter_ = filter_
+        self.schema = schema
+
+    def compile(self):
+        """Create the predicate of the node and deeper nodes
+
+        :return callable: a function returning True if an object matches the node
+        """
+        if not isinstance(self.filter_, dict):
+            raise InvalidFilters("A filter must be an object")
+
+        if 'or' in self.filter_:
+            nodes = [Node(filt, self.schema).compile() for filt in self.filter_['or']]
+            return lambda obj: any(node(obj) for node in nodes)
+        if 'and' in self.filter_:
+            nodes = [Node(filt, self.schema).compile() for filt in self.filter_['and']]
+            return lambda obj: all(node(obj) for node in nodes)
+        if 'not' in self.filter_:
+            node = Node(self.filter_['not'], self.schema).compile()
+            return lambda obj: not node(obj)
+
+        attribute = get_model_field(self.schema, self.name)
+        op = self.op
+
+        if op in ('any', 'has'):
+            if not isinstance(self.filter_.get('val'), dict):
+                raise InvalidFilters("The value of a {} filter must be a filter".format(op))
+            related = Node(self.filter_['val'], self.related_schema).compile()
+            if op == 'any':
+                return lambda obj: any(related(related_obj) for related_obj in getattr(obj, attribute) or ())
+            return lambda obj: getattr(obj, attribute) is not None and related(getattr(obj, attribute))
+
+        op = ALIASES.get(op, op)
+        if op not in OPERATORS and op not in LIKE_OPERATORS:
+            raise InvalidFilters("{} has no operator {}".format(self.name, op))
+
+        if op in LIKE_OPERATORS:
+            if 'val' not in self.filter_:
+                raise InvalidFilters("Can't find value in a {} filter".format(op))
+            flags, negate = LIKE_OPERATORS[op]
+            match = like(self.filter_['val'], flags)
+            return lambda obj: getattr(obj, attribute, None) is not None and\
+                (match(getattr(obj, attribute)) is None) is negate
+
+        operator = OPERATORS[op]
+
+        if self.filter_.get('field') is not None:
+            other = get_model_field(self.schema, self.filter_['field'])\
+                if self.filter_['field'] in self.schema._declared_fields else self.filter_['field']
+            return lambda obj: operator(getattr(obj, attribute, None), getattr(obj, other, None))
+
+        if 'val' not in self.filter_:
+            raise InvalidFilters("Can't find value or field in a filter")
+        if op in ('in_', 'notin_', 'between'):
+            value = [self.deserialize(item) for item in self.filter_['val']]
+        else:
+            value = self.deserialize(self.filter_['val'])
+
+        return lambda obj: operator(getattr(obj, attribute, None), value)
+
+    def deserialize(self, value):
+        """Deserialize a value with the field of the node like the database converts the values of sql filters
+
+        :param value: a value of the filter
+        :return: the deserialized value or the value if it is not valid for the field
+        """
+        if value is None:
+            return value
+
+        try:
+            return self.schema._declared_fields[self.name].deserialize(value)
+        except Exception:
+            return value
+
+    @property
+    def name(self):
+        """Return the name of the node or raise a BadRequest exception
+
+        :return str: the name of the field to filter on
+        """
+        name = self.filter_.get('name')
+
+        if name is None:
+            raise InvalidFilters("Can't find name of a filter")
+
+        if '__' in name:
+            raise InvalidFilters("Keyword arguments of operators are not supported in {}".format(name))
+
+        if name not in self.schema._declared_fields:
+            raise InvalidFilters("{} has no attribute {}".format(self.schema.__name__, name))
+
+        return name
+
+    @property
+    def op(self):
+        """Return the operator of the node
+
+        :return str: the operator to use in the filter
+        """
+        try:
+            return self.filter_['op']
+        except KeyError:
+            raise InvalidFilters("Can't find op of a filter")
+
+    @property
+    def related_schema(self):
+        """Get the related schema of a relationship field
+
+        :return Schema: the related schema
+        """
+        relationship_field = self.name
+
+        if relationship_field not in get_relationships(self.schema):
+            raise InvalidFilters("{} has no relationship attribute {}".format(self.schema.__name__, relationship_field))
+
+        return get_related_schema_cls(self.schema, relationship_field)
@@ -0,0 +1,1123 @@
+# -*- coding: utf-8 -*-
+
+"""This module is a CRUD interface between resource managers and python objects kept in memory"""
+
+import threading
+from copy import copy
+from bisect import insort
+from collections import OrderedDict
+from numbers import Number
+
+from flask import current_app
+
+from flask_rest_jsonapi.data_layers.base import BaseDataLayer
+from flask_rest_jsonapi.data_layers.filtering.memory import create_filters, Node
+from flask_rest_jsonapi.exceptions import RelationNotFound, RelatedObjectNotFound, InvalidSort, ObjectNotFound,\
+    BadRequest
+from flask_rest_jsonapi.schema import get_model_field, get_relationships
+from flask_rest_jsonapi.cache import invalidate_resource
+
+
+class MemoryObject(object):
+    """Default model of the objects of a memory data layer"""
+
+    def __init__(self, **kwargs):
+        """Initialize an object with its attributes
+
+        :param dict kwargs: the attributes of the object
+        """
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.__dict__)
+
+
+def sort_key(value):
+    """Compute the sort key of a value, None is lower than any value like NULL in SQLite
+
+    :param value: a value
+    :return tuple: the sort key
+    """
+    return (value is not None, value)
+
+
+class Storage(object):
+    """Objects of a memory data layer and their indexes
+
+    A storage and its objects are never modified once they are published: writers modify copies of the storage and of
+    the objects and replace the storage of the data layer so readers iterate over consistent objects and indexes without
+    locking. A copy shares the containers of the objects and of the indexes with the storage it comes from and only
+    copies the ones it modifies.
+    """
+
+    def __init__(self, id_field, hash_fields, sorted_fields):
+        """Initialize an empty storage
+
+        :param str id_field: the attribute identifying objects
+        :param iterable hash_fields: the attributes with a hash index
+        :param iterable sorted_fields: the attributes with a sorted index
+        """
+        self.id_field = id_field
+        self.objects = OrderedDict()
+        self.hash_indexes = {field: dict() for field in hash_fields}
+        self.sorted_indexes = {field: [] for field in sorted_fields}
+        # the containers copied by a copy of a storage, None if the storage owns every container
+        self.owned = None
+
+    def copy(self):
+        """Copy the storage before modifying it
+
+        :return Storage: the copy
+        """
+        storage = Storage(self.id_field, (), ())
+        storage.objects = self.objects
+        storage.hash_indexes = self.hash_indexes
+        storage.sorted_indexes = self.sorted_indexes
+        storage.owned = set()
+
+        return storage
+
+    def acquire(self, container):
+        """Check if a container is shared with the storage this storage was copied from, the caller copies it
+
+        :param tuple container: the name of the container
+        :return bool: True if the container must be copied before modifying it
+        """
+        if self.owned is None or container in self.owned:
+            return False
+        self.owned.add(container)
+
+        return True
+
+    def get_objects(self):
+        """Return the objects to modify them
+
+        :return OrderedDict: the objects by key
+        """
+        if self.acquire(('objects',)):
+            self.objects = OrderedDict(self.objects)
+
+        return self.objects
+
+    def get_hash_index(self, field):
+        """Return a hash index to modify it
+
+        :param str field: the attribute of the index
+        :return dict: the keys of the objects by value
+        """
+        if self.acquire(('hash',)):
+            self.hash_indexes = dict(self.hash_indexes)
+        if self.acquire(('hash', field)):
+            self.hash_indexes[field] = dict(self.hash_indexes[field])
+
+        return self.hash_indexes[field]
+
+    def get_sorted_index(self, field):
+        """Return a sorted index to modify it
+
+        :param str field: the attribute of the index
+        :return list: the sorted (sort key, object key) tuples
+        """
+        if self.acquire(('sorted',)):
+            self.sorted_indexes = dict(self.sorted_indexes)
+        if self.acquire(('sorted', field)):
+            self.sorted_indexes[field] = list(self.sorted_indexes[field])
+
+        return self.sorted_indexes[field]
+
+    def key(self, obj):
+        """Compute the key of an object
+
+        :param obj: an object
+        :return str: the key of the object
+        """
+        return str(getattr(obj, self.id_field))
+
+    def add(self, obj):
+        """Add an object and index it
+
+        :param obj: an object
+        """
+        key = self.key(obj)
+        self.get_objects()[key] = obj
+        self.index(obj, key)
+
+    def remove(self, obj):
+        """Remove an object and its index entries
+
+        :param obj: an object
+        """
+        key = self.key(obj)
+        self.unindex(obj, key)
+        del self.get_objects()[key]
+
+    def replace(self, current, obj):
+        """Replace an object with a new version, only the index entries of the modified attributes are updated
+
+        :param current: the object
+        :param obj: the new version of the object
+        """
+        key = self.key(obj)
+        if key != self.key(current):
+            self.remove(current)
+            self.add(obj)
+            return
+
+        self.get_objects()[key] = obj
+        for field in self.hash_indexes:
+            if getattr(current, field, None) != getattr(obj, field, None):
+                self.unindex_hash(field, getattr(current, field, None), key)
+                self.index_hash(field, getattr(obj, field, None), key)
+        for field in self.sorted_indexes:
+            if sort_key(getattr(current, field, None)) != sort_key(getattr(obj, field, None)):
+                index = self.get_sorted_index(field)
+                index.remove((sort_key(getattr(current, field, None)), key))
+                insort(index, (sort_key(getattr(obj, field, None)), key))
+
+    def index(self, obj, key):
+        """Add the index entries of an object
+
+        :param obj: an object
+        :param str key: the key of the object
+        """
+        for field in self.hash_indexes:
+            self.index_hash(field, getattr(obj, field, None), key)
+        for field in self.sorted_indexes:
+            insort(self.get_sorted_index(field), (sort_key(getattr(obj, field, None)), key))
+
+    def unindex(self, obj, key):
+        """Remove the index entries of an object
+
+        :param obj: an object
+        :param str key: the key of the object
+        """
+        for field in self.hash_indexes:
+            self.unindex_hash(field, getattr(obj, field, None), key)
+        for field in self.sorted_indexes:
+            self.get_sorted_index(field).remove((sort_key(getattr(obj, field, None)), key))
+
+    def index_hash(self, field, value, key):
+        """Add an entry to a hash index
+
+        :param str field: the attribute of the index
+        :param value: the value of the attribute
+        :param str key: the key of the object
+        """
+        index = self.get_hash_index(field)
+        keys = index.get(value)
+        shared = self.acquire(('hash', field, value))
+        if keys is None or shared:
+            keys = index[value] = set(keys or ())
+        keys.add(key)
+
+    def unindex_hash(self, field, value, key):
+        """Remove an entry from a hash index
+
+        :param str field: the attribute of the index
+        :param value: the value of the attribute
+        :param str key: the key of the object
+        """
+        index = self.get_hash_index(field)
+        if self.acquire(('hash', field, value)):
+            index[value] = set(index[value])
+        index[value].discard(key)
+        if not index[value]:
+            del index[value]
+
+
+class MemoryStore(object):
+    """Objects shared by the memory data layers of the resource managers of a type
+
+    Readers use the published storage without locking, writers are serialized by a lock. Operations hold the lock
+    until they are committed or rolled back and modify a private storage which is only published when they are
+    committed, the thread processing them reads this storage.
+    """
+
+    def __init__(self, objects=(), id_field='id', indexes=(), sort_indexes=()):
+        """Initialize a store
+
+        :param iterable objects: the initial objects
+        :param str id_field: the attribute identifying objects
+        :param iterable indexes: the attributes with a hash index
+        :param iterable sort_indexes: the attributes with a sorted index
+        """
+        self.id_field = id_field
+        self.lock = threading.RLock()
+        self.pending = None
+        self.owner = None
+        self.depth = 0
+
+        storage = Storage(id_field, indexes, sort_indexes)
+        for obj in objects:
+            storage.add(obj)
+        self.published = storage
+
+        ids = [getattr(obj, id_field) for obj in storage.objects.values()]
+        self.last_id = max([id_ for id_ in ids if isinstance(id_, int)] or [0])
+
+    @property
+    def storage(self):
+        """The storage read by the current thread: the private storage of the transaction it processes or the
+        published storage
+        """
+        if self.pending is not None and self.owner == threading.current_thread():
+            return self.pending
+
+        return self.published
+
+    def allocate_id(self, id_=None):
+        """Allocate the id of a new object, integer ids are incremented
+
+        :param id_: the id provided by the client
+        :return: the id of the object
+        """
+        if id_ is None:
+            id_ = self.last_id + 1
+        if isinstance(id_, int):
+            self.last_id = max(self.last_id, id_)
+
+        return id_
+
+    def writable(self):
+        """Return the storage to modify, the store must be locked: the private storage of the transaction or a copy of
+        the published storage
+
+        :return Storage: the storage
+        """
+        if self.depth > 0:
+            return self.pending
+
+        return self.published.copy()
+
+    def publish(self, storage):
+        """Replace the storage with a modified one, it is published when the transaction is committed
+
+        :param Storage storage: the new storage
+        """
+        if self.depth > 0:
+            self.pending = storage
+        else:
+            self.published = storage
+
+    def begin(self):
+        """Begin a transaction, transactions of data layers sharing the store are merged"""
+        self.lock.acquire()
+        if self.depth == 0:
+            self.pending = self.published.copy()
+            self.owner = threading.current_thread()
+        self.depth += 1
+
+    def commit(self):
+        """Commit the transaction"""
+        self.depth -= 1
+        if self.depth == 0:
+            self.published = self.pending
+            self.pending = self.owner = None
+        self.lock.release()
+
+    def rollback(self):
+        """Rollback the transaction"""
+        self.depth -= 1
+        if self.depth == 0:
+            self.pending = self.owner = None
+        else:
+            self.pending = self.published.copy()
+        self.lock.release()
+
+
+class MemoryDataLayer(BaseDataLayer):
+    """Memory data layer
+
+    Objects are kept in a store, in an ordered dict by id. Hash indexes on attributes (indexes parameter) are used by
+    eq and in filters and sorted indexes (sort_indexes parameter) by sorts on a single attribute. The resource managers
+    of a type must share the same store (store parameter) to see the same objects.
+
+    Published objects are never modified: get_object returns a copy of the object which is published again by the
+    methods updating it, and the related objects of the objects returned are their current versions.
+    """
+
+    def __init__(self, kwargs):
+        """Initialize an instance of MemoryDataLayer
+
+        :param dict kwargs: initialization parameters of an MemoryDataLayer instance
+        """
+        super(MemoryDataLayer, self).__init__(kwargs)
+
+        if not hasattr(self, 'model'):
+            self.model = MemoryObject
+
+        if getattr(self, 'store', None) is None:
+            self.store = MemoryStore(getattr(self, 'objects', ()), getattr(self, 'id_field', 'id'),
+                                     getattr(self, 'indexes', ()), getattr(self, 'sort_indexes', ()))
+        self.id_field = self.store.id_field
+
+    def create_object(self, data, view_kwargs):
+        """Create an object
+
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return: the object
+        """
+        return self.create_objects([data], view_kwargs)[0]
+
+    def create_objects(self, data, view_kwargs):
+        """Create several objects at once
+
+        :param list data: the data of each object validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return list: the objects
+        """
+        for item in data:
+            self.before_create_object(item, view_kwargs)
+
+        relationship_fields = get_relationships(self.resource.schema, model_field=True)
+
+        with self.store.lock:
+            storage = self.store.writable()
+            objects = []
+            for item in data:
+                attributes = {key: value for (key, value) in item.items() if key not in relationship_fields}
+                attributes[self.id_field] = self.store.allocate_id(attributes.get(self.id_field))
+                if str(attributes[self.id_field]) in storage.objects:
+                    raise BadRequest("{} {} already exists".format(self.model.__name__, attributes[self.id_field]),
+                                     source={'pointer': '/data/id'})
+
+                obj = self.model(**attributes)
+                self.apply_relationships(item, obj)
+                storage.add(obj)
+                objects.append(obj)
+
+            self.publish(storage)
+
+        for item, obj in zip(data, objects):
+            self.after_create_object(obj, item, view_kwargs)
+
+        return objects
+
+    def get_object(self, view_kwargs, qs=None):
+        """Retrieve an object
+
+        :params dict view_kwargs: kwargs from the resource view
+        :return: the object or None
+        """
+        self.before_get_object(view_kwargs)
+
+        url_field = getattr(self, 'url_field', 'id')
+        obj = self.store.storage.objects.get(str(view_kwargs[url_field]))
+        if obj is not None:
+            obj = self.refresh_relationships(copy(obj), copied=True)
+
+        self.after_get_object(obj, view_kwargs)
+
+        return obj
+
+    def get_collection(self, qs, view_kwargs):
+        """Retrieve a collection of objects
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return tuple: the number of object and the list of objects
+        """
+        self.before_get_collection(qs, view_kwargs)
+
+        if qs.search:
+            raise BadRequest("Full-text search is not available on this resource", source={'parameter': 'q'})
+        if 'after' in qs.pagination or 'before' in qs.pagination:
+            raise BadRequest("Cursor pagination is not available on this resource", source={'parameter': 'page'})
+
+        storage = self.store.storage
+        objects = self.query(view_kwargs)
+
+        if objects is None:
+            keys = self.index_lookup(storage, qs.filters or [])
+            objects = self.sort_query(storage, qs.sorting, keys)
+            if objects is None:
+                objects = storage.objects.values() if keys is None else\
+                    [storage.objects[key] for key in storage.objects if key in keys]
+                objects = self.filter_query(objects, qs.filters)
+                objects = self.sort_objects(objects, qs.sorting)
+            else:
+                objects = self.filter_query(objects, qs.filters)
+        else:
+            objects = self.sort_objects(self.filter_query(objects, qs.filters), qs.sorting)
+
+        object_count = len(objects)
+
+        collection = [self.refresh_relationships(obj) for obj in self.paginate_query(objects, qs.pagination)]
+
+        collection = self.after_get_collection(collection, qs, view_kwargs)
+
+        return object_count, collection
+
+    def update_object(self, obj, data, view_kwargs):
+        """Update an object
+
+        :param obj: an object
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        :return boolean: True if object have changed else False
+        """
+        if obj is None:
+            url_field = getattr(self, 'url_field', 'id')
+            filter_value = view_kwargs[url_field]
+            raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, filter_value),
+                                 source={'parameter': url_field})
+
+        self.before_update_object(obj, data, view_kwargs)
+
+        relationship_fields = get_relationships(self.resource.schema, model_field=True)
+
+        with self.store.lock:
+            current = self.get_published_object(obj, view_kwargs)
+            new_obj = copy(current)
+            for key, value in data.items():
+                if key not in relationship_fields:
+                    setattr(new_obj, key, value)
+            self.apply_relationships(data, new_obj)
+            self.publish_object(current, new_obj)
+
+        if obj is not current:
+            # obj is a copy returned by get_object, it reflects the published version
+            vars(obj).update(vars(new_obj))
+
+        self.after_update_object(obj, data, view_kwargs)
+
+    def delete_object(self, obj, view_kwargs):
+        """Delete an object
+
+        :param obj: an object
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        if obj is None:
+            url_field = getattr(self, 'url_field', 'id')
+            filter_value = view_kwargs[url_field]
+            raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, filter_value),
+                                 source={'parameter': url_field})
+
+        self.before_delete_object(obj, view_kwargs)
+
+        with self.store.lock:
+            storage = self.store.writable()
+            storage.remove(self.get_published_object(obj, view_kwargs))
+            self.publish(storage)
+
+        self.after_delete_object(obj, view_kwargs)
+
+    def create_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
+        """Create a relationship
+
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        :return boolean: True if relationship have changed else False
+        """
+        self.before_create_relationship(json_data, relationship_field, related_id_field, view_kwargs)
+
+        obj = self.get_relationship_object(relationship_field, view_kwargs)
+
+        updated = False
+        with self.store.lock:
+            current = self.get_published_object(obj, view_kwargs)
+            if isinstance(json_data['data'], list):
+                new_related_objects = self.get_related_objects(relationship_field, json_data['data'])
+                related_objects = list(getattr(current, relationship_field) or [])
+                keys = set(self.get_related_keys(relationship_field, related_objects))
+                for related_object, key in zip(new_related_objects,
+                                               self.get_related_keys(relationship_field, new_related_objects)):
+                    if key not in keys:
+                        related_objects.append(related_object)
+                        keys.add(key)
+                        updated = True
+            else:
+                related_objects = self.get_related_objects(relationship_field, [json_data['data']])[0]\
+                    if json_data['data'] is not None else None
+                updated = self.get_related_keys(relationship_field, [getattr(current, relationship_field)]) !=\
+                    self.get_related_keys(relationship_field, [related_objects])
+            if updated:
+                obj = self.set_relationship(current, relationship_field, related_objects)
+
+        self.after_create_relationship(obj, updated, json_data, relationship_field, related_id_field, view_kwargs)
+
+        return obj, updated
+
+    def get_relationship(self, relationship_field, related_type_, related_id_field, view_kwargs):
+        """Get a relationship
+
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_type_: the related resource type
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        :return tuple: the object and related object(s)
+        """
+        self.before_get_relationship(relationship_field, related_type_, related_id_field, view_kwargs)
+
+        obj = self.get_relationship_object(relationship_field, view_kwargs)
+
+        related_objects = getattr(obj, relationship_field)
+
+        if related_objects is None:
+            return obj, related_objects
+
+        self.after_get_relationship(obj, related_objects, relationship_field, related_type_, related_id_field,
+                                    view_kwargs)
+
+        if isinstance(related_objects, (list, tuple)):
+            return obj,\
+                [{'type': related_type_, 'id': getattr(obj_, related_id_field)} for obj_ in related_objects]
+        else:
+            return obj, {'type': related_type_, 'id': getattr(related_objects, related_id_field)}
+
+    def update_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
+        """Update a relationship
+
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        :return boolean: True if relationship have changed else False
+        """
+        self.before_update_relationship(json_data, relationship_field, related_id_field, view_kwargs)
+
+        obj = self.get_relationship_object(relationship_field, view_kwargs)
+
+        with self.store.lock:
+            current = self.get_published_object(obj, view_kwargs)
+            if isinstance(json_data['data'], list):
+                related_objects = self.get_related_objects(relationship_field, json_data['data'])
+                updated = self.get_related_keys(relationship_field, related_objects) !=\
+                    self.get_related_keys(relationship_field, getattr(current, relationship_field) or [])
+            else:
+                related_objects = self.get_related_objects(relationship_field, [json_data['data']])[0]\
+                    if json_data['data'] is not None else None
+                updated = self.get_related_keys(relationship_field, [getattr(current, relationship_field)]) !=\
+                    self.get_related_keys(relationship_field, [related_objects])
+            if updated:
+                obj = self.set_relationship(current, relationship_field, related_objects)
+
+        self.after_update_relationship(obj, updated, json_data, relationship_field, related_id_field, view_kwargs)
+
+        return obj, updated
+
+    def delete_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
+        """Delete a relationship
+
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        self.before_delete_relationship(json_data, relationship_field, related_id_field, view_kwargs)
+
+        obj = self.get_relationship_object(relationship_field, view_kwargs)
+
+        with self.store.lock:
+            current = self.get_published_object(obj, view_kwargs)
+            if isinstance(json_data['data'], list):
+                keys = {str(obj_['id']) for obj_ in json_data['data']}
+                related_objects = [related_object for related_object in getattr(current, relationship_field) or []
+                                   if str(getattr(related_object, related_id_field)) not in keys]
+                updated = len(related_objects) != len(getattr(current, relationship_field) or [])
+            else:
+                related_objects = None
+                updated = getattr(current, relationship_field) is not None
+            if updated:
+                obj = self.set_relationship(current, relationship_field, related_objects)
+
+        self.after_delete_relationship(obj, updated, json_data, relationship_field, related_id_field, view_kwargs)
+
+        return obj, updated
+
+    def get_object_version(self, view_kwargs):
+        """Retrieve the value of the version field of an object
+
+        :param dict view_kwargs: kwargs from the resource view
+        :return: the version of the object or None if the object doesn't exist
+        """
+        obj = self.store.storage.objects.get(str(view_kwargs[getattr(self, 'url_field', 'id')]))
+
+        return getattr(obj, self.version_field) if obj is not None else None
+
+    def get_collection_version(self, qs, view_kwargs):
+        """Retrieve the number of objects, the greatest value and the sum of the version field of a filtered
+        collection, the sum is only computed if the versions are numbers
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        :return tuple: the number of objects, the greatest version and the sum of the versions
+        """
+        objects = self.query(view_kwargs)
+        if objects is None:
+            objects = self.store.storage.objects.values()
+        objects = self.filter_query(objects, qs.filters)
+        versions = [getattr(obj, self.version_field) for obj in objects
+                    if getattr(obj, self.version_field) is not None]
+
+        if not versions:
+            return len(objects), None, None
+        if all(isinstance(version, Number) for version in versions):
+            return len(objects), max(versions), sum(versions)
+        return len(objects), max(versions), None
+
+    def publish(self, storage):
+        """Publish a modified storage of the store, the store must be locked. The cached responses are invalidated, or
+        when the operations are committed or rolled back if operations are processed.
+
+        :param Storage storage: the new storage
+        """
+        self.store.publish(storage)
+        if self.store.depth == 0:
+            self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """Invalidate the cached responses depending on the resource type of the data layer"""
+        invalidate_resource(getattr(self, 'resource', None))
+
+    def get_transaction(self):
+        """Return what holds the transaction of the operations: committing a store can't fail so the stores of every
+        memory data layer are committed together
+
+        :return: the transaction
+        """
+        return MemoryStore
+
+    def begin_operations(self):
+        """Process the next operations in a single transaction"""
+        self.store.begin()
+
+    def commit_operations(self):
+        """Commit the transaction of the operations"""
+        self.store.commit()
+        self.invalidate_cache()
+
+    def rollback_operations(self):
+        """Rollback the transaction of the operations, responses cached while it was processed are invalidated"""
+        self.store.rollback()
+        self.invalidate_cache()
+
+    def apply_relationships(self, data, obj):
+        """Apply relationship provided by data to obj
+
+        :param dict data: data provided by the client
+        :param obj: the object to plug relationships to
+        """
+        relationship_fields = get_relationships(self.resource.schema, model_field=True)
+        for key, value in data.items():
+            if key in relationship_fields:
+                if isinstance(value, list):
+                    related_objects = self.get_related_objects(key, [{'id': id_} for id_ in value])
+                else:
+                    related_objects = self.get_related_objects(key, [{'id': value}])[0] if value is not None else None
+                setattr(obj, key, related_objects)
+
+    def get_published_object(self, obj, view_kwargs):
+        """Retrieve the published version of an object, the store must be locked
+
+        :param obj: an object or a copy of an object
+        :param dict view_kwargs: kwargs from the resource view
+        :return: the published object
+        """
+        current = self.store.storage.objects.get(self.store.storage.key(obj))
+
+        if current is None:
+            url_field = getattr(self, 'url_field', 'id')
+            filter_value = view_kwargs.get(url_field, self.store.storage.key(obj))
+            raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, filter_value),
+                                 source={'parameter': url_field})
+
+        return current
+
+    def publish_object(self, current, obj):
+        """Replace the published version of an object with a modified copy in a new storage, the store must be locked
+
+        :param current: the published object
+        :param obj: the modified copy of the object
+        """
+        storage = self.store.writable()
+        storage.replace(current, obj)
+        self.publish(storage)
+
+    def set_relationship(self, current, relationship_field, related_objects):
+        """Publish a copy of an object with new related objects, the store must be locked
+
+        :param current: the published object
+        :param str relationship_field: the model attribute used for relationship
+        :param related_objects: the related object or the list of related objects
+        :return: the published copy
+        """
+        obj = copy(current)
+        setattr(obj, relationship_field, related_objects)
+        self.publish_object(current, obj)
+
+        return obj
+
+    def refresh_relationships(self, obj, copied=False):
+        """Replace the related objects of an object with their current version, related objects are copied when they
+        are updated so the objects referencing them keep the previous version
+
+        :param obj: an object
+        :param bool copied: True if obj is a copy which can be modified
+        :return: the object or a copy of the object with the current related objects
+        """
+        for relationship_field, related_store in getattr(self, 'relationships', dict()).items():
+            value = getattr(obj, relationship_field, None)
+            if value is None:
+                continue
+
+            storage = related_store.storage
+            if isinstance(value, (list, tuple)):
+                current = [storage.objects.get(storage.key(related_object), related_object)
+                           for related_object in value]
+                changed = any(related_object is not value_ for (related_object, value_) in zip(current, value))
+            else:
+                current = storage.objects.get(storage.key(value), value)
+                changed = current is not value
+
+            if changed:
+                if not copied:
+                    obj = copy(obj)
+                    copied = True
+                setattr(obj, relationship_field, current)
+
+        return obj
+
+    def get_related_keys(self, relationship_field, related_objects):
+        """Compute the keys of related objects, related objects are compared by key because the objects of a
+        relationship may be previous versions of the published objects
+
+        :param str relationship_field: the model attribute used for relationship
+        :param list related_objects: the related objects
+        :return list: the keys of the related objects, None for missing related objects
+        """
+        storage = self.relationships[relationship_field].storage
+
+        return [storage.key(related_object) if related_object is not None else None
+                for related_object in related_objects]
+
+    def get_related_objects(self, relationship_field, objs):
+        """Retrieve related objects from the memory store of a relationship
+
+        :param str relationship_field: the model attribute used for relationship
+        :param list objs: related objects as resource identifiers
+        :return list: the related objects in the order of objs
+        """
+        related_store = getattr(self, 'relationships', dict()).get(relationship_field)
+        if related_store is None:
+            raise Exception("You must provide the store of the relationship {} in the relationships parameter "
+                            "of the memory data layer of {}".format(relationship_field, self.resource.__name__))
+
+        related_objects = related_store.storage.objects
+        result = []
+        for obj in objs:
+            related_object = related_objects.get(str(obj['id']))
+            if related_object is None:
+                raise RelatedObjectNotFound("{}: {} not found".format(relationship_field, obj['id']))
+            result.append(related_object)
+
+        return result
+
+    def get_relationship_object(self, relationship_field, view_kwargs):
+        """Retrieve the object of a relationship endpoint
+
+        :param str relationship_field: the model attribute used for relationship
+        :param dict view_kwargs: kwargs from the resource view
+        :return: the object
+        """
+        obj = self.get_object(view_kwargs)
+
+        if obj is None:
+            url_field = getattr(self, 'url_field', 'id')
+            filter_value = view_kwargs[url_field]
+            raise ObjectNotFound('{}: {} not found'.format(self.model.__name__, filter_value),
+                                 source={'parameter': url_field})
+
+        if not hasattr(obj, relationship_field):
+            raise RelationNotFound("{} has no attribute {}".format(obj.__class__.__name__, relationship_field))
+
+        return obj
+
+    def index_lookup(self, storage, filter_info):
+        """Compute the keys of the objects matching the eq and in filters on attributes with a hash index
+
+        :param Storage storage: the storage
+        :param list filter_info: filters information
+        :return set: the keys of the candidate objects or None if no index can be used
+        """
+        keys = None
+        schema = self.resource.schema
+
+        for filter_ in filter_info:
+            if not isinstance(filter_, dict) or filter_.get('op') not in ('eq', '==', 'in_', 'in')\
+                    or 'val' not in filter_ or filter_.get('name') not in schema._declared_fields:
+                continue
+
+            index = storage.hash_indexes.get(get_model_field(schema, filter_['name']))
+            if index is None:
+                continue
+
+            node = Node(filter_, schema)
+            values = filter_['val'] if filter_['op'] in ('in_', 'in') else [filter_['val']]
+            try:
+                matches = set().union(*[index.get(node.deserialize(value), ()) for value in values])
+            except TypeError:
+                continue
+
+            keys = matches if keys is None else keys & matches
+
+        return keys
+
+    def filter_query(self, objects, filter_info):
+        """Filter objects with filters information
+
+        :param iterable objects: the objects
+        :param list filter_info: filters information
+        :return list: the objects matching the filters
+        """
+        if not filter_info:
+            return list(objects)
+
+        predicate = create_filters(filter_info, self.resource.schema)
+
+        return [obj for obj in objects if predicate(obj)]
+
+    def sort_query(self, storage, sort_info, keys):
+        """Retrieve objects sorted by a sorted index
+
+        :param Storage storage: the storage
+        :param list sort_info: sort information
+        :param set keys: the keys of the candidate objects or None for every object
+        :return list: the sorted objects or None if no sorted index can be used
+        """
+        if len(sort_info) != 1 or self.get_sort_attribute(sort_info[0]['field']) not in storage.sorted_indexes:
+            return None
+
+        index = storage.sorted_indexes[self.get_sort_attribute(sort_info[0]['field'])]
+        if sort_info[0]['order'] == 'desc':
+            index = reversed(index)
+
+        return [storage.objects[key] for (value, key) in index if keys is None or key in keys]
+
+    def sort_objects(self, objects, sort_info):
+        """Sort objects without index
+
+        :param list objects: the objects
+        :param list sort_info: sort information
+        :return list: the sorted objects
+        """
+        for sort_opt in reversed(sort_info):
+            attribute = self.get_sort_attribute(sort_opt['field'])
+            try:
+                objects = sorted(objects, key=lambda obj: sort_key(getattr(obj, attribute, None)),
+                                 reverse=sort_opt['order'] == 'desc')
+            except TypeError:
+                raise InvalidSort("Values of {} can't be sorted".format(sort_opt['field']))
+
+        return objects
+
+    def get_sort_attribute(self, field):
+        """Compute the attribute of the objects to sort by
+
+        :param str field: the field of the schema
+        :return str: the attribute
+        """
+        schema = self.resource.schema
+        if field not in schema._declared_fields:
+            raise InvalidSort("{} has no attribute {}".format(schema.__name__, field))
+
+        return get_model_field(schema, field)
+
+    def paginate_query(self, objects, paginate_info):
+        """Paginate objects according to jsonapi 1.0
+
+        :param list objects: the objects
+        :param dict paginate_info: pagination information
+        :return list: the objects of the page
+        """
+        if int(paginate_info.get('size', 1)) == 0:
+            return objects
+
+        page_size = int(paginate_info.get('size', 0)) or current_app.config['PAGE_SIZE']
+        start = (int(paginate_info.get('number', 1) or 1) - 1) * page_size
+
+        return objects[start:start + page_size]
+
+    def query(self, view_kwargs):
+        """Retrieve the objects of a collection, indexes are only used when this method returns None
+
+        :param dict view_kwargs: kwargs from the resource view
+        :return iterable: the objects or None for every object of the data layer
+        """
+        return None
+
+    def before_create_object(self, data, view_kwargs):
+        """Provide additional data before object creation
+
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_create_object(self, obj, data, view_kwargs):
+        """Provide additional data after object creation
+
+        :param obj: an object from data layer
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def before_get_object(self, view_kwargs):
+        """Make work before to retrieve an object
+
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_get_object(self, obj, view_kwargs):
+        """Make work after to retrieve an object
+
+        :param obj: an object from data layer
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def before_get_collection(self, qs, view_kwargs):
+        """Make work before to retrieve a collection of objects
+
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_get_collection(self, collection, qs, view_kwargs):
+        """Make work after to retrieve a collection of objects
+
+        :param iterable collection: the collection of objects
+        :param QueryStringManager qs: a querystring manager to retrieve information from url
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        return collection
+
+    def before_update_object(self, obj, data, view_kwargs):
+        """Make checks or provide additional data before update object
+
+        :param obj: an object from data layer
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_update_object(self, obj, data, view_kwargs):
+        """Make work after update object
+
+        :param obj: an object from data layer
+        :param dict data: the data validated by marshmallow
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def before_delete_object(self, obj, view_kwargs):
+        """Make checks before delete object
+
+        :param obj: an object from data layer
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_delete_object(self, obj, view_kwargs):
+        """Make work after delete object
+
+        :param obj: an object from data layer
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def before_create_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
+        """Make work before to create a relationship
+
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_create_relationship(self, obj, updated, json_data, relationship_field, related_id_field, view_kwargs):
+        """Make work after to create a relationship
+
+        :param obj: an object from data layer
+        :param bool updated: True if object was updated else False
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def before_get_relationship(self, relationship_field, related_type_, related_id_field, view_kwargs):
+        """Make work before to get information about a relationship
+
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_type_: the related resource type
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_get_relationship(self, obj, related_objects, relationship_field, related_type_, related_id_field,
+                               view_kwargs):
+        """Make work after to get information about a relationship
+
+        :param obj: an object from data layer
+        :param iterable related_objects: related objects of the object
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_type_: the related resource type
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def before_update_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
+        """Make work before to update a relationship
+
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_update_relationship(self, obj, updated, json_data, relationship_field, related_id_field, view_kwargs):
+        """Make work after to update a relationship
+
+        :param obj: an object from data layer
+        :param bool updated: True if object was updated else False
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def before_delete_relationship(self, json_data, relationship_field, related_id_field, view_kwargs):
+        """Make work before to delete a relationship
+
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
+
+    def after_delete_relationship(self, obj, updated, json_data, relationship_field, related_id_field, view_kwargs):
+        """Make work after to delete a relationship
+
+        :param obj: an object from data layer
+        :param bool updated: True if object was updated else False
+        :param dict json_data: the request params
+        :param str relationship_field: the model attribute used for relationship
+        :param str related_id_field: the identifier field of the related model
+        :param dict view_kwargs: kwargs from the resource view
+        """
+        pass
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""Full-text search backends used by the sqlalchemy data layer to search with the q querystring parameter"""
+
+from sqlalchemy import func, literal_column, table, column, desc
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.inspection import inspect
+
+from flask_rest_jsonapi.exceptions import BadRequest
+
+
+class BaseSearch(object):
+    """Base class of a search backend. If you want to create your own backend you must inherit from this base class"""
+
+    def search_query(self, query, model, terms):
+        """Restrict a query to the objects matching search terms
+
+        :param Query query: sqlalchemy query
+        :param DeclarativeMeta model: the model searched
+        :param str terms: the search terms from the q querystring parameter
+        :return tuple: the query and an order by clause sorting objects by relevance
+        """
+        raise NotImplementedError
+
+    def search_error(self, error):
+        """Convert an error raised by the database when a query searching with the backend is executed
+
+        :param DBAPIError error: the error of the database
+        :return JsonApiException: the error sent to the client or None if the search terms didn't cause the error
+        """
+        return None
+
+
+class SqliteFtsSearch(BaseSearch):
+    """Search backend based on a SQLite FTS5 virtual table indexing columns of the model
+
+    The virtual table uses the table of the model as external content and the primary key of the model as rowid. Use
+    create_statements to create it with the triggers keeping it up to date.
+    """
+
+    def __init__(self, table_name, raw=False):
+        """Initialize a SQLite FTS5 search backend
+
+        :param str table_name: the name of the FTS5 virtual table
+        :param bool raw: if True search terms are used as a FTS5 query, else each term must be in the indexed columns
+        """
+        self.table_name = table_name
+        self.raw = raw
+
+    def search_query(self, query, model, terms):
+        """Restrict a query to the objects matching search terms
+
+        :param Query query: sqlalchemy query
+        :param DeclarativeMeta model: the model searched
+        :param str terms: the search terms from the q querystring parameter
+        :return tuple: the query and an order by clause sorting objects by relevance
+        """
+        fts = table(self.table_name, column('rowid'), column('rank'))
+        primary_key = getattr(model, inspect(model).primary_key[0].key)
+        match_expression = self.match_expression(terms)
+
+        query = query.join(fts, fts.c.rowid == primary_key)\
+                     .filter(literal_column(self.table_name).op('MATCH')(match_expression))
+
+        # the rank of FTS5 is lower for better matches
+        return query, fts.c.rank
+
+    def search_error(self, error):
+        """Convert the syntax errors of a FTS5 query provided by the client, they are only detected when the query is
+        executed
+
+        :param DBAPIError error: the error of the database
+        :return JsonApiException: the error sent to the client or None if the search terms didn't cause the error
+        """
+        if self.raw is True and isinstance(error, OperationalError):
+            return BadRequest("Invalid search query: {}".format(error.orig), source={'parameter': 'q'})
+        return None
+
+    def match_expression(self, terms):
+        """Compute the FTS5 query of search terms
+
+        :param str terms: the search terms
+        :return str: the FTS5 query
+        """
+        if self.raw is True:
+            return terms
+        return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms.split())
+
+    def create_statements(self, model, columns):
+        """Compute the statements creating the FTS5 virtual table of a model and the triggers keeping it up to date
+
+        :param DeclarativeMeta model: the model searched
+        :param list columns: the names of the columns to index
+        :return list: the SQL statements
+        """
+        content_table = model.__table__.name
+        primary_key = inspect(model).primary_key[0].name
+        fts_columns = ', '.join(columns)
+        new_values = ', '.join('new.{}'.format(column_) for column_ in columns)
+        old_values = ', '.join('old.{}'.format(column_) for column_ in columns)
+        values = {'fts': self.table_name,
+                  'table': content_table,
+                  'pk': primary_key,
+                  'columns': fts_columns,
+                  'new': new_values,
+                  'old': old_values}
+
+        statements = ["CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', content_rowid='{pk}')",
+                      "CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                      "INSERT INTO {fts}(rowid, {columns}) VALUES (new.{pk}, {new}); END",
+                      "CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                      "INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.{pk}, {old}); END",
+                      "CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+                      "INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.{pk}, {old}); "
+                      "INSERT INTO {fts}(rowid, {columns}) VALUES (new.{pk}, {new}); END",
+                      "INSERT INTO {fts}({fts}) VALUES ('rebuild')"]
+
+        return [statement.format(**values) for statement in statements]
+
+    def drop_statements(self):
+        """Compute the statements dropping the FTS5 virtual table and its triggers
+
+        :return list: the SQL statements
+        """
+        return ["DROP TRIGGER IF EXISTS {}_{}".format(self.table_name, suffix) for suffix in ('ai', 'ad', 'au')] +\
+            ["DROP TABLE IF EXISTS {}".format(self.table_name)]
+
+
+class PostgresTsvectorSearch(BaseSearch):
+    """Search backend based on the text search of PostgreSQL
+
+    Documents are read from a tsvector column, ideally indexed with a GIN index, or computed from text columns.
+    """
+
+    def __init__(self, vector=None, columns=None, config='english', parser='plainto_tsquery'):
+        """Initialize a PostgreSQL text search backend
+
+        :param str vector: the name of a tsvector column of the model
+        :param list columns: the names of text columns to compute the tsvector from if there is no tsvector column
+        :param str config: the text search configuration
+        :param str parser: the function turning search terms into a tsquery: plainto_tsquery, websearch_to_tsquery or
+                           to_tsquery
+        """
+        if vector is None and not columns:
+            raise Exception("You must provide a tsvector column or text columns to PostgresTsvectorSearch")
+
+        self.vector = vector
+        self.columns = columns
+        self.config = config
+        self.parser = parser
+
+    def search_query(self, query, model, terms):
+        """Restrict a query to the objects matching search terms
+
+        :param Query query: sqlalchemy query
+        :param DeclarativeMeta model: the model searched
+        :param str terms: the search terms from the q querystring parameter
+        :return tuple: the query and an order by clause sorting objects by relevance
+        """
+        if self.vector is not None:
+            vector = getattr(model, self.vector)
+        else:
+            document = func.concat_ws(' ', *[getattr(model, column_) for column_ in self.columns])
+            vector = func.to_tsvector(self.config, document)
+
+        tsquery = getattr(func, self.parser)(self.config, terms)
+
+        return query.filter(vector.op('@@')(tsquery)), desc(func.ts_rank(vector, tsquery))
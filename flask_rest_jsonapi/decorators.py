@@ -4,47 +4,65 @@
 
 from functools import wraps
 
-from flask import request, make_response, jsonify
+from flask import request, make_response
 
 from flask_rest_jsonapi.errors import jsonapi_errors
+from flask_rest_jsonapi.encoders import make_json_response
+from flask_rest_jsonapi.cache import get_cache_backend
 
 
-def check_headers(func):
+JSONAPI_MEDIA_TYPE = 'application/vnd.api+json'
+ATOMIC_MEDIA_TYPE = 'application/vnd.api+json; ext="https://jsonapi.org/ext/atomic"'
+
+
+def check_headers(func, media_types=(JSONAPI_MEDIA_TYPE,)):
     """Check headers according to jsonapi reference
 
     :param callable func: the function to decorate
+    :param tuple media_types: the media types accepted in addition to application/vnd.api+json without parameters
     :return callable: the wrapped function
     """
+    media_types = {''.join(media_type.split()) for media_type in media_types}
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         if request.method in ('POST', 'PATCH'):
             if 'Content-Type' in request.headers and\
                     'application/vnd.api+json' in request.headers['Content-Type'] and\
-                    request.headers['Content-Type'] != 'application/vnd.api+json':
-                error = jsonify(jsonapi_errors([{'source': '',
-                                                 'detail': "Content-Type header must be application/vnd.api+json",
-                                                 'title': 'Invalid request header',
-                                                 'status': '415'}]))
-                return make_response(error, 415, {'Content-Type': 'application/vnd.api+json'})
+                    ''.join(request.headers['Content-Type'].split()) not in media_types:
+                error = jsonapi_errors([{'source': '',
+                                         'detail': "Content-Type header must be application/vnd.api+json",
+                                         'title': 'Invalid request header',
+                                         'status': '415'}])
+                return make_json_response(error, 415)
         if 'Accept' in request.headers:
             flag = False
             for accept in request.headers['Accept'].split(','):
-                if accept.strip() == 'application/vnd.api+json':
+                if ''.join(accept.split()) in media_types:
                     flag = False
                     break
                 if 'application/vnd.api+json' in accept and accept.strip() != 'application/vnd.api+json':
                     flag = True
             if flag is True:
-                error = jsonify(jsonapi_errors([{'source': '',
-                                                 'detail': ('Accept header must be application/vnd.api+json without'
-                                                            'media type parameters'),
-                                                 'title': 'Invalid request header',
-                                                 'status': '406'}]))
-                return make_response(error, 406, {'Content-Type': 'application/vnd.api+json'})
+                error = jsonapi_errors([{'source': '',
+                                         'detail': ('Accept header must be application/vnd.api+json without'
+                                                    'media type parameters'),
+                                         'title': 'Invalid request header',
+                                         'status': '406'}])
+                return make_json_response(error, 406)
         return func(*args, **kwargs)
     return wrapper
 
 
+def check_atomic_headers(func):
+    """Check headers of the operations endpoint which also accepts the media type of the Atomic Operations extension
+
+    :param callable func: the function to decorate
+    :return callable: the wrapped function
+    """
+    return check_headers(func, media_types=(JSONAPI_MEDIA_TYPE, ATOMIC_MEDIA_TYPE))
+
+
 def check_method_requirements(func):
     """Check methods requirements
 
@@ -63,3 +81,25 @@ def check_method_requirements(func):
 
         return func(*args, **kwargs)
     return wrapper
+
+
+def check_cache(func):
+    """Answer a GET request with the cached response of the resource manager if there is one. The cache is looked up
+    by the method itself so the decorators plugged to the method by the api (oauth, permissions) are checked first.
+
+    :param callable func: the function to decorate
+    :return callable: the wrapped function
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        resource = args[0]
+        if request.method in ('GET', 'HEAD') and resource.cache_ttl and get_cache_backend() is not None:
+            resource._cache_key = resource.get_cache_key(args[1:], kwargs)
+            if resource._cache_key is not None:
+                cached = get_cache_backend().get(resource._cache_key)
+                if cached is not None:
+                    resource._cache_hit = True
+                    return make_response(cached['body'], cached['status'], cached['headers'])
+
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""JSON encoders used to serialize the documents sent by the Api directly to bytes"""
+
+import json
+from datetime import datetime, date, time
+from decimal import Decimal
+from uuid import UUID
+
+from flask import current_app, has_app_context
+
+from flask_rest_jsonapi.timing import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONEncoder(object):
+    """Base class of a JSON encoder. If you want to plug your own encoder you must inherit from this base class"""
+
+    def encode(self, data):
+        """Serialize a document
+
+        :param data: the document
+        :return bytes: the serialized document
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def default(obj):
+        """Serialize values unknown to the encoder. Every encoder uses it so a document is serialized the same way
+        whatever the encoder: dates and times as ISO 8601 strings, decimals and uuids as strings. The other values
+        are serialized by the JSON encoder of the application (the JSON provider since Flask 2.2).
+
+        :param obj: a value
+        :return: a serializable value
+        """
+        if isinstance(obj, (datetime, date, time)):
+            return obj.isoformat()
+        if isinstance(obj, (Decimal, UUID)):
+            return str(obj)
+
+        if has_app_context():
+            provider = getattr(current_app, 'json', None)
+            if provider is not None:
+                app_default = getattr(provider, 'default', None)
+            else:
+                app_default = current_app.json_encoder().default
+            if app_default is not None:
+                return app_default(obj)
+
+        raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+
+class StdlibJSONEncoder(JSONEncoder):
+    """Encoder based on the json module of the standard library"""
+
+    def encode(self, data):
+        """Serialize a document
+
+        :param data: the document
+        :return bytes: the serialized document
+        """
+        return json.dumps(data, default=self.default, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonEncoder(JSONEncoder):
+    """Encoder based on orjson which serializes documents directly to bytes. Dates and times are passed to default
+    so they are serialized like the other encoders do.
+    """
+
+    def __init__(self):
+        """Initialize an orjson encoder"""
+        if orjson is None:
+            raise Exception("You must install orjson to use OrjsonEncoder")
+
+    def encode(self, data):
+        """Serialize a document
+
+        :param data: the document
+        :return bytes: the serialized document
+        """
+        return orjson.dumps(data,
+                            default=self.default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def get_default_encoder():
+    """Return the fastest encoder available
+
+    :return JSONEncoder: an encoder
+    """
+    if orjson is not None:
+        return OrjsonEncoder()
+    return StdlibJSONEncoder()
+
+
+default_encoder = get_default_encoder()
+
+
+def get_encoder():
+    """Return the encoder configured on the Api of the current application
+
+    :return JSONEncoder: an encoder
+    """
+    return current_app.extensions.get('flask-rest-jsonapi', dict()).get('json_encoder') or default_encoder
+
+
+def make_json_response(data, status=200, headers=None):
+    """Create a JSON:API response with the encoder of the current application
+
+    :param data: the document
+    :param int status: the status code of the response
+    :param dict headers: additional headers
+    :return Response: the response
+    """
+    with timed('encode'):
+        body = get_encoder().encode(data)
+
+    return current_app.response_class(body,
+                                      status=status,
+                                      headers=headers,
+                                      content_type='application/vnd.api+json')
@@ -74,6 +74,15 @@ class InvalidSort(BadRequest):
     source = {'parameter': 'sort'}
 
 
+class InvalidGroup(BadRequest):
+    """Error to warn that a field specified in group or aggregate querystring parameters can't be grouped or
+    aggregated
+    """
+
+    title = 'Invalid group querystring parameter.'
+    source = {'parameter': 'group'}
+
+
 class ObjectNotFound(JsonApiException):
     """Error to warn that an object is not found in a database"""
 
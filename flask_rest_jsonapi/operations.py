@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+
+"""Endpoint of the Atomic Operations extension of the jsonapi specification: a list of add, update and remove
+operations processed through the data layers of the resource managers in a single transaction
+"""
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Response
+from flask import request, current_app
+from flask.views import MethodView
+from marshmallow_jsonapi.exceptions import IncorrectTypeError
+from marshmallow import ValidationError
+
+from flask_rest_jsonapi.errors import jsonapi_errors
+from flask_rest_jsonapi.encoders import make_json_response
+from flask_rest_jsonapi.querystring import QueryStringManager as QSManager
+from flask_rest_jsonapi.exceptions import BadRequest, InvalidType, JsonApiException, RelationNotFound
+from flask_rest_jsonapi.decorators import check_atomic_headers, ATOMIC_MEDIA_TYPE
+from flask_rest_jsonapi.timing import collect_timings
+from flask_rest_jsonapi.query_counter import count_queries
+from flask_rest_jsonapi.resource import ResourceList, ResourceDetail, DEFAULT_DECORATORS
+from flask_rest_jsonapi.schema import compute_schema, get_relationships, get_model_field
+
+OPERATIONS = ('add', 'update', 'remove')
+
+
+class OperationErrors(Exception):
+    """Errors of the validation of the data of an operation"""
+
+    def __init__(self, errors, status):
+        """Initialize operation errors
+
+        :param list errors: the jsonapi errors
+        :param str status: the status of the errors
+        """
+        self.errors = errors
+        self.status = status
+
+
+class Operations(MethodView):
+    """Resource processing the operations of the Atomic Operations extension"""
+
+    decorators = (check_atomic_headers, collect_timings, count_queries)
+
+    def __init__(self, api):
+        """Initialize the operations endpoint
+
+        :param Api api: the api whose resource managers process the operations
+        """
+        self.api = api
+
+    def post(self):
+        """Process a list of operations in a single transaction"""
+        json_data = request.get_json() or {}
+
+        operations = json_data.get('atomic:operations')
+        if not isinstance(operations, list) or not operations:
+            error = BadRequest('You must provide a list of operations with an "atomic:operations" node',
+                               source={'pointer': '/atomic:operations'})
+            return self.make_response(jsonapi_errors([error.to_dict()]), error.status)
+
+        lids = dict()
+        data_layers = []
+        results = []
+
+        try:
+            for index, operation in enumerate(operations):
+                pointer = '/atomic:operations/{}'.format(index)
+                try:
+                    results.append(self.process_operation(operation, lids, data_layers))
+                except JsonApiException as e:
+                    e.source = self.prefix_source(e.source, pointer)
+                    raise
+                except OperationErrors as e:
+                    for error in e.errors:
+                        error['source'] = self.prefix_source(error.get('source'), pointer)
+                    raise
+
+            for data_layer in data_layers:
+                data_layer.commit_operations()
+        except JsonApiException as e:
+            self.rollback(data_layers)
+            return self.make_response(jsonapi_errors([e.to_dict()]), e.status)
+        except OperationErrors as e:
+            self.rollback(data_layers)
+            return self.make_response(jsonapi_errors(e.errors), e.status)
+        except Exception as e:
+            self.rollback(data_layers)
+            if current_app.config['DEBUG'] is True:
+                raise e
+            exc = JsonApiException(current_app.config.get('GLOBAL_ERROR_MESSAGE') or str(e))
+            return self.make_response(jsonapi_errors([exc.to_dict()]), exc.status)
+
+        if not any(results):
+            return current_app.response_class(status=204)
+
+        return self.make_response({'atomic:results': results, 'jsonapi': {'version': '1.1'}}, 200)
+
+    def process_operation(self, operation, lids, data_layers):
+        """Process an operation
+
+        :param dict operation: the operation
+        :param dict lids: the ids of the objects created by previous operations by type and local id
+        :param list data_layers: the data layers of the transaction
+        :return dict: the result of the operation
+        """
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise BadRequest("op must be one of {}".format(', '.join(OPERATIONS)), source={'pointer': '/op'})
+        if 'href' in operation:
+            raise BadRequest("Operations targeted with href are not supported, use ref", source={'pointer': '/href'})
+
+        # the local id of the object created by an add operation is the only one which can't be resolved
+        lid = None
+        if operation['op'] == 'add' and operation.get('ref') is None and isinstance(operation.get('data'), dict):
+            operation = dict(operation, data=dict(operation['data']))
+            lid = operation['data'].pop('lid', None)
+
+        operation = self.resolve_lids(operation, lids)
+        ref = operation.get('ref')
+
+        if ref is not None and ref.get('relationship') is not None:
+            return self.process_relationship_operation(operation, data_layers)
+
+        if operation['op'] == 'add':
+            return self.add(operation, lid, lids, data_layers)
+
+        return self.update(operation, data_layers) if operation['op'] == 'update' else\
+            self.remove(operation, data_layers)
+
+    def add(self, operation, lid, lids, data_layers):
+        """Create an object
+
+        :param dict operation: the operation
+        :param str lid: the local id of the object
+        :param dict lids: the ids of the objects created by previous operations by type and local id
+        :param list data_layers: the data layers of the transaction
+        :return dict: the result of the operation
+        """
+        json_data = {'data': operation.get('data') or {}}
+
+        resource = self.get_resource(ResourceList, json_data['data'].get('type'), '/data/type', 'POST')
+        self.begin(resource, data_layers)
+
+        def post(resource_, *args, **kwargs):
+            schema = self.get_schema(resource_, json_data, 'post_schema_kwargs')
+            data = self.load(schema, json_data)
+
+            resource_.before_post(args, kwargs, data=data)
+
+            obj = resource_.create_object(data, kwargs)
+
+            result = schema.dump(obj).data
+
+            resource_.after_post(result)
+
+            return result
+
+        result = self.dispatch(resource, 'POST', post, dict())
+
+        if lid is not None:
+            lids[(json_data['data']['type'], lid)] = result['data']['id']
+
+        return {'data': result['data']}
+
+    def update(self, operation, data_layers):
+        """Update an object
+
+        :param dict operation: the operation
+        :param list data_layers: the data layers of the transaction
+        :return dict: the result of the operation
+        """
+        json_data = {'data': operation.get('data') or {}}
+        ref = operation.get('ref') or json_data['data']
+
+        if ref.get('type') != json_data['data'].get('type'):
+            raise InvalidType('The type of data does not match the type of ref', source={'pointer': '/data/type'})
+        if 'id' not in json_data['data']:
+            raise BadRequest('Missing id in "data" node', source={'pointer': '/data/id'})
+        if ref.get('id') != json_data['data']['id']:
+            raise BadRequest('The id of data does not match the id of ref', source={'pointer': '/data/id'})
+
+        resource = self.get_resource(ResourceDetail, ref['type'], '/ref/type', 'PATCH')
+        self.begin(resource, data_layers)
+
+        def patch(resource_, *args, **kwargs):
+            schema = self.get_schema(resource_, json_data, 'patch_schema_kwargs', partial=True)
+            data = self.load(schema, json_data)
+
+            resource_.before_patch(args, kwargs, data=data)
+
+            obj = resource_.update_object(data, QSManager(dict()), kwargs)
+
+            result = schema.dump(obj).data
+
+            resource_.after_patch(result)
+
+            return result
+
+        result = self.dispatch(resource, 'PATCH', patch, self.get_view_kwargs(resource, ref))
+
+        return {'data': result['data']}
+
+    def remove(self, operation, data_layers):
+        """Delete an object
+
+        :param dict operation: the operation
+        :param list data_layers: the data layers of the transaction
+        :return dict: the result of the operation
+        """
+        ref = operation.get('ref')
+        if ref is None or 'id' not in ref:
+            raise BadRequest('You must provide the object to remove with a "ref" node', source={'pointer': '/ref'})
+
+        resource = self.get_resource(ResourceDetail, ref.get('type'), '/ref/type', 'DELETE')
+        self.begin(resource, data_layers)
+
+        def delete(resource_, *args, **kwargs):
+            resource_.before_delete(args, kwargs)
+
+            resource_.delete_object(kwargs)
+
+            resource_.after_delete(dict())
+
+        self.dispatch(resource, 'DELETE', delete, self.get_view_kwargs(resource, ref))
+
+        return dict()
+
+    def process_relationship_operation(self, operation, data_layers):
+        """Add, replace or remove related objects of a relationship
+
+        :param dict operation: the operation
+        :param list data_layers: the data layers of the transaction
+        :return dict: the result of the operation
+        """
+        ref = operation['ref']
+        if 'id' not in ref:
+            raise BadRequest('Missing id in "ref" node', source={'pointer': '/ref/id'})
+        if 'data' not in operation:
+            raise BadRequest('You must provide data with a "data" node', source={'pointer': '/data'})
+
+        resource = self.get_resource(ResourceDetail, ref.get('type'), '/ref/type', 'PATCH')
+        schema = resource.schema
+        relationship_field = ref['relationship']
+        if relationship_field not in get_relationships(schema):
+            raise RelationNotFound("{} has no attribute {}".format(schema.__name__, relationship_field),
+                                   source={'pointer': '/ref/relationship'})
+
+        related_type_ = schema._declared_fields[relationship_field].type_
+        related_id_field = schema._declared_fields[relationship_field].id_field
+        model_relationship_field = get_model_field(schema, relationship_field)
+
+        identifiers = operation['data'] if isinstance(operation['data'], list) else [operation['data']]
+        for identifier in identifiers:
+            if identifier is None:
+                continue
+            if 'id' not in identifier:
+                raise BadRequest('Missing id in "data" node', source={'pointer': '/data/id'})
+            if identifier.get('type') != related_type_:
+                raise InvalidType('The type provided does not match the resource type',
+                                  source={'pointer': '/data/type'})
+
+        self.begin(resource, data_layers)
+
+        def patch(resource_, *args, **kwargs):
+            process = {'add': resource_._data_layer.create_relationship,
+                       'update': resource_._data_layer.update_relationship,
+                       'remove': resource_._data_layer.delete_relationship}[operation['op']]
+            process({'data': operation['data']}, model_relationship_field, related_id_field, kwargs)
+
+        self.dispatch(resource, 'PATCH', patch, self.get_view_kwargs(resource, ref))
+
+        return dict()
+
+    def get_resource(self, resource_type, type_, pointer, method):
+        """Retrieve the first resource manager of a type registered in the api which allows an http method
+
+        :param type resource_type: ResourceList or ResourceDetail
+        :param str type_: the type of the objects
+        :param str pointer: the pointer of the type in the operation
+        :param str method: the http method equivalent to the operation
+        :return Resource: an instance of the resource manager
+        """
+        resources = [resource for resource in self.api.resource_registry
+                     if issubclass(resource, resource_type) and hasattr(resource, '_data_layer')
+                     and getattr(getattr(getattr(resource, 'schema', None), 'opts', None), 'type_', None) == type_]
+        if not resources:
+            raise BadRequest("There is no resource manager of type {}".format(type_), source={'pointer': pointer})
+
+        for resource in resources:
+            if method in (getattr(resource, 'methods', None) or ()):
+                return resource()
+
+        raise JsonApiException("The resource managers of type {} don't allow the {} method".format(type_, method),
+                               source={'pointer': pointer}, title='Method not allowed', status='405')
+
+    def get_schema(self, resource, json_data, schema_kwargs_name, partial=False):
+        """Compute the schema of a resource manager
+
+        :param Resource resource: the resource manager
+        :param dict json_data: the data of the operation
+        :param str schema_kwargs_name: the name of the attribute of the resource manager with the schema kwargs
+        :param bool partial: True to load partial data
+        :return Schema: the schema
+        """
+        schema_kwargs = dict(getattr(resource, schema_kwargs_name, dict()))
+        if partial is True:
+            schema_kwargs['partial'] = True
+
+        qs = QSManager(dict())
+
+        return compute_schema(resource.get_schema(json_data, is_load=True), schema_kwargs, qs, qs.include)
+
+    @staticmethod
+    def load(schema, json_data):
+        """Validate the data of an operation
+
+        :param Schema schema: the schema
+        :param dict json_data: the data of the operation
+        :return dict: the data validated by marshmallow
+        """
+        try:
+            data, errors = schema.load(json_data)
+        except IncorrectTypeError as e:
+            errors = e.messages
+            for error in errors['errors']:
+                error['status'] = '409'
+                error['title'] = "Incorrect type"
+            raise OperationErrors(errors['errors'], '409')
+        except ValidationError as e:
+            errors = e.messages
+
+        if errors:
+            for error in errors['errors']:
+                error['status'] = '422'
+                error['title'] = "Validation error"
+            raise OperationErrors(errors['errors'], '422')
+
+        return data
+
+    @staticmethod
+    def get_view_kwargs(resource, ref):
+        """Compute the view kwargs targeting an object
+
+        :param Resource resource: the resource manager
+        :param dict ref: the reference of the object
+        :return dict: the view kwargs
+        """
+        return {resource.data_layer.get('url_field', 'id'): ref['id']}
+
+    def dispatch(self, resource, method, process, view_kwargs):
+        """Process an operation through the decorators of a resource manager and the decorators plugged by the api to
+        its method (oauth, permissions) as if the method was called by the view of the resource manager
+
+        :param Resource resource: the resource manager
+        :param str method: the http method equivalent to the operation
+        :param callable process: the function processing the operation called like a method of the resource manager
+        :param dict view_kwargs: the view kwargs
+        :return: the result of process
+        """
+        process.__name__ = method.lower()
+        decorated = self.api.decorate_method(type(resource), method, process)
+
+        def view(**kwargs):
+            return decorated(resource, **kwargs)
+
+        for decorator in resource.decorators:
+            if decorator not in DEFAULT_DECORATORS and decorator not in self.api.decorators:
+                view = decorator(view)
+
+        try:
+            result = view(**view_kwargs)
+        except HTTPException as e:
+            raise JsonApiException(e.description, title=e.name, status=str(e.code))
+
+        if isinstance(result, Response):
+            # a decorator answered instead of the resource manager so the operation was not processed
+            raise JsonApiException(result.status, status=str(result.status_code))
+
+        return result
+
+    @staticmethod
+    def begin(resource, data_layers):
+        """Add the data layer of a resource manager to the transaction. The data layers of the operations must share
+        a single transaction, else a failure while committing one of them could not roll back the others.
+
+        :param Resource resource: the resource manager
+        :param list data_layers: the data layers of the transaction
+        """
+        if resource._data_layer not in data_layers:
+            if data_layers and resource._data_layer.get_transaction() != data_layers[0].get_transaction():
+                raise BadRequest("Operations can't span resources stored in different transactions")
+            resource._data_layer.begin_operations()
+            data_layers.append(resource._data_layer)
+
+    @staticmethod
+    def rollback(data_layers):
+        """Rollback the transaction
+
+        :param list data_layers: the data layers of the transaction
+        """
+        for data_layer in data_layers:
+            data_layer.rollback_operations()
+
+    def resolve_lids(self, value, lids):
+        """Replace local ids of objects created by previous operations with their ids
+
+        :param value: a node of the operation
+        :param dict lids: the ids of the objects created by previous operations by type and local id
+        :return: the node with resolved local ids
+        """
+        if isinstance(value, list):
+            return [self.resolve_lids(item, lids) for item in value]
+
+        if not isinstance(value, dict):
+            return value
+
+        result = {key: self.resolve_lids(item, lids) for (key, item) in value.items()}
+        if 'lid' in value and 'id' not in value:
+            if (value.get('type'), value['lid']) not in lids:
+                raise BadRequest("Unknown local id {}".format(value['lid']), source={'pointer': '/lid'})
+            result['id'] = lids[(value.get('type'), value['lid'])]
+            del result['lid']
+
+        return result
+
+    @staticmethod
+    def prefix_source(source, pointer):
+        """Prefix the pointer of the source of an error with the pointer of its operation
+
+        :param dict source: the source of the error
+        :param str pointer: the pointer of the operation
+        :return dict: the source of the error
+        """
+        if isinstance(source, dict) and 'pointer' in source:
+            return dict(source, pointer=pointer + source['pointer'])
+
+        return {'pointer': pointer}
+
+    @staticmethod
+    def make_response(data, status):
+        """Create a response with the media type of the Atomic Operations extension
+
+        :param dict data: the document
+        :param status: the status code of the response
+        :return Response: the response
+        """
+        response = make_json_response(data, int(status))
+        response.headers['Content-Type'] = ATOMIC_MEDIA_TYPE
+
+        return response
@@ -6,17 +6,114 @@ from __future__ import division
 from six.moves.urllib.parse import urlencode
 from math import ceil
 from copy import copy
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
+import json
+import re
 
 from flask import current_app
 
+from flask_rest_jsonapi.exceptions import BadRequest
 
-def add_pagination_links(data, object_count, querystring, base_url):
+ISO_DATETIME = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{6}))?'
+                          r'(?:([+-])(\d{2}):(\d{2})(?::(\d{2}))?)?$')
+
+
+class UnknownCount(object):
+    """Stand-in for the number of objects of a collection that was not counted exactly"""
+
+    def __init__(self, has_next, estimate=None):
+        """Initialize an unknown count
+
+        :param bool has_next: True if objects follow the page
+        :param int estimate: an estimation of the number of objects
+        """
+        self.has_next = has_next
+        self.estimate = estimate
+
+
+def encode_cursor(values):
+    """Encode the sort key values of an object into an opaque cursor, dates and datetimes are kept as ISO 8601 strings
+    with the offset of aware datetimes, decimals and uuids as strings
+
+    :param list values: the values of the sort keys of an object
+    :return str: the cursor
+    """
+    def default(value):
+        if isinstance(value, datetime):
+            return {'datetime': value.isoformat()}
+        if isinstance(value, date):
+            return {'date': value.isoformat()}
+        if isinstance(value, Decimal):
+            return {'decimal': str(value)}
+        if isinstance(value, UUID):
+            return {'uuid': str(value)}
+        raise TypeError("{} is not serializable in a cursor".format(repr(value)))
+
+    return urlsafe_b64encode(json.dumps(values, default=default).encode('utf-8')).decode('ascii')
+
+
+def parse_datetime(value):
+    """Parse a datetime serialized by datetime.isoformat
+
+    :param str value: the ISO 8601 string
+    :return datetime: the datetime, aware if the string has an offset
+    """
+    match = ISO_DATETIME.match(value)
+    if match is None:
+        raise ValueError("{} is not an ISO 8601 datetime".format(value))
+
+    (year, month, day, hour, minute, second, microsecond,
+     sign, offset_hours, offset_minutes, offset_seconds) = match.groups()
+    tzinfo = None
+    if sign is not None:
+        offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes), seconds=int(offset_seconds or 0))
+        tzinfo = timezone(-offset if sign == '-' else offset)
+
+    return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), int(microsecond or 0),
+                    tzinfo=tzinfo)
+
+
+def decode_cursor(cursor, parameter):
+    """Decode a cursor created by encode_cursor
+
+    :param str cursor: the cursor
+    :param str parameter: the querystring parameter the cursor comes from
+    :return list: the values of the sort keys
+    """
+    def object_hook(value):
+        if 'datetime' in value:
+            return parse_datetime(value['datetime'])
+        if 'date' in value:
+            return parse_datetime(value['date'] + 'T00:00:00').date()
+        if 'decimal' in value:
+            return Decimal(value['decimal'])
+        if 'uuid' in value:
+            return UUID(value['uuid'])
+        return value
+
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'), object_hook=object_hook)
+    except (TypeError, ValueError, ArithmeticError):
+        raise BadRequest("Invalid cursor", source={'parameter': parameter})
+
+    if not isinstance(values, list):
+        raise BadRequest("Invalid cursor", source={'parameter': parameter})
+
+    return values
+
+
+def add_pagination_links(data, object_count, querystring, base_url, cursors=None):
     """Add pagination links to result
 
     :param dict data: the result of the view
-    :param int object_count: number of objects in result
+    :param object_count: number of objects in result or an UnknownCount
+    :type object_count: int or UnknownCount
     :param QueryStringManager querystring: the managed querystring fields and values
     :param str base_url: the base url for pagination
+    :param dict cursors: the cursors of the first and the last objects of the page with cursor pagination
     """
     links = {}
     all_qs_args = copy(querystring.querystring)
@@ -27,7 +124,23 @@ def add_pagination_links(data, object_count, querystring, base_url):
     if all_qs_args:
         links['self'] += '?' + urlencode(all_qs_args)
 
-    if querystring.pagination.get('size') != '0' and object_count > 1:
+    if 'after' in querystring.pagination or 'before' in querystring.pagination:
+        add_cursor_pagination_links(links, data, object_count, querystring, base_url, cursors)
+    elif isinstance(object_count, UnknownCount):
+        if querystring.pagination.get('size') != '0':
+            all_qs_args.pop('page[number]', None)
+            links['first'] = base_url
+            if all_qs_args:
+                links['first'] += '?' + urlencode(all_qs_args)
+
+            current_page = int(querystring.pagination.get('number', 0)) or 1
+            if current_page > 1:
+                all_qs_args.update({'page[number]': current_page - 1})
+                links['prev'] = '?'.join((base_url, urlencode(all_qs_args)))
+            if object_count.has_next:
+                all_qs_args.update({'page[number]': current_page + 1})
+                links['next'] = '?'.join((base_url, urlencode(all_qs_args)))
+    elif querystring.pagination.get('size') != '0' and object_count > 1:
         # compute last link
         page_size = int(querystring.pagination.get('size', 0)) or current_app.config['PAGE_SIZE']
         last_page = int(ceil(object_count / page_size))
@@ -54,3 +167,48 @@ def add_pagination_links(data, object_count, querystring, base_url):
                 links['next'] = '?'.join((base_url, urlencode(all_qs_args)))
 
     data['links'] = links
+
+
+def add_cursor_pagination_links(links, data, object_count, querystring, base_url, cursors):
+    """Add first, last, previous and next links of cursor pagination
+
+    :param dict links: the links of the result
+    :param dict data: the result of the view
+    :param object_count: number of objects in result or an UnknownCount
+    :type object_count: int or UnknownCount
+    :param QueryStringManager querystring: the managed querystring fields and values
+    :param str base_url: the base url for pagination
+    :param dict cursors: the cursors of the first and the last objects of the page
+    """
+    all_qs_args = copy(querystring.querystring)
+    all_qs_args.pop('page[after]', None)
+    all_qs_args.pop('page[before]', None)
+
+    def link(key, cursor):
+        return '?'.join((base_url, urlencode(dict(all_qs_args, **{key: cursor}))))
+
+    links['first'] = link('page[after]', '')
+    links['last'] = link('page[before]', '')
+
+    if not cursors:
+        return
+
+    cursor = querystring.pagination.get('after', querystring.pagination.get('before'))
+    if isinstance(object_count, UnknownCount):
+        page_full = object_count.has_next
+    elif cursor == '':
+        # the page starts at an end of the collection so the other objects follow it
+        page_full = object_count > len(data.get('data') or [])
+    else:
+        page_size = int(querystring.pagination.get('size', 0)) or current_app.config['PAGE_SIZE']
+        page_full = len(data.get('data') or []) >= page_size
+
+    if 'after' in querystring.pagination:
+        has_prev, has_next = querystring.pagination['after'] != '', page_full
+    else:
+        has_prev, has_next = page_full, querystring.pagination['before'] != ''
+
+    if has_prev:
+        links['prev'] = link('page[before]', cursors['first'])
+    if has_next:
+        links['next'] = link('page[after]', cursors['last'])
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""Debug helpers counting the sql statements executed by a request to detect N+1 queries: statements with the same
+shape executed many times, like the lazy loading of a relationship for each object of a page
+"""
+
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+NORMALIZATIONS = ((re.compile(r"'(?:[^']|'')*'"), '?'),
+                  (re.compile(r'%\(\w+\)s|:\w+|\$\d+'), '?'),
+                  (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+                  (re.compile(r'\s+'), ' '),
+                  (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'))
+
+_local = threading.local()
+_listening = False
+
+
+def normalize(statement):
+    """Compute the shape of a sql statement: literals, bound parameters and lists of parameters are replaced with ?
+
+    :param str statement: the sql statement
+    :return str: the normalized statement
+    """
+    for pattern, replacement in NORMALIZATIONS:
+        statement = pattern.sub(replacement, statement)
+
+    return statement.strip()
+
+
+class QueryCounter(object):
+    """Counter of the sql statements executed while it is active"""
+
+    def __init__(self):
+        """Initialize a query counter"""
+        self.count = 0
+        self.shapes = Counter()
+
+    def add(self, statement):
+        """Count a statement
+
+        :param str statement: the sql statement
+        """
+        self.count += 1
+        self.shapes[normalize(statement)] += 1
+
+    def repeated(self, threshold):
+        """Return the shapes of statements executed more than a threshold
+
+        :param int threshold: the number of executions of a same shape allowed
+        :return list: the shapes and their number of executions, the most executed first
+        """
+        return [(shape, count) for (shape, count) in self.shapes.most_common() if count > threshold]
+
+    def __enter__(self):
+        listen()
+        counters().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        counters().remove(self)
+
+
+def counters():
+    """Return the active counters of the current thread
+
+    :return list: the counters
+    """
+    if not hasattr(_local, 'counters'):
+        _local.counters = []
+    return _local.counters
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Count a statement in the active counters of the current thread"""
+    for counter in getattr(_local, 'counters', ()):
+        counter.add(statement)
+
+
+def listen():
+    """Listen to the statements executed by every engine, the listener is only plugged the first time a counter is
+    used
+    """
+    global _listening
+    if _listening is False:
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        _listening = True
+
+
+def count_queries(view):
+    """Count the sql statements of a request if the QUERY_COUNTER configuration key is True. The number of statements
+    is sent in a X-Query-Count header and statements executed more than N_PLUS_ONE_THRESHOLD times are logged and
+    reported in a X-N-Plus-One header.
+
+    :param callable view: the view to decorate
+    :return callable: the wrapped view
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_app.config.get('QUERY_COUNTER', False) is not True:
+            return view(*args, **kwargs)
+
+        with QueryCounter() as counter:
+            response = current_app.make_response(view(*args, **kwargs))
+
+        response.headers['X-Query-Count'] = str(counter.count)
+
+        repeated = counter.repeated(current_app.config.get('N_PLUS_ONE_THRESHOLD', 5))
+        if repeated:
+            response.headers['X-N-Plus-One'] = str(repeated[0][1])
+            for shape, count in repeated:
+                current_app.logger.warning("Possible N+1 queries on %s %s: %s statements %s",
+                                           request.method, request.path, count, shape)
+
+        return response
+    return wrapper
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Error raised when a block executes more sql statements than its budget"""
+
+
+@contextmanager
+def query_budget(max_queries=None, max_repeated=None):
+    """Check the number of sql statements executed by a block, for example the requests of a test::
+
+        with query_budget(3, max_repeated=1):
+            client.get('/persons?include=computers')
+
+    :param int max_queries: the maximum number of statements
+    :param int max_repeated: the maximum number of executions of statements with a same shape
+    :return QueryCounter: the counter of the statements of the block
+    """
+    with QueryCounter() as counter:
+        yield counter
+
+    if max_queries is not None and counter.count > max_queries:
+        raise QueryBudgetExceeded("{} queries executed, the budget is {}:\n{}"
+                                  .format(counter.count, max_queries,
+                                          '\n'.join('{} x {}'.format(count, shape)
+                                                    for (shape, count) in counter.shapes.most_common())))
+
+    if max_repeated is not None and counter.repeated(max_repeated):
+        shape, count = counter.repeated(max_repeated)[0]
+        raise QueryBudgetExceeded("{} queries with the same shape executed, the budget is {}: {}"
+                                  .format(count, max_repeated, shape))
@@ -4,9 +4,38 @@
 
 import json
 
-from flask import current_app
+from flask import current_app, has_app_context
+
+from flask_rest_jsonapi.exceptions import BadRequest, InvalidFilters, InvalidSort, InvalidField, InvalidInclude,\
+    InvalidGroup
+from flask_rest_jsonapi.timing import timed
+
+
+class ParsedQuery(object):
+    """Result of the parsing of a querystring
+
+    Every managed parameter is parsed and validated once when the instance is created. The attributes can't be
+    reassigned but the values are plain dicts and lists shared by every consumer of the query: copy them before
+    changing them.
+    """
+
+    __slots__ = ('querystring', 'filters', 'pagination', 'fields', 'sorting', 'include', 'grouping', 'aggregates',
+                 'search')
+
+    def __init__(self, **kwargs):
+        """Initialize a parsed query
+
+        :param dict kwargs: a value for each slot
+        """
+        for name in self.__slots__:
+            object.__setattr__(self, name, kwargs[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ParsedQuery attributes can't be reassigned")
+
+    def __delattr__(self, name):
+        raise AttributeError("ParsedQuery attributes can't be deleted")
 
-from flask_rest_jsonapi.exceptions import BadRequest, InvalidFilters, InvalidSort, InvalidField, InvalidInclude
 
 class QueryStringManager(object):
     """Querystring parser according to jsonapi reference"""
@@ -18,11 +47,14 @@ class QueryStringManager(object):
         'sort',
         'include',
         'q',
-        'group'
+        'group',
+        'aggregate'
     )
 
+    AGGREGATES = ('sum', 'min', 'max', 'avg')
+
     def __init__(self, querystring):
-        """Initialization instance
+        """Initialization instance, the querystring is parsed once on first access to one of its parameters
 
         :param dict querystring: query string dict from request.args
         """
@@ -30,6 +62,28 @@ class QueryStringManager(object):
             raise ValueError('QueryStringManager require a dict-like object querystring parameter')
 
         self.qs = querystring
+        self._parsed = None
+
+    @property
+    def parsed(self):
+        """Return the parsed query, the querystring is parsed and validated on first access only
+
+        :return ParsedQuery: the parsed query
+        """
+        if self._parsed is None:
+            with timed('querystring'):
+                config = current_app.config if has_app_context() else dict()
+                self._parsed = ParsedQuery(querystring=self._parse_querystring(),
+                                           filters=self._parse_filters(),
+                                           pagination=self._parse_pagination(config),
+                                           fields=self._parse_fields(),
+                                           sorting=self._parse_sorting(),
+                                           include=self._parse_include(config),
+                                           grouping=self._parse_grouping(),
+                                           aggregates=self._parse_aggregates(),
+                                           search=self._parse_search())
+
+        return self._parsed
 
     def _get_key_values(self, name):
         """Return a dict containing key / values items for a given key, used for items like filters, page, etc.
@@ -64,7 +118,7 @@ class QueryStringManager(object):
 
         :return dict: dict of managed querystring parameter
         """
-        return {key: value for (key, value) in self.qs.items() if key.startswith(self.MANAGED_KEYS)}
+        return self.parsed.querystring
 
     @property
     def grouping(self):
@@ -72,9 +126,31 @@ class QueryStringManager(object):
 
         :return list: group information
         """
-        groups = self.qs.get('group')
-        if groups is not None:
-            return groups.split(",")
+        return self.parsed.grouping
+
+    @property
+    def aggregates(self):
+        """Return aggregates computed for each group
+
+        :return dict: the fields to aggregate by aggregate function
+
+        Example of return value::
+
+            {
+                "sum": ['price', 'quantity'],
+                "max": ['price'],
+            }
+
+        """
+        return self.parsed.aggregates
+
+    @property
+    def search(self):
+        """Return full-text search terms from query string.
+
+        :return str: the search terms or None
+        """
+        return self.parsed.search
 
     @property
     def filters(self):
@@ -82,14 +158,7 @@ class QueryStringManager(object):
 
         :return list: filter information
         """
-        filters = self.qs.get('filter')
-        if filters is not None:
-            try:
-                filters = json.loads(filters)
-            except (ValueError, TypeError):
-                raise InvalidFilters("Parse error")
-
-        return filters
+        return self.parsed.filters
 
     @property
     def pagination(self):
@@ -109,26 +178,14 @@ class QueryStringManager(object):
             >>> query_string = {'page[number]': '25', 'page[size]': '10'}
             >>> parsed_query.pagination
             {'number': '25', 'size': '10'}
-        """
-        # check values type
-        result = self._get_key_values('page')
-        for key, value in result.items():
-            if key not in ('number', 'size'):
-                raise BadRequest("{} is not a valid parameter of pagination".format(key), source={'parameter': 'page'})
-            try:
-                int(value)
-            except ValueError:
-                raise BadRequest("Parse error", source={'parameter': 'page[{}]'.format(key)})
 
-        if current_app.config.get('ALLOW_DISABLE_PAGINATION', True) is False and int(result.get('size', 1)) == 0:
-            raise BadRequest("You are not allowed to disable pagination", source={'parameter': 'page[size]'})
-
-        if current_app.config.get('MAX_PAGE_SIZE') is not None and 'size' in result:
-            if int(result['size']) > current_app.config['MAX_PAGE_SIZE']:
-                raise BadRequest("Maximum page size is {}".format(current_app.config['MAX_PAGE_SIZE']),
-                                 source={'parameter': 'page[size]'})
+        Example with cursor strategy, an empty cursor starts from the first (after) or the last (before) page::
 
-        return result
+            >>> query_string = {'page[after]': 'WyJ0ZXN0IiwgMV0=', 'page[size]': '10'}
+            >>> parsed_query.pagination
+            {'after': 'WyJ0ZXN0IiwgMV0=', 'size': '10'}
+        """
+        return self.parsed.pagination
 
     '''
     Fields and sorting both return Schema field names, not attributes.
@@ -150,12 +207,7 @@ class QueryStringManager(object):
             }
 
         """
-        result = self._get_key_values('fields')
-        for key, value in result.items():
-            if not isinstance(value, list):
-                result[key] = [value]
-
-        return result
+        return self.parsed.fields
 
     @property
     def sorting(self):
@@ -170,6 +222,128 @@ class QueryStringManager(object):
                 {'field': 'created_at', 'order': 'desc'},
             ]
 
+        """
+        return self.parsed.sorting
+
+    @property
+    def include(self):
+        """Return fields to include
+
+        :return list: a list of include information
+        """
+        return self.parsed.include
+
+    def _parse_querystring(self):
+        """Keep only the managed keys of the querystring
+
+        :return dict: dict of managed querystring parameter
+        """
+        return {key: value for (key, value) in self.qs.items() if key.startswith(self.MANAGED_KEYS)}
+
+    def _parse_grouping(self):
+        """Parse the group parameter
+
+        :return list: group information
+        """
+        groups = self.qs.get('group')
+        if groups is not None:
+            return groups.split(",")
+
+    def _parse_aggregates(self):
+        """Parse and check the aggregate parameters
+
+        :return dict: the fields to aggregate by aggregate function
+        """
+        result = self._get_key_values('aggregate')
+        for key, value in result.items():
+            if key not in self.AGGREGATES:
+                raise InvalidGroup("{} is not a valid aggregate, use one of {}".format(key, ', '.join(self.AGGREGATES)),
+                                   source={'parameter': 'aggregate[{}]'.format(key)})
+            if not isinstance(value, list):
+                result[key] = [value]
+
+        if result and self.qs.get('group') is None:
+            raise InvalidGroup("You can't use aggregates without group", source={'parameter': 'aggregate'})
+
+        return result
+
+    def _parse_search(self):
+        """Parse the q parameter
+
+        :return str: the search terms or None
+        """
+        terms = self.qs.get('q')
+        if terms is not None and terms.strip():
+            return terms.strip()
+
+    def _parse_filters(self):
+        """Parse the filter parameter
+
+        :return list: filter information
+        """
+        filters = self.qs.get('filter')
+        if filters is not None:
+            try:
+                filters = json.loads(filters)
+            except (ValueError, TypeError):
+                raise InvalidFilters("Parse error")
+
+        return filters
+
+    def _parse_pagination(self, config):
+        """Parse and check the page parameters
+
+        :param dict config: the configuration of the application
+        :return dict: a dict of pagination information
+        """
+        # check values type
+        result = self._get_key_values('page')
+        for key, value in result.items():
+            if key not in ('number', 'size', 'after', 'before', 'count'):
+                raise BadRequest("{} is not a valid parameter of pagination".format(key), source={'parameter': 'page'})
+            if key in ('after', 'before'):
+                continue
+            if key == 'count':
+                if value not in ('exact', 'none', 'estimated'):
+                    raise BadRequest("count must be exact, none or estimated", source={'parameter': 'page[count]'})
+                continue
+            try:
+                int(value)
+            except ValueError:
+                raise BadRequest("Parse error", source={'parameter': 'page[{}]'.format(key)})
+
+        if 'after' in result and 'before' in result:
+            raise BadRequest("You can't use page[after] and page[before] together", source={'parameter': 'page'})
+
+        if 'number' in result and ('after' in result or 'before' in result):
+            raise BadRequest("You can't use page[number] with a cursor", source={'parameter': 'page[number]'})
+
+        if config.get('ALLOW_DISABLE_PAGINATION', True) is False and int(result.get('size', 1)) == 0:
+            raise BadRequest("You are not allowed to disable pagination", source={'parameter': 'page[size]'})
+
+        if config.get('MAX_PAGE_SIZE') is not None and 'size' in result:
+            if int(result['size']) > config['MAX_PAGE_SIZE']:
+                raise BadRequest("Maximum page size is {}".format(config['MAX_PAGE_SIZE']),
+                                 source={'parameter': 'page[size]'})
+
+        return result
+
+    def _parse_fields(self):
+        """Parse the sparse fieldsets parameters
+
+        :return dict: a dict of sparse fieldsets information
+        """
+        result = self._get_key_values('fields')
+        for key, value in result.items():
+            if not isinstance(value, list):
+                result[key] = [value]
+
+        return result
+
+    def _parse_sorting(self):
+        """Parse the sort parameter
+
+        :return list: a list of sorting information
         """
         if self.qs.get('sort'):
             sorting_results = []
@@ -181,18 +355,19 @@ class QueryStringManager(object):
 
         return []
 
-    @property
-    def include(self):
-        """Return fields to include
+    def _parse_include(self, config):
+        """Parse and check the include parameter
 
+        :param dict config: the configuration of the application
         :return list: a list of include information
         """
-        include_param = self.qs.get('include', [])
+        include_param = self.qs.get('include')
+        include = include_param.split(',') if include_param else []
 
-        if current_app.config.get('MAX_INCLUDE_DEPTH') is not None:
-            for include_path in include_param:
-                if len(include_path.split('.')) > current_app.config['MAX_INCLUDE_DEPTH']:
+        if config.get('MAX_INCLUDE_DEPTH') is not None:
+            for include_path in include:
+                if len(include_path.split('.')) > config['MAX_INCLUDE_DEPTH']:
                     raise InvalidInclude("You can't use include through more than {} relationships"
-                                         .format(current_app.config['MAX_INCLUDE_DEPTH']))
+                                         .format(config['MAX_INCLUDE_DEPTH']))
 
-        return include_param.split(',') if include_param else []
+        return include
@@ -3,10 +3,11 @@
 """This module contains the logic of resource management"""
 
 import inspect
+import hashlib
 from six import with_metaclass
 
 from werkzeug.wrappers import Response
-from flask import request, url_for, make_response, current_app, jsonify
+from flask import request, url_for, make_response, current_app, g
 from flask.views import MethodView, MethodViewType
 from marshmallow_jsonapi.exceptions import IncorrectTypeError
 from marshmallow import ValidationError
@@ -14,14 +15,20 @@ from marshmallow import ValidationError
 from marshmallow.base import SchemaABC
 
 from flask_rest_jsonapi.errors import jsonapi_errors
+from flask_rest_jsonapi.encoders import make_json_response
 from flask_rest_jsonapi.querystring import QueryStringManager as QSManager
-from flask_rest_jsonapi.pagination import add_pagination_links
+from flask_rest_jsonapi.pagination import add_pagination_links, UnknownCount
 from flask_rest_jsonapi.exceptions import InvalidType, BadRequest, JsonApiException, RelationNotFound
-from flask_rest_jsonapi.decorators import check_headers, check_method_requirements
+from flask_rest_jsonapi.decorators import check_headers, check_method_requirements, check_cache
+from flask_rest_jsonapi.timing import timed, collect_timings
+from flask_rest_jsonapi.query_counter import count_queries
+from flask_rest_jsonapi.cache import get_cache_backend, get_cache_types, make_cache_key, ALL_TYPES
 from flask_rest_jsonapi.schema import compute_schema, get_relationships, get_model_field
 from flask_rest_jsonapi.data_layers.base import BaseDataLayer
 from flask_rest_jsonapi.data_layers.alchemy import SqlalchemyDataLayer
 
+DEFAULT_DECORATORS = (check_headers, collect_timings, count_queries)
+
 
 class ResourceMeta(MethodViewType):
     """Meta class to initilize the data layer and decorators of a resource"""
@@ -42,7 +49,7 @@ class ResourceMeta(MethodViewType):
             data_layer_kwargs = d['data_layer']
             rv._data_layer = data_layer_cls(data_layer_kwargs)
 
-        rv.decorators = (check_headers,)
+        rv.decorators = DEFAULT_DECORATORS
         if 'decorators' in d:
             rv.decorators += d['decorators']
 
@@ -52,6 +59,13 @@ class ResourceMeta(MethodViewType):
 class Resource(MethodView):
     """Base resource class"""
 
+    etag = None
+    cache_ttl = None
+    cache_vary = ('Authorization', 'Cookie')
+    _cache_key = None
+    _version_etag = None
+    _cache_hit = False
+
     def __new__(cls):
         """Constructor of a resource instance"""
         if hasattr(cls, '_data_layer'):
@@ -71,9 +85,7 @@ class Resource(MethodView):
         try:
             response = method(*args, **kwargs)
         except JsonApiException as e:
-            return make_response(jsonify(jsonapi_errors([e.to_dict()])),
-                                 e.status,
-                                 headers)
+            return make_json_response(jsonapi_errors([e.to_dict()]), e.status, headers)
         except Exception as e:
             if current_app.config['DEBUG'] is True:
                 raise e
@@ -91,18 +103,20 @@ class Resource(MethodView):
                                    id_=getattr(e, 'id', None),
                                    links=getattr(e, 'links', None),
                                    meta=getattr(e, 'meta', None))
-            return make_response(jsonify(jsonapi_errors([exc.to_dict()])),
-                                 exc.status,
-                                 headers)
+            return make_json_response(jsonapi_errors([exc.to_dict()]), exc.status, headers)
 
         if isinstance(response, Response):
-            response.headers.add('Content-Type', 'application/vnd.api+json')
+            if self._cache_hit is True:
+                return self.make_conditional(response)
+            if response.status_code != 304:
+                response.headers.add('Content-Type', 'application/vnd.api+json')
             return response
 
         if not isinstance(response, tuple):
             if isinstance(response, dict):
                 response.update({'jsonapi': {'version': '1.0'}})
-            return make_response(jsonify(response), 200, headers)
+            return self.make_conditional(self.cache_response(self._cache_key,
+                                                             self.set_etag(make_json_response(response, 200, headers))))
 
         try:
             data, status_code, headers = response
@@ -118,7 +132,138 @@ class Resource(MethodView):
         if isinstance(data, dict):
             data.update({'jsonapi': {'version': '1.0'}})
 
-        return make_response(jsonify(data), status_code, headers)
+        return self.make_conditional(self.cache_response(self._cache_key,
+                                                         self.set_etag(make_json_response(data, status_code, headers))))
+
+    def get_qs(self):
+        """Return the querystring manager of the request. It is created once per request so the querystring is parsed
+        once even if the cache, the version of the data and the method all need it.
+
+        :return QueryStringManager: the querystring manager of the request
+        """
+        qs = getattr(g, '_flask_rest_jsonapi_qs', None)
+        if qs is None or qs.qs is not request.args:
+            qs = g._flask_rest_jsonapi_qs = QSManager(request.args)
+
+        return qs
+
+    def check_version(self, args, kwargs):
+        """Answer a conditional GET request with a 304 Not Modified response if the version of the data matches the
+        If-None-Match header of the request. It is called by the get methods after the before_get hook, so the
+        decorators plugged to the methods by the api (oauth, permissions) are checked before the version is computed.
+
+        :param tuple args: args from the resource view
+        :param dict kwargs: kwargs from the resource view
+        :return Response: a 304 Not Modified response or None to compute the response
+        """
+        if request.method not in ('GET', 'HEAD') or self.etag not in ('strong', 'weak'):
+            return None
+
+        version = self.get_version(args, kwargs)
+        if version is None:
+            return None
+
+        self._version_etag = self.get_version_etag(version)
+        if request.if_none_match.contains_weak(self._version_etag):
+            # the data didn't change so the response is neither computed nor serialized
+            response = make_response('', 304)
+            response.set_etag(self._version_etag, weak=self.etag == 'weak')
+            return response
+
+        return None
+
+    def get_version(self, args, kwargs):
+        """Return a cheap version of the data sent by a GET request. The ETag of the response is computed from the
+        version instead of the serialized response so a conditional request can be answered without computing the
+        response.
+
+        :param tuple args: args from the resource view
+        :param dict kwargs: kwargs from the resource view
+        :return: a version of the data or None to compute the ETag from the serialized response
+        """
+        return None
+
+    def get_cache_key(self, args, kwargs):
+        """Compute the key of the cached response of a GET request from the view, its kwargs, the managed querystring,
+        the headers of cache_vary and the generations of the resource types of the document
+
+        :param tuple args: args from the resource view
+        :param dict kwargs: kwargs from the resource view
+        :return str: the key or None if the response must not be cached
+        """
+        if not (isinstance(self.schema, type) and issubclass(self.schema, SchemaABC)):
+            raise Exception("You can't set a cache_ttl in {} because the resource types of a schema chosen by "
+                            "get_schema are unknown before the response is computed".format(self.__class__.__name__))
+
+        qs = self.get_qs()
+        types = get_cache_types(self.schema, qs.include)
+        if types is None:
+            return None
+        types.append(ALL_TYPES)
+        vary = repr([request.headers.get(header) for header in self.cache_vary])
+
+        return make_cache_key(request.endpoint, kwargs, qs.querystring, vary, types,
+                              get_cache_backend().get_generations(types))
+
+    def cache_response(self, cache_key, response):
+        """Store a successful response of a GET request in the cache
+
+        :param str cache_key: the key computed by get_cache_key or None if the response must not be cached
+        :param Response response: the response
+        :return Response: the response
+        """
+        if cache_key is not None and response.status_code == 200:
+            get_cache_backend().set(cache_key,
+                                    {'status': response.status_code,
+                                     'headers': [(key, value) for (key, value) in response.headers
+                                                 if key not in ('Content-Length', 'Set-Cookie')],
+                                     'body': response.get_data(as_text=True)},
+                                    self.cache_ttl)
+
+        return response
+
+    def get_version_etag(self, version):
+        """Compute the ETag of a response from the version of its data, the querystring and the headers of cache_vary
+        which change the response from a user to another
+
+        :param version: the version returned by get_version
+        :return str: the ETag
+        """
+        key = repr((request.path,
+                    sorted(request.args.items(multi=True)),
+                    [request.headers.get(header) for header in self.cache_vary],
+                    version))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def set_etag(self, response):
+        """Add an ETag to a successful response of a GET request
+
+        :param Response response: the response
+        :return Response: the response
+        """
+        if request.method not in ('GET', 'HEAD') or self.etag not in ('strong', 'weak')\
+                or response.status_code != 200:
+            return response
+
+        if self._version_etag is not None:
+            response.set_etag(self._version_etag, weak=self.etag == 'weak')
+        else:
+            response.add_etag(weak=self.etag == 'weak')
+
+        return response
+
+    def make_conditional(self, response):
+        """Turn the response of a GET request into a 304 Not Modified response if its ETag matches the If-None-Match
+        header of the request
+
+        :param Response response: the response
+        :return Response: the response
+        """
+        if request.method not in ('GET', 'HEAD') or self.etag not in ('strong', 'weak')\
+                or response.status_code != 200 or 'ETag' not in response.headers:
+            return response
+
+        return response.make_conditional(request)
 
     '''
     Here arg is either the result from get_collection/get_object, or the parsed json of a post/patch/put
@@ -138,15 +283,27 @@ class ResourceList(with_metaclass(ResourceMeta, Resource)):
     """Base class of a resource list manager"""
 
     @check_method_requirements
+    @check_cache
     def get(self, *args, **kwargs):
         """Retrieve a collection of objects"""
         self.before_get(args, kwargs)
 
-        qs = QSManager(request.args)
+        not_modified = self.check_version(args, kwargs)
+        if not_modified is not None:
+            return not_modified
+
+        qs = self.get_qs()
+
+        if qs.grouping:
+            result = {'meta': {'groups': self.get_grouped_collection(qs, kwargs)}}
+
+            self.after_get(result)
+
+            return result
 
         objects_count, objects = self.get_collection(qs, kwargs)
 
-        schema_kwargs = getattr(self, 'get_schema_kwargs', dict())
+        schema_kwargs = dict(getattr(self, 'get_schema_kwargs', dict()))
         schema_kwargs.update({'many': True})
 
         schema = compute_schema(self.get_schema(objects, kwargs=kwargs),
@@ -154,15 +311,25 @@ class ResourceList(with_metaclass(ResourceMeta, Resource)):
                                 qs,
                                 qs.include)
 
-        result = schema.dump(objects).data
+        with timed('dump'):
+            result = schema.dump(objects).data
 
-        self_url = schema.get_top_level_links(result, many=True)['self']
-        add_pagination_links(result,
-                             objects_count,
-                             qs,
-                             self_url)
+        cursors = None
+        if 'after' in qs.pagination or 'before' in qs.pagination:
+            cursors = self.get_cursors(objects, qs)
 
-        result.update({'meta': {'count': objects_count}})
+        self_url = schema.get_top_level_links(result, many=True)['self']
+        with timed('pagination'):
+            add_pagination_links(result,
+                                 objects_count,
+                                 qs,
+                                 self_url,
+                                 cursors=cursors)
+
+        if not isinstance(objects_count, UnknownCount):
+            result.update({'meta': {'count': objects_count}})
+        elif objects_count.estimate is not None:
+            result.update({'meta': {'count': objects_count.estimate, 'count_estimated': True}})
 
         self.after_get(result)
 
@@ -170,18 +337,27 @@ class ResourceList(with_metaclass(ResourceMeta, Resource)):
 
     @check_method_requirements
     def post(self, *args, **kwargs):
-        """Create an object"""
+        """Create an object or several objects if data is an array and bulk creation is allowed"""
         json_data = request.get_json() or {}
 
-        qs = QSManager(request.args)
+        qs = self.get_qs()
+
+        many = isinstance(json_data.get('data'), list)
+        if many and getattr(self, 'allow_bulk_create', False) is not True:
+            raise BadRequest("You can't create several objects at once on this resource", source={'pointer': '/data'})
+
+        schema_kwargs = dict(getattr(self, 'post_schema_kwargs', dict()))
+        if many:
+            schema_kwargs['many'] = True
 
         schema = compute_schema(self.get_schema(json_data, is_load=True, kwargs=kwargs),
-                                getattr(self, 'post_schema_kwargs', dict()),
+                                schema_kwargs,
                                 qs,
                                 qs.include)
 
         try:
-            data, errors = schema.load(json_data)
+            with timed('load'):
+                data, errors = schema.load(json_data)
         except IncorrectTypeError as e:
             errors = e.messages
             for error in errors['errors']:
@@ -201,11 +377,25 @@ class ResourceList(with_metaclass(ResourceMeta, Resource)):
                 error['title'] = "Validation error"
             return errors, 422
 
+        if many:
+            for item in data:
+                self.before_post(args, kwargs, data=item)
+
+            objects = self.create_objects(data, kwargs)
+
+            with timed('dump'):
+                result = schema.dump(objects).data
+
+            self.after_post(result)
+
+            return result, 201
+
         self.before_post(args, kwargs, data=data)
 
         obj = self.create_object(data, kwargs)
 
-        result = schema.dump(obj).data
+        with timed('dump'):
+            result = schema.dump(obj).data
 
         self.after_post(result)
 
@@ -216,6 +406,104 @@ class ResourceList(with_metaclass(ResourceMeta, Resource)):
 
         return final_result
 
+    @check_method_requirements
+    def patch(self, *args, **kwargs):
+        """Update several objects: data is either an array of resource objects with their ids or a resource object
+        applied to the objects matching the filters of the querystring
+        """
+        if getattr(self, 'allow_bulk_update', False) is not True:
+            raise JsonApiException("You can't update the objects of this resource at once",
+                                   title='Method not allowed', status='405')
+
+        json_data = request.get_json() or {}
+
+        qs = self.get_qs()
+
+        many = isinstance(json_data.get('data'), list)
+        if many:
+            for index, item in enumerate(json_data['data']):
+                if not isinstance(item, dict) or 'id' not in item:
+                    raise BadRequest('Missing id in "data" node', source={'pointer': '/data/{}/id'.format(index)})
+        else:
+            if not qs.filters:
+                raise BadRequest("You must provide an array of resource objects or a filter to update objects at "
+                                 "once", source={'parameter': 'filter'})
+            if qs.search:
+                raise BadRequest("Full-text search can't be used to update objects", source={'parameter': 'q'})
+            if isinstance(json_data.get('data'), dict) and 'id' in json_data['data']:
+                raise BadRequest("You can't provide an id to update the objects matching a filter",
+                                 source={'pointer': '/data/id'})
+
+        schema_kwargs = dict(getattr(self, 'patch_schema_kwargs', dict()))
+        schema_kwargs.update({'partial': True, 'many': many})
+
+        schema = compute_schema(self.get_schema(json_data, is_load=True, kwargs=kwargs),
+                                schema_kwargs,
+                                qs,
+                                qs.include)
+
+        try:
+            with timed('load'):
+                data, errors = schema.load(json_data)
+        except IncorrectTypeError as e:
+            errors = e.messages
+            for error in errors['errors']:
+                error['status'] = '409'
+                error['title'] = "Incorrect type"
+            return errors, 409
+        except ValidationError as e:
+            errors = e.messages
+            for message in errors['errors']:
+                message['status'] = '422'
+                message['title'] = "Validation error"
+            return errors, 422
+
+        if errors:
+            for error in errors['errors']:
+                error['status'] = "422"
+                error['title'] = "Validation error"
+            return errors, 422
+
+        if many:
+            for item in data:
+                self.before_patch(args, kwargs, data=item)
+
+            count = self.update_objects([item['id'] for item in json_data['data']], data, kwargs)
+        else:
+            self.before_patch(args, kwargs, data=data)
+
+            count = self.update_collection(qs, data, kwargs)
+
+        result = {'meta': {'message': 'Objects successfully updated', 'count': count}}
+
+        self.after_patch(result)
+
+        return result
+
+    @check_method_requirements
+    def delete(self, *args, **kwargs):
+        """Delete the objects of a collection matching the filters of the querystring"""
+        if getattr(self, 'allow_bulk_delete', False) is not True:
+            raise JsonApiException("You can't delete the objects of this resource at once",
+                                   title='Method not allowed', status='405')
+
+        qs = self.get_qs()
+
+        if not qs.filters:
+            raise BadRequest("You must provide a filter to delete objects at once", source={'parameter': 'filter'})
+        if qs.search:
+            raise BadRequest("Full-text search can't be used to delete objects", source={'parameter': 'q'})
+
+        self.before_delete(args, kwargs)
+
+        count = self.delete_collection(qs, kwargs)
+
+        result = {'meta': {'message': 'Objects successfully deleted', 'count': count}}
+
+        self.after_delete(result)
+
+        return result
+
     def before_get(self, args, kwargs):
         """Hook to make custom work before get method"""
         pass
@@ -232,22 +520,69 @@ class ResourceList(with_metaclass(ResourceMeta, Resource)):
         """Hook to make custom work after post method"""
         pass
 
+    def before_patch(self, args, kwargs, data=None):
+        """Hook to make custom work before patch method"""
+        pass
+
+    def after_patch(self, result):
+        """Hook to make custom work after patch method"""
+        pass
+
+    def before_delete(self, args, kwargs):
+        """Hook to make custom work before delete method"""
+        pass
+
+    def after_delete(self, result):
+        """Hook to make custom work after delete method"""
+        pass
+
     def get_collection(self, qs, kwargs):
         return self._data_layer.get_collection(qs, kwargs)
 
+    def get_cursors(self, objects, qs):
+        return self._data_layer.get_cursors(objects, qs)
+
+    def get_grouped_collection(self, qs, kwargs):
+        return self._data_layer.get_grouped_collection(qs, kwargs)
+
+    def get_version(self, args, kwargs):
+        if getattr(getattr(self, '_data_layer', None), 'version_field', None) is None:
+            return None
+        if self.get_qs().include:
+            # the version of the included objects is unknown
+            return None
+        return self._data_layer.get_collection_version(self.get_qs(), kwargs)
+
     def create_object(self, data, kwargs):
         return self._data_layer.create_object(data, kwargs)
 
+    def create_objects(self, data, kwargs):
+        return self._data_layer.create_objects(data, kwargs)
+
+    def update_objects(self, ids, data, kwargs):
+        return self._data_layer.update_objects(ids, data, kwargs)
+
+    def update_collection(self, qs, data, kwargs):
+        return self._data_layer.update_collection(qs, data, kwargs)
+
+    def delete_collection(self, qs, kwargs):
+        return self._data_layer.delete_collection(qs, kwargs)
+
 
 class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
     """Base class of a resource detail manager"""
 
     @check_method_requirements
+    @check_cache
     def get(self, *args, **kwargs):
         """Get object details"""
         self.before_get(args, kwargs)
 
-        qs = QSManager(request.args)
+        not_modified = self.check_version(args, kwargs)
+        if not_modified is not None:
+            return not_modified
+
+        qs = self.get_qs()
 
         obj = self.get_object(kwargs, qs)
 
@@ -256,7 +591,8 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
                                 qs,
                                 qs.include)
 
-        result = schema.dump(obj).data
+        with timed('dump'):
+            result = schema.dump(obj).data
 
         self.after_get(result)
 
@@ -267,8 +603,8 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
         """Update an object"""
         json_data = request.get_json() or {}
 
-        qs = QSManager(request.args)
-        schema_kwargs = getattr(self, 'patch_schema_kwargs', dict())
+        qs = self.get_qs()
+        schema_kwargs = dict(getattr(self, 'patch_schema_kwargs', dict()))
         schema_kwargs.update({'partial': True})
 
         schema = compute_schema(self.get_schema(json_data, is_load=True),
@@ -277,7 +613,8 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
                                 qs.include)
 
         try:
-            data, errors = schema.load(json_data)
+            with timed('load'):
+                data, errors = schema.load(json_data)
         except IncorrectTypeError as e:
             errors = e.messages
             for error in errors['errors']:
@@ -308,7 +645,8 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
 
         obj = self.update_object(data, qs, kwargs)
 
-        result = schema.dump(obj).data
+        with timed('dump'):
+            result = schema.dump(obj).data
 
         self.after_patch(result)
 
@@ -319,8 +657,8 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
         """Replace an object"""
         json_data = request.get_json() or {}
 
-        qs = QSManager(request.args)
-        schema_kwargs = getattr(self, 'patch_schema_kwargs', dict())
+        qs = self.get_qs()
+        schema_kwargs = dict(getattr(self, 'patch_schema_kwargs', dict()))
         schema_kwargs.update({'partial': True})
 
         schema = compute_schema(self.get_schema(json_data, is_load=True),
@@ -329,7 +667,8 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
                                 qs.include)
 
         try:
-            data, errors = schema.load(json_data)
+            with timed('load'):
+                data, errors = schema.load(json_data)
         except IncorrectTypeError as e:
             errors = e.messages
             for error in errors['errors']:
@@ -358,7 +697,8 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
 
         obj = self._data_layer.replace_object(data, kwargs)
 
-        result = schema.dump(obj).data
+        with timed('dump'):
+            result = schema.dump(obj).data
 
         return result
 
@@ -402,13 +742,29 @@ class ResourceDetail(with_metaclass(ResourceMeta, Resource)):
     def get_object(self, kwargs, qs):
         return self._data_layer.get_object(kwargs, qs=qs)
 
+    def get_version(self, args, kwargs):
+        if getattr(getattr(self, '_data_layer', None), 'version_field', None) is None:
+            return None
+        if self.get_qs().include:
+            # the version of the included objects is unknown
+            return None
+        return self._data_layer.get_object_version(kwargs)
+
     def update_object(self, data, qs, kwargs):
+        if getattr(self._data_layer, 'fast_update', False) is True:
+            obj = self._data_layer.update_object_attributes(data, kwargs, qs=qs)
+            if obj is not None:
+                return obj
+
         obj = self._data_layer.get_object(kwargs, qs=qs)
-        obj = self._data_layer.update_object(obj, data, kwargs)
+        self._data_layer.update_object(obj, data, kwargs)
 
         return obj
 
     def delete_object(self, kwargs):
+        if getattr(self._data_layer, 'fast_delete', False) is True and self._data_layer.delete_object_directly(kwargs):
+            return
+
         obj = self._data_layer.get_object(kwargs)
         self._data_layer.delete_object(obj, kwargs)
 
@@ -421,10 +777,15 @@ class ResourceRelationship(with_metaclass(ResourceMeta, Resource)):
     """Base class of a resource relationship manager"""
 
     @check_method_requirements
+    @check_cache
     def get(self, *args, **kwargs):
         """Get a relationship details"""
         self.before_get(args, kwargs)
 
+        not_modified = self.check_version(args, kwargs)
+        if not_modified is not None:
+            return not_modified
+
         relationship_field, model_relationship_field, related_type_, related_id_field = self._get_relationship_data()
 
         obj, data = self._data_layer.get_relationship(model_relationship_field,
@@ -436,7 +797,7 @@ class ResourceRelationship(with_metaclass(ResourceMeta, Resource)):
                             'related': self.schema._declared_fields[relationship_field].get_related_url(obj)},
                   'data': data}
 
-        qs = QSManager(request.args)
+        qs = self.get_qs()
         if qs.include:
             schema = compute_schema(self.schema, dict(), qs, qs.include)
 
@@ -2,11 +2,15 @@
 
 """Helpers to deal with marshmallow schemas"""
 
+import threading
+from collections import OrderedDict
+
 from marshmallow import class_registry
 from marshmallow.base import SchemaABC
 from marshmallow_jsonapi.fields import Relationship as GenericRelationship
 
 from flask_rest_jsonapi.exceptions import InvalidInclude
+from flask_rest_jsonapi.timing import timed
 
 from marshmallow_jsonapi.schema import Schema as DefaultSchema, SchemaOpts as DefaultOpts
 
@@ -34,16 +38,168 @@ class Schema(DefaultSchema):
         pass
 
 class Relationship(GenericRelationship):
-    def get_related_url(self, obj):
+    def __init__(self, *args, **kwargs):
+        super(Relationship, self).__init__(*args, **kwargs)
+
+        # related urls are set once here because fields declared on a schema class are shared by concurrent requests
         self.related_url = "/{}".format(self.type_)
-        self.related_url_kwargs = {'id': '<id>'} 
+        self.related_url_kwargs = {'id': '<id>'}
+
+class SchemaCache(object):
+    """Bounded LRU cache of the schemas computed by compute_schema
+
+    A computed schema keeps the included data of its last dump, so each thread holds its own LRU of schemas. Hit and
+    miss counters are shared by all threads.
+    """
+
+    def __init__(self, maxsize=128):
+        """Initialize a schema cache
+
+        :param int maxsize: the maximum number of schemas kept per thread, 0 disables the cache
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def schemas(self):
+        """Return the schemas cached for the current thread
+
+        :return OrderedDict: cached schemas from the least to the most recently used
+        """
+        schemas = getattr(self._local, 'schemas', None)
+        if schemas is None:
+            schemas = self._local.schemas = OrderedDict()
+        return schemas
+
+    def get(self, key):
+        """Retrieve a cached schema
+
+        :param tuple key: the key computed by schema_cache_key
+        :return Schema: the cached schema or None
+        """
+        schemas = self.schemas
+        schema = schemas.pop(key, None)
+
+        with self._lock:
+            if schema is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if schema is not None:
+            schemas[key] = schema
+
+        return schema
+
+    def set(self, key, schema):
+        """Store a schema and evict the least recently used ones
+
+        :param tuple key: the key computed by schema_cache_key
+        :param Schema schema: the computed schema
+        """
+        if self.maxsize <= 0:
+            return
+
+        schemas = self.schemas
+        schemas[key] = schema
+        while len(schemas) > self.maxsize:
+            schemas.popitem(last=False)
+
+    def clear(self):
+        """Drop cached schemas of every thread and reset counters"""
+        with self._lock:
+            self._local = threading.local()
+            self.hits = 0
+            self.misses = 0
+
+
+schema_cache = SchemaCache()
+
+
+def _freeze(value):
+    """Turn a value into a hashable equivalent
+
+    :param value: a value from schema kwargs or querystring
+    :return: a hashable value
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for (key, item) in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def schema_cache_key(schema_cls, default_kwargs, qs, include):
+    """Compute the key of a computed schema in the schema cache
+
+    :param Schema schema_cls: the schema class
+    :param dict default_kwargs: the schema default kwargs
+    :param QueryStringManager qs: qs
+    :param list include: the relation field to include data from
+    :return tuple: the key or None if the schema can't be cached
+    """
+    kwargs = {key: value for (key, value) in default_kwargs.items() if key != 'include_data'}
+    key = (schema_cls, _freeze(kwargs), tuple(sorted(set(include or ()))), _freeze(qs.fields))
+
+    try:
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
+
+
+def reset_included_data(schema):
+    """Forget the included data collected by a previous dump of a computed schema and its related schemas
+
+    :param Schema schema: a computed schema
+    """
+    schema.included_data = {}
+    for field in schema.declared_fields.values():
+        if isinstance(field, GenericRelationship) and field.include_data is True:
+            related_schema = field.__dict__['_Relationship__schema']
+            if isinstance(related_schema, SchemaABC):
+                reset_included_data(related_schema)
 
-        return super().get_related_url(obj)
-        
 
 def compute_schema(schema_cls, default_kwargs, qs, include):
     """Compute a schema around compound documents and sparse fieldsets
 
+    Computed schemas are cached by schema class, schema kwargs, include and sparse fieldsets so repeated requests
+    reuse a ready-to-use schema.
+
+    :param Schema schema_cls: the schema class
+    :param dict default_kwargs: the schema default kwargs
+    :param QueryStringManager qs: qs
+    :param list include: the relation field to include data from
+
+    :return Schema schema: the schema computed
+    """
+    with timed('schema'):
+        key = schema_cache_key(schema_cls, default_kwargs, qs, include) if schema_cache.maxsize > 0 else None
+
+        if key is not None:
+            schema = schema_cache.get(key)
+            if schema is not None:
+                reset_included_data(schema)
+                return schema
+
+        schema = _compute_schema(schema_cls, default_kwargs, qs, include)
+
+        if key is not None:
+            schema_cache.set(key, schema)
+
+        return schema
+
+
+def _compute_schema(schema_cls, default_kwargs, qs, include):
+    """Build a new schema instance around compound documents and sparse fieldsets
+
     :param Schema schema_cls: the schema class
     :param dict default_kwargs: the schema default kwargs
     :param QueryStringManager qs: qs
@@ -51,8 +207,8 @@ def compute_schema(schema_cls, default_kwargs, qs, include):
 
     :return Schema schema: the schema computed
     """
-    # manage include_data parameter of the schema
-    schema_kwargs = default_kwargs
+    # manage include_data parameter of the schema without altering default kwargs shared by concurrent requests
+    schema_kwargs = dict(default_kwargs)
     schema_kwargs['include_data'] = tuple()
 
     # collect sub-related_includes
@@ -75,7 +231,7 @@ def compute_schema(schema_cls, default_kwargs, qs, include):
 
     # make sure id field is in only parameter unless marshamllow will raise an Exception
     if schema_kwargs.get('only') is not None and 'id' not in schema_kwargs['only']:
-        schema_kwargs['only'] += ('id',)
+        schema_kwargs['only'] = tuple(schema_kwargs['only']) + ('id',)
 
     # create base schema instance
     schema = schema_cls(**schema_kwargs)
@@ -91,22 +247,21 @@ def compute_schema(schema_cls, default_kwargs, qs, include):
         if schema.only is not None and 'id' not in schema.only:
             schema.only += ('id',)
 
-    # manage compound documents
+    # manage compound documents. Related schemas are bound to the fields of the schema instance which are copies of the
+    # fields declared on the schema class, so the schema class is never altered.
     if include:
         for include_path in include:
             field = include_path.split('.')[0]
             relation_field = schema.declared_fields[field]
-            related_schema_cls = schema.declared_fields[field].__dict__['_Relationship__schema']
             related_schema_kwargs = {}
-            if isinstance(related_schema_cls, SchemaABC):
-                related_schema_kwargs['many'] = related_schema_cls.many
-                related_schema_cls = related_schema_cls.__class__
-            if isinstance(related_schema_cls, str):
-                related_schema_cls = class_registry.get_class(related_schema_cls)
-            related_schema = compute_schema(related_schema_cls,
-                                            related_schema_kwargs,
-                                            qs,
-                                            related_includes[field] or None)
+            related_schema = get_related_schema(schema_cls, field)
+            if isinstance(related_schema, SchemaABC):
+                related_schema_kwargs['many'] = related_schema.many
+            related_schema_cls = get_related_schema_cls(schema_cls, field)
+            related_schema = _compute_schema(related_schema_cls,
+                                             related_schema_kwargs,
+                                             qs,
+                                             related_includes[field] or None)
             relation_field.__dict__['_Relationship__schema'] = related_schema
 
     return schema
@@ -151,6 +306,22 @@ def get_related_schema(schema, field):
     return schema._declared_fields[field].__dict__['_Relationship__schema']
 
 
+def get_related_schema_cls(schema, field):
+    """Retrieve the class of the related schema of a relationship field without instantiating it
+
+    :param Schema schema: the schema to retrieve le relationship field from
+    :param field: the relationship field
+    :return Schema: the related schema class
+    """
+    related_schema = get_related_schema(schema, field)
+
+    if isinstance(related_schema, SchemaABC):
+        return related_schema.__class__
+    if isinstance(related_schema, str):
+        return class_registry.get_class(related_schema)
+    return related_schema
+
+
 def get_schema_from_type(resource_type):
     """Retrieve a schema from the registry by his type
 
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""Instrumentation of the phases of a request: querystring parsing, queries, serialization, encoding etc. Durations are
+sent in a Server-Timing header and to a metrics callback. Nothing is measured unless one of them is enabled.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+from timeit import default_timer
+
+from flask import g, request, current_app, has_request_context
+
+
+class RequestTimer(object):
+    """Durations of the phases of a request"""
+
+    def __init__(self):
+        """Initialize a timer, the request starts now"""
+        self.start = default_timer()
+        self.phases = OrderedDict()
+
+    def add(self, name, duration):
+        """Add a duration to a phase, a phase can happen several times in a request
+
+        :param str name: the name of the phase
+        :param float duration: the duration in seconds
+        """
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def stop(self):
+        """Record the duration of the whole request in the total phase"""
+        self.phases['total'] = default_timer() - self.start
+
+    def header(self):
+        """Compute the value of the Server-Timing header
+
+        :return str: the durations of the phases in milliseconds
+        """
+        return ', '.join('{};dur={:.2f}'.format(name, duration * 1000) for (name, duration) in self.phases.items())
+
+
+def get_timer():
+    """Return the timer of the current request
+
+    :return RequestTimer: the timer or None if timings are not collected
+    """
+    if has_request_context():
+        return getattr(g, '_flask_rest_jsonapi_timer', None)
+
+
+class timed(object):
+    """Context manager adding its duration to a phase of the timer of the current request"""
+
+    __slots__ = ('name', 'timer', 'start')
+
+    def __init__(self, name):
+        """Initialize a timed phase
+
+        :param str name: the name of the phase
+        """
+        self.name = name
+        self.timer = get_timer()
+
+    def __enter__(self):
+        if self.timer is not None:
+            self.start = default_timer()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.timer is not None:
+            self.timer.add(self.name, default_timer() - self.start)
+
+
+def collect_timings(view):
+    """Collect the durations of the phases of a request if the SERVER_TIMING configuration key is True or a metrics
+    callback is plugged to the Api
+
+    :param callable view: the view to decorate
+    :return callable: the wrapped view
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        server_timing = current_app.config.get('SERVER_TIMING', False) is True
+        metrics_callback = current_app.extensions.get('flask-rest-jsonapi', dict()).get('metrics_callback')
+        if server_timing is False and metrics_callback is None:
+            return view(*args, **kwargs)
+
+        timer = g._flask_rest_jsonapi_timer = RequestTimer()
+        response = current_app.make_response(view(*args, **kwargs))
+        timer.stop()
+
+        if server_timing is True:
+            response.headers['Server-Timing'] = timer.header()
+        if metrics_callback is not None:
+            metrics_callback(request.endpoint, request.method, response.status_code, timer.phases)
+
+        return response
+    return wrapper
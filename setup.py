@@ -30,8 +30,8 @@ setup(
                       'Flask>=0.11',
                       'marshmallow==2.13.1',
                       'marshmallow_jsonapi',
-                      'sqlalchemy'],
+                      'sqlalchemy>=1.2'],
     setup_requires=['pytest-runner'],
     tests_require=['pytest'],
-    extras_require={'tests': 'pytest', 'docs': 'sphinx'}
+    extras_require={'tests': 'pytest', 'docs': 'sphinx', 'orjson': 'orjson'}
 )
@@ -3,21 +3,27 @@
 from six.moves.urllib.parse import urlencode, parse_qs
 import pytest
 
-from sqlalchemy import create_engine, Column, Integer, DateTime, String, ForeignKey
+from sqlalchemy import create_engine, func, Column, Integer, DateTime, String, ForeignKey
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
-from flask import Blueprint, make_response, json
+from flask import Blueprint, make_response, json, abort, request
 from marshmallow_jsonapi.flask import Schema, Relationship
 from marshmallow_jsonapi import fields
 from marshmallow import ValidationError
 
 from flask_rest_jsonapi import Api, ResourceList, ResourceDetail, ResourceRelationship, JsonApiException
-from flask_rest_jsonapi.pagination import add_pagination_links
-from flask_rest_jsonapi.exceptions import RelationNotFound, InvalidSort, InvalidFilters, InvalidInclude, BadRequest
+from flask_rest_jsonapi.pagination import add_pagination_links, encode_cursor, UnknownCount
+from flask_rest_jsonapi.exceptions import RelationNotFound, InvalidSort, InvalidFilters, InvalidInclude, BadRequest,\
+    AccessDenied,\
+    RelatedObjectNotFound, ObjectNotFound
 from flask_rest_jsonapi.querystring import QueryStringManager as QSManager
-from flask_rest_jsonapi.data_layers.alchemy import SqlalchemyDataLayer
+from flask_rest_jsonapi.data_layers.alchemy import SqlalchemyDataLayer, READ_YOUR_WRITES_COOKIE, explain_count_estimator
 from flask_rest_jsonapi.data_layers.base import BaseDataLayer
-from flask_rest_jsonapi.data_layers.filtering.alchemy import Node
+from flask_rest_jsonapi.data_layers.filtering.alchemy import Node, create_filters
+from flask_rest_jsonapi.data_layers.memory import MemoryDataLayer, MemoryObject
+from flask_rest_jsonapi.query_counter import normalize, query_budget, QueryBudgetExceeded
+from flask_rest_jsonapi.cache import MemoryCacheBackend, ALL_TYPES, invalidate_resource
+from flask_rest_jsonapi.operations import Operations
 import flask_rest_jsonapi.decorators
 import flask_rest_jsonapi.resource
 import flask_rest_jsonapi.schema
@@ -89,6 +95,32 @@ def person_2(session, person_model):
     session_.commit()
 
 
+@pytest.fixture()
+def persons(request, session, person_model):
+    names = getattr(request, 'param', ('persons0', 'persons1', 'persons2'))
+    persons_ = [person_model(name=name) for name in names]
+    session_ = session
+    session_.add_all(persons_)
+    session_.commit()
+    yield persons_
+    for person_ in persons_:
+        session_.delete(person_)
+    session_.commit()
+
+
+@pytest.fixture()
+def statements(session):
+    from sqlalchemy import event
+    statements_ = []
+
+    def record(conn, cursor, statement, *args):
+        statements_.append(statement)
+
+    event.listen(session.bind, 'before_cursor_execute', record)
+    yield statements_
+    event.remove(session.bind, 'before_cursor_execute', record)
+
+
 @pytest.fixture()
 def computer(session, computer_model):
     computer_ = computer_model(serial='1')
@@ -309,6 +341,7 @@ def register_routes(client, app, api_blueprint, person_list, person_detail, pers
     api.route(computer_list, 'computer_list', '/computers', '/persons/<int:person_id>/computers')
     api.route(computer_list, 'computer_detail', '/computers/<int:id>')
     api.route(computer_owner, 'computer_owner', '/computers/<int:id>/relationships/owner')
+    api.operations()
     api.init_app(app)
 
 
@@ -339,6 +372,57 @@ def test_add_pagination_links(app):
         assert last_page_dict['page[number]'][0] == '5'
 
 
+def test_add_pagination_links_cursors(app):
+    with app.app_context():
+        app.config.setdefault('PAGE_SIZE', 30)
+        qsm = QSManager({'page[after]': 'abc', 'page[size]': '1', 'sort': 'name'})
+        pagination_dict = {'data': [{'id': '1'}]}
+        add_pagination_links(pagination_dict, 3, qsm, '/persons', cursors={'first': 'f', 'last': 'l'})
+        links = pagination_dict['links']
+        assert parse_qs(links['next'].split('?')[1])['page[after]'] == ['l']
+        assert parse_qs(links['prev'].split('?')[1])['page[before]'] == ['f']
+        assert parse_qs(links['first'].split('?')[1], keep_blank_values=True)['page[after]'] == ['']
+        qsm = QSManager({'page[before]': '', 'page[size]': '2'})
+        pagination_dict = {'data': [{'id': '1'}]}
+        add_pagination_links(pagination_dict, 1, qsm, '/persons', cursors={'first': 'f', 'last': 'l'})
+        assert 'next' not in pagination_dict['links'] and 'prev' not in pagination_dict['links']
+        qsm = QSManager({'page[after]': '', 'page[size]': '2'})
+        pagination_dict = {'data': [{'id': '1'}, {'id': '2'}]}
+        add_pagination_links(pagination_dict, 2, qsm, '/persons', cursors={'first': 'f', 'last': 'l'})
+        assert 'next' not in pagination_dict['links'] and 'prev' not in pagination_dict['links']
+
+
+def test_add_pagination_links_unknown_count(app):
+    with app.app_context():
+        qsm = QSManager({'page[number]': '2', 'page[size]': '10', 'page[count]': 'none'})
+        pagination_dict = dict()
+        add_pagination_links(pagination_dict, UnknownCount(True), qsm, '/persons')
+        links = pagination_dict['links']
+        assert 'last' not in links
+        assert parse_qs(links['next'].split('?')[1])['page[number]'] == ['3']
+        assert parse_qs(links['prev'].split('?')[1])['page[number]'] == ['1']
+        pagination_dict = dict()
+        add_pagination_links(pagination_dict, UnknownCount(False), qsm, '/persons')
+        assert 'next' not in pagination_dict['links']
+        with pytest.raises(BadRequest):
+            QSManager({'page[count]': 'error'}).pagination
+
+
+def test_cursor_encoding():
+    import uuid
+    from datetime import date, datetime, timedelta, timezone
+    from decimal import Decimal
+    from flask_rest_jsonapi.pagination import encode_cursor, decode_cursor
+    values = ['test', 1, datetime(2017, 1, 2, 3, 4, 5, 6), datetime(2017, 1, 2, 3, 4, 5), date(2017, 1, 2),
+              Decimal('1.10'), uuid.UUID('12345678-1234-5678-1234-567812345678'), None]
+    assert decode_cursor(encode_cursor(values), 'page[after]') == values
+    aware = datetime(2017, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=-5, minutes=-30)))
+    decoded = decode_cursor(encode_cursor([aware]), 'page[after]')[0]
+    assert decoded == aware and decoded.utcoffset() == aware.utcoffset()
+    with pytest.raises(BadRequest):
+        decode_cursor('error', 'page[after]')
+
+
 def test_Node(person_model, person_schema, monkeypatch):
     from copy import deepcopy
     filt = {
@@ -372,6 +456,27 @@ def test_Node(person_model, person_schema, monkeypatch):
         n.related_schema
 
 
+@pytest.mark.parametrize('persons', [('filter0',)], indirect=True)
+def test_create_filters_cache(session, person_model, person_schema, computer_schema, persons):
+    from flask_rest_jsonapi.data_layers.filtering.alchemy import filter_cache
+    filter_cache.clear()
+    resource = type('resource', (object,), dict(schema=person_schema))
+
+    def names(value):
+        filter_info = [{'or': [{'name': 'name', 'op': 'eq', 'val': value},
+                               {'name': 'computers', 'op': 'any', 'val': {'name': 'serial', 'op': 'eq', 'val': value}}]}]
+        filters = create_filters(person_model, filter_info, resource)
+        return [person.name for person in session.query(person_model).filter(*filters)]
+
+    assert names('filter0') == ['filter0']
+    assert names('filter1') == []
+    assert (filter_cache.hits, filter_cache.misses) == (1, 1)
+    create_filters(person_model, [{'name': 'name', 'op': 'in', 'val': ['filter0']}], resource)
+    assert filter_cache.misses == 2
+    with pytest.raises(InvalidFilters):
+        create_filters(person_model, [{'name': 'name', 'op': 'error', 'val': 'filter0'}], resource)
+
+
 def test_check_method_requirements(monkeypatch):
     self = type('self', (object,), dict())
     request = type('request', (object,), dict(method='GET'))
@@ -384,13 +489,49 @@ def test_json_api_exception():
     JsonApiException(None, None, title='test', status='test')
 
 
-def test_query_string_manager(person_schema):
+def test_query_string_manager(app, person_schema, monkeypatch):
     query_string = {'page[slumber]': '3'}
     qsm = QSManager(query_string)
     with pytest.raises(BadRequest):
         qsm.pagination
-    qsm.qs['sort'] = 'computers'
+    with pytest.raises(BadRequest):
+        QSManager({'page[after]': '', 'page[before]': ''}).pagination
+    with pytest.raises(BadRequest):
+        QSManager({'page[after]': '', 'page[number]': '2'}).pagination
+    with pytest.raises(BadRequest):
+        qsm.sorting
+    qsm = QSManager({'sort': 'computers', 'include': 'computers.owner'})
     assert qsm.sorting == [{'field': 'computers', 'order':'asc'}]
+    assert qsm.parsed is qsm.parsed
+    with pytest.raises(AttributeError):
+        qsm.parsed.sorting = []
+    monkeypatch.setitem(app.config, 'MAX_INCLUDE_DEPTH', 1)
+    with app.app_context():
+        with pytest.raises(InvalidInclude):
+            QSManager({'include': 'computers.owner'}).include
+        assert QSManager({'include': 'computers'}).include == ['computers']
+
+
+def test_query_string_manager_per_request(app, client, register_routes, person, person_detail, monkeypatch):
+    monkeypatch.setitem(app.extensions['flask-rest-jsonapi'], 'cache_backend', MemoryCacheBackend())
+    monkeypatch.setattr(person_detail, 'cache_ttl', 60)
+    monkeypatch.setattr(person_detail, 'etag', 'strong')
+    monkeypatch.setattr(person_detail._data_layer, 'version_field', 'name', raising=False)
+    parse_querystring = QSManager._parse_querystring
+    calls = []
+
+    def _parse_querystring(self):
+        calls.append(self)
+        return parse_querystring(self)
+
+    monkeypatch.setattr(QSManager, '_parse_querystring', _parse_querystring)
+    with client:
+        response = client.get('/persons/' + str(person.person_id) + '?fields[person]=name',
+                              content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        assert len(calls) == 1
+        client.get('/persons/' + str(person.person_id), content_type='application/vnd.api+json')
+        assert len(calls) == 2
 
 
 def test_resource(app, person_model, person_schema, session, monkeypatch):
@@ -420,6 +561,9 @@ def test_resource(app, person_model, person_schema, session, monkeypatch):
             .__new__(ResourceList)
         with pytest.raises(Exception):
             r.dispatch_request()
+        with pytest.raises(BadRequest):
+            rl.post()
+        query_string.pop('page[slumber]')
         rl.post()
         rd.patch()
 
@@ -432,6 +576,63 @@ def test_compute_schema(person_schema):
     flask_rest_jsonapi.schema.compute_schema(person_schema, dict(only=list()), qsm, list())
 
 
+@pytest.fixture()
+def schema_cache():
+    schema_cache = flask_rest_jsonapi.schema.schema_cache
+    schema_cache.clear()
+    yield schema_cache
+    schema_cache.clear()
+
+
+def test_compute_schema_cache(person_schema, computer_schema, schema_cache, monkeypatch):
+    qsm = QSManager({'fields[person]': 'name'})
+    schema = flask_rest_jsonapi.schema.compute_schema(person_schema, dict(), qsm, ['computers'])
+    assert (schema_cache.hits, schema_cache.misses) == (0, 1)
+    schema.included_data[('computer', '1')] = dict()
+    assert flask_rest_jsonapi.schema.compute_schema(person_schema, dict(), qsm, ['computers']) is schema
+    assert (schema_cache.hits, schema_cache.misses) == (1, 1)
+    assert schema.included_data == dict()
+    assert flask_rest_jsonapi.schema.compute_schema(person_schema, dict(many=True), qsm, ['computers']) is not schema
+    assert flask_rest_jsonapi.schema.compute_schema(person_schema, dict(), qsm, list()) is not schema
+    assert schema_cache.misses == 3
+    monkeypatch.setattr(schema_cache, 'maxsize', 1)
+    flask_rest_jsonapi.schema.compute_schema(person_schema, dict(only=('name',)), qsm, list())
+    assert len(schema_cache.schemas) == 1
+
+
+def test_compute_schema_threads(person_schema, computer_schema):
+    from threading import Thread
+    declared_field = person_schema._declared_fields['computers']
+    declared_state = dict(declared_field.__dict__)
+    schemas = {}
+
+    def compute(include):
+        for i in range(20):
+            schemas[tuple(include)] = flask_rest_jsonapi.schema.compute_schema(person_schema,
+                                                                               dict(),
+                                                                               QSManager(dict()),
+                                                                               include)
+
+    threads = [Thread(target=compute, args=(include,)) for include in (['computers'], ['computers.owner'], [])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert declared_field.__dict__ == declared_state
+    computers_schema = schemas[('computers',)].declared_fields['computers'].schema
+    assert computers_schema.include_data == tuple()
+    computers_owner_schema = schemas[('computers.owner',)].declared_fields['computers'].schema
+    assert computers_owner_schema.include_data == ('owner',)
+
+
+def test_relationship_get_related_url():
+    field = flask_rest_jsonapi.schema.Relationship(type_='computer', schema='ComputerSchema', many=True)
+    state = dict(field.__dict__)
+    assert field.get_related_url(dict(id=1)) == '/computer'
+    assert field.__dict__ == state
+
+
 # test good cases
 def test_get_list(client, register_routes, person, person_2):
     with client:
@@ -731,6 +932,190 @@ def test_get_list_response(client, register_routes):
         assert response.status_code == 200
 
 
+def test_get_detail_etag(client, register_routes, person, person_detail, monkeypatch):
+    with client:
+        response = client.get('/persons/' + str(person.person_id), content_type='application/vnd.api+json')
+        assert 'ETag' not in response.headers
+        monkeypatch.setattr(person_detail, 'etag', 'strong')
+        response = client.get('/persons/' + str(person.person_id), content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        response = client.get('/persons/' + str(person.person_id),
+                              content_type='application/vnd.api+json',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+def test_get_detail_version_etag(client, register_routes, session, person, person_detail, monkeypatch):
+    monkeypatch.setattr(person_detail._data_layer, 'version_field', 'name', raising=False)
+    monkeypatch.setattr(person_detail, 'etag', 'strong')
+    with client:
+        response = client.get('/persons/' + str(person.person_id), content_type='application/vnd.api+json')
+        assert not response.headers['ETag'].startswith('W/')
+        monkeypatch.setattr(person_detail, 'etag', 'weak')
+        response = client.get('/persons/' + str(person.person_id), content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert etag.startswith('W/')
+
+        def get_object(*args, **kwargs):
+            raise Exception("the object must not be retrieved")
+        monkeypatch.setattr(person_detail, 'get_object', get_object)
+        response = client.get('/persons/' + str(person.person_id),
+                              content_type='application/vnd.api+json',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        monkeypatch.undo()
+
+        person.name = 'test_version'
+        session.commit()
+        monkeypatch.setattr(person_detail._data_layer, 'version_field', 'name', raising=False)
+        monkeypatch.setattr(person_detail, 'etag', 'weak')
+        response = client.get('/persons/' + str(person.person_id),
+                              content_type='application/vnd.api+json',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+        def get_object_version(*args, **kwargs):
+            raise Exception("the version doesn't cover the included objects")
+        monkeypatch.setattr(person_detail._data_layer, 'get_object_version', get_object_version, raising=False)
+        response = client.get('/persons/' + str(person.person_id) + '?include=computers',
+                              content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        assert 'ETag' in response.headers
+
+
+def test_get_detail_version_etag_access_denied(client, register_routes, person, person_detail, monkeypatch):
+    monkeypatch.setattr(person_detail._data_layer, 'version_field', 'name', raising=False)
+    monkeypatch.setattr(person_detail, 'etag', 'strong')
+    url = '/persons/' + str(person.person_id)
+
+    with client:
+        etag = client.get(url, content_type='application/vnd.api+json').headers['ETag']
+        response = client.get(url, content_type='application/vnd.api+json',
+                              headers={'If-None-Match': etag, 'Authorization': 'Bearer other'})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+        def check_permissions(get):
+            def wrapper(*args, **kwargs):
+                if request.headers.get('X-Denied'):
+                    raise AccessDenied('Access denied')
+                return get(*args, **kwargs)
+            return wrapper
+
+        monkeypatch.setattr(person_detail, 'get', check_permissions(person_detail.get))
+        with query_budget(0):
+            response = client.get(url, content_type='application/vnd.api+json',
+                                  headers={'If-None-Match': etag, 'X-Denied': '1'})
+        assert response.status_code == 403
+        response = client.get(url, content_type='application/vnd.api+json', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+
+def test_sqlalchemy_data_layer_collection_version(session, person_model, person_list, person, person_2):
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, resource=person_list, version_field='person_id'))
+    count, version, version_sum = dl.get_collection_version(QSManager(dict()), dict())
+    assert count == session.query(person_model).count()
+    assert version >= person_2.person_id
+    assert version_sum == session.query(func.sum(person_model.person_id)).scalar()
+    querystring = {'filter': json.dumps([{'name': 'id', 'op': 'eq', 'val': person.person_id}])}
+    assert dl.get_collection_version(QSManager(querystring), dict()) == (1, person.person_id, person.person_id)
+
+    dl.version_field = 'birth_date'
+    assert dl.get_collection_version(QSManager(querystring), dict())[2] is None
+
+
+def test_json_encoder(app, client, register_routes, monkeypatch):
+    from datetime import datetime
+    from flask_rest_jsonapi.encoders import JSONEncoder, StdlibJSONEncoder, make_json_response
+
+    class Encoder(JSONEncoder):
+        def encode(self, data):
+            return b'{"encoder":"test"}'
+
+    with app.app_context():
+        assert json.loads(StdlibJSONEncoder().encode({'date': datetime(2017, 1, 1)}).decode('utf-8')) ==\
+            {'date': '2017-01-01T00:00:00'}
+        with pytest.raises(TypeError):
+            StdlibJSONEncoder().encode({'object': object()})
+        response = make_json_response({'data': None}, 201)
+        assert response.status_code == 201
+        assert response.headers['Content-Type'] == 'application/vnd.api+json'
+
+        class Point(object):
+            pass
+
+        def default(obj):
+            if isinstance(obj, Point):
+                return 'point'
+            raise TypeError()
+
+        if hasattr(app, 'json'):
+            monkeypatch.setattr(app.json, 'default', default)
+        else:
+            monkeypatch.setattr(app, 'json_encoder', type('AppEncoder', (object,), dict(default=staticmethod(default))))
+        assert StdlibJSONEncoder().encode({'point': Point()}) == b'{"point":"point"}'
+
+    monkeypatch.setitem(app.extensions['flask-rest-jsonapi'], 'json_encoder', Encoder())
+    with client:
+        response = client.get('/persons', content_type='application/vnd.api+json')
+        assert response.data == b'{"encoder":"test"}'
+        assert response.headers['Content-Type'] == 'application/vnd.api+json'
+
+
+def test_json_encoders_output():
+    from datetime import datetime, date, time, timedelta, timezone
+    from decimal import Decimal
+    from uuid import UUID
+    from flask_rest_jsonapi.encoders import StdlibJSONEncoder, OrjsonEncoder
+
+    pytest.importorskip('orjson')
+    document = {'meta': {'datetime': datetime(2017, 1, 1, 12, 30, 15, 250),
+                         'aware': datetime(2017, 1, 1, tzinfo=timezone(timedelta(hours=2))),
+                         'date': date(2017, 1, 1),
+                         'time': time(12, 30),
+                         'decimal': Decimal('1.10'),
+                         'uuid': UUID('12345678-1234-5678-1234-567812345678')}}
+    assert OrjsonEncoder().encode(document) == StdlibJSONEncoder().encode(document)
+    assert json.loads(StdlibJSONEncoder().encode(document).decode('utf-8'))['meta'] ==\
+        {'datetime': '2017-01-01T12:30:15.000250',
+         'aware': '2017-01-01T00:00:00+02:00',
+         'date': '2017-01-01',
+         'time': '12:30:00',
+         'decimal': '1.10',
+         'uuid': '12345678-1234-5678-1234-567812345678'}
+
+
+@pytest.mark.parametrize('persons', [('group0', 'group1', 'group0')], indirect=True)
+def test_get_list_group(client, register_routes, persons):
+    with client:
+        querystring = urlencode({'group': 'name',
+                                 'aggregate[max]': 'id',
+                                 'filter': json.dumps([{'name': 'name', 'op': 'like', 'val': 'group%'}])})
+        response = client.get('/persons?' + querystring, content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        groups = json.loads(response.get_data().decode('utf-8'))['meta']['groups']
+        assert groups == [{'group': {'name': 'group0'}, 'count': 2, 'max': {'id': persons[2].person_id}},
+                          {'group': {'name': 'group1'}, 'count': 1, 'max': {'id': persons[1].person_id}}]
+        querystring = urlencode({'group': 'name',
+                                 'sort': '-name',
+                                 'page[size]': '1',
+                                 'page[number]': '2',
+                                 'filter': json.dumps([{'name': 'name', 'op': 'like', 'val': 'group%'}])})
+        response = client.get('/persons?' + querystring, content_type='application/vnd.api+json')
+        groups = json.loads(response.get_data().decode('utf-8'))['meta']['groups']
+        assert groups == [{'group': {'name': 'group0'}, 'count': 2}]
+        for querystring in ({'group': 'computers'}, {'group': 'error'}, {'group': 'name', 'aggregate[error]': 'id'},
+                            {'aggregate[sum]': 'id'}, {'group': 'name', 'sort': 'birth_date'},
+                            {'group': 'name', 'page[after]': ''}):
+            response = client.get('/persons?' + urlencode(querystring), content_type='application/vnd.api+json')
+            assert response.status_code == 400
+
+
 # test various Accept headers
 def test_single_accept_header(client, register_routes):
     with client:
@@ -1008,6 +1393,194 @@ def test_sqlalchemy_data_layer_delete_relationship_error(session, person_model,
         dl.delete_relationship(dict(data=None), 'foo', '', dict(id=1))
 
 
+def test_sqlalchemy_data_layer_keyset_pagination(app, session, person_model, person_list, persons):
+    from datetime import datetime
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, resource=person_list))
+    querystring = {'filter': json.dumps([{'name': 'name', 'op': 'like', 'val': 'persons%'}]),
+                   'sort': '-name',
+                   'page[size]': '2'}
+    with app.app_context():
+        qs = QSManager(dict(querystring, **{'page[after]': ''}))
+        page = dl.get_collection(qs, dict())[1]
+        assert [person.name for person in page] == ['persons2', 'persons1']
+        cursors = dl.get_cursors(page, qs)
+        qs = QSManager(dict(querystring, **{'page[after]': cursors['last']}))
+        page = dl.get_collection(qs, dict())[1]
+        assert [person.name for person in page] == ['persons0']
+        qs = QSManager(dict(querystring, **{'page[before]': dl.get_cursors(page, qs)['first']}))
+        assert [person.name for person in dl.get_collection(qs, dict())[1]] == ['persons2', 'persons1']
+        qs = QSManager(dict(querystring, **{'page[before]': ''}))
+        assert [person.name for person in dl.get_collection(qs, dict())[1]] == ['persons1', 'persons0']
+        qs = QSManager({'sort': 'name,-person_id',
+                        'page[after]': encode_cursor(['persons0', 0])})
+        dl.paginate_query(session.query(person_model), qs.pagination, qs.sorting)
+        with pytest.raises(BadRequest):
+            qs = QSManager({'page[after]': encode_cursor(['persons0', 1])})
+            dl.paginate_query(session.query(person_model), qs.pagination, qs.sorting)
+
+        persons[0].birth_date = datetime(2017, 1, 2)
+        persons[2].birth_date = datetime(2017, 1, 1)
+        session.commit()
+        for sort, names in (('birth_date', ['persons2', 'persons0', 'persons1']),
+                            ('-birth_date,name', ['persons1', 'persons0', 'persons2'])):
+            querystring = {'filter': json.dumps([{'name': 'name', 'op': 'like', 'val': 'persons%'}]),
+                           'sort': sort,
+                           'page[size]': '1'}
+            qs = QSManager(dict(querystring, **{'page[after]': ''}))
+            pages = []
+            for index in range(4):
+                page = dl.get_collection(qs, dict())[1]
+                if not page:
+                    break
+                pages.append(page[0].name)
+                qs = QSManager(dict(querystring, **{'page[after]': dl.get_cursors(page, qs)['last']}))
+            assert pages == names
+            qs = QSManager(dict(querystring, **{'page[before]': ''}))
+            pages = []
+            for index in range(4):
+                page = dl.get_collection(qs, dict())[1]
+                if not page:
+                    break
+                pages.insert(0, page[0].name)
+                qs = QSManager(dict(querystring, **{'page[before]': dl.get_cursors(page, qs)['first']}))
+            assert pages == names
+
+
+def test_sqlalchemy_data_layer_get_related_objects(session, person_model, person, person_2, statements):
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, related_objects_chunk_size=1))
+    ids = [{'id': str(person_2.person_id)}, {'id': str(person.person_id)}, {'id': str(person_2.person_id)}]
+    del statements[:]
+    related_objects = dl.get_related_objects(person_model, 'person_id', ids)
+    assert related_objects == [person_2, person, person_2]
+    assert len(statements) == 2
+    dl.related_objects_chunk_size = 500
+    del statements[:]
+    dl.get_related_objects(person_model, 'person_id', ids)
+    assert len(statements) == 1
+    with pytest.raises(RelatedObjectNotFound):
+        dl.get_related_objects(person_model, 'person_id', ids + [{'id': '0'}])
+
+
+def test_sqlalchemy_data_layer_eagerload_strategy(app, session, person_model, person_list, person, computer,
+                                                  computer_schema, statements):
+    computer.person = person
+    session.commit()
+    session.expire_all()
+    del statements[:]
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, resource=person_list))
+    qs = QSManager({'include': 'computers.owner', 'page[size]': '0', 'page[count]': 'none'})
+    with app.app_context():
+        collection = dl.get_collection(qs, dict())[1]
+        assert len(statements) == 2
+        assert 'JOIN' not in statements[0] and 'IN (' in statements[1] and 'JOIN' in statements[1]
+        del statements[:]
+        session.expire_all()
+        dl.eagerload_strategy = {'computers': 'joined', 'computers.owner': 'selectin'}
+        collection = dl.get_collection(qs, dict())[1]
+        assert len(statements) == 2 and 'JOIN' in statements[0]
+        assert [computer_.person for person_ in collection for computer_ in person_.computers] == [person]
+        assert len(statements) == 2
+        dl.eagerload_strategy = {'computers': 'raise'}
+        with pytest.raises(InvalidInclude):
+            dl.get_collection(qs, dict())
+
+
+def test_sqlalchemy_data_layer_load_only_fields(app, session, person_model, person_list, person, computer,
+                                                computer_schema, statements):
+    computer.person = person
+    session.commit()
+    session.expire_all()
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, resource=person_list))
+    querystring = {'include': 'computers', 'fields[person]': 'name,computers', 'fields[computer]': 'serial',
+                   'page[size]': '10', 'filter': json.dumps([{'name': 'id', 'op': 'eq', 'val': person.person_id}])}
+    del statements[:]
+    with app.app_context():
+        collection = dl.get_collection(QSManager(querystring), dict())[1]
+        assert [computer_.serial for person_ in collection for computer_ in person_.computers] == ['1']
+        assert not any('birth_date' in statement for statement in statements)
+        assert len(statements) == 3
+        del statements[:]
+        session.expire_all()
+        querystring['fields[person]'] = 'name'
+        dl.get_collection(QSManager(querystring), dict())
+        assert len(statements) == 2
+        del statements[:]
+        session.expire_all()
+        dl.load_only_fields = False
+        dl.get_collection(QSManager(querystring), dict())
+        assert 'birth_date' in statements[-1]
+
+
+@pytest.fixture()
+def person_search(session, person_model, persons):
+    from flask_rest_jsonapi.data_layers.search.alchemy import SqliteFtsSearch
+    search = SqliteFtsSearch('person_fts')
+    for statement in search.create_statements(person_model, ['name']):
+        session.execute(statement)
+    session.commit()
+    yield search
+    for statement in search.drop_statements():
+        session.execute(statement)
+    session.commit()
+
+
+@pytest.mark.parametrize('persons', [('john doe', 'jane doe', 'john')], indirect=True)
+def test_sqlalchemy_data_layer_search(app, session, person_model, person_list, persons, person_search, statements):
+    persons[2].name = 'john john'
+    session.commit()
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, resource=person_list, search=person_search))
+    with app.app_context():
+        count, collection = dl.get_collection(QSManager({'q': 'john', 'page[size]': '10'}), dict())
+        assert count == 2
+        assert [person.name for person in collection] == ['john john', 'john doe']
+        querystring = {'q': 'doe', 'sort': '-name', 'page[size]': '1', 'page[number]': '2',
+                       'filter': json.dumps([{'name': 'name', 'op': 'like', 'val': '%o%'}])}
+        count, collection = dl.get_collection(QSManager(querystring), dict())
+        assert count == 2 and [person.name for person in collection] == ['jane doe']
+        assert dl.get_collection(QSManager({'q': 'doe" OR', 'page[size]': '10'}), dict())[0] == 0
+        person_search.raw = True
+        del statements[:]
+        assert dl.get_collection(QSManager({'q': 'john OR jane', 'page[size]': '10'}), dict())[0] == 3
+        assert len(statements) == 2
+        with pytest.raises(BadRequest):
+            dl.get_collection(QSManager({'q': 'doe" OR'}), dict())
+        dl.search = None
+        with pytest.raises(BadRequest):
+            dl.get_collection(QSManager({'q': 'john'}), dict())
+
+
+def test_sqlalchemy_data_layer_count_policy(app, session, person_model, person_list, persons):
+    dl = SqlalchemyDataLayer(dict(session=session,
+                                  model=person_model,
+                                  resource=person_list,
+                                  count_policy='none',
+                                  count_estimator=lambda query: 42))
+    querystring = {'filter': json.dumps([{'name': 'name', 'op': 'like', 'val': 'persons%'}]), 'page[size]': '2'}
+    with app.app_context():
+        object_count, collection = dl.get_collection(QSManager(querystring), dict())
+        assert object_count.has_next is True and object_count.estimate is None
+        assert len(collection) == 2
+        querystring['page[number]'] = '2'
+        object_count, collection = dl.get_collection(QSManager(querystring), dict())
+        assert object_count.has_next is False
+        assert len(collection) == 1
+        querystring['page[count]'] = 'exact'
+        assert dl.get_collection(QSManager(querystring), dict())[0].estimate is None
+        dl.count_policy = 'exact'
+        assert dl.get_collection(QSManager(querystring), dict())[0] == 3
+        querystring['page[count]'] = 'estimated'
+        assert dl.get_collection(QSManager(querystring), dict())[0].estimate == 42
+        del dl.count_estimator
+        assert dl.get_collection(QSManager(querystring), dict())[0].estimate is None
+        dl.count_policy = 'estimated'
+        querystring['page[count]'] = 'exact'
+        assert dl.get_collection(QSManager(querystring), dict())[0].estimate is None
+
+    with pytest.raises(Exception) as excinfo:
+        explain_count_estimator(session.query(person_model))
+    assert 'requires PostgreSQL' in str(excinfo.value)
+
+
 def test_sqlalchemy_data_layer_sort_query_error(session, person_model, monkeypatch):
     with pytest.raises(InvalidSort):
         dl = SqlalchemyDataLayer(dict(session=session, model=person_model))
@@ -1062,6 +1635,236 @@ def test_post_list_validation_error(client, register_routes, computer):
         assert response.status_code == 422
 
 
+def test_post_list_bulk(client, register_routes, computer, person_list, session, person_model, monkeypatch):
+    payload = {
+        'data': [
+            {
+                'type': 'person',
+                'attributes': {'name': 'bulk 1'},
+                'relationships': {'computers': {'data': [{'type': 'computer', 'id': str(computer.id)}]}}
+            },
+            {
+                'type': 'person',
+                'attributes': {'name': 'bulk 2'}
+            }
+        ]
+    }
+
+    with client:
+        response = client.post('/persons', data=json.dumps(payload), content_type='application/vnd.api+json')
+        assert response.status_code == 400
+
+    monkeypatch.setattr(person_list, 'allow_bulk_create', True, raising=False)
+
+    with client:
+        response = client.post('/persons', data=json.dumps(payload), content_type='application/vnd.api+json')
+        assert response.status_code == 201
+        result = json.loads(response.get_data())
+        assert [item['attributes']['name'] for item in result['data']] == ['bulk 1', 'bulk 2']
+
+    persons = session.query(person_model).filter(person_model.name.in_(['bulk 1', 'bulk 2'])).all()
+    assert len(persons) == 2
+    assert [c.id for c in persons[0].computers + persons[1].computers] == [computer.id]
+
+    payload['data'][0]['attributes']['name'] = 'bulk 3'
+    del payload['data'][1]['attributes']['name']
+
+    with client:
+        response = client.post('/persons', data=json.dumps(payload), content_type='application/vnd.api+json')
+        assert response.status_code == 422
+        assert json.loads(response.get_data())['errors'][0]['source']['pointer'] == '/data/1/attributes/name'
+    assert session.query(person_model).filter_by(name='bulk 3').count() == 0
+
+    for person_ in persons:
+        session.delete(person_)
+    session.commit()
+
+
+def test_operations(client, register_routes, session, person_model, computer_model, person_schema,
+                    computer_schema):
+    content_type = 'application/vnd.api+json; ext="https://jsonapi.org/ext/atomic"'
+    payload = {
+        'atomic:operations': [
+            {'op': 'add', 'data': {'type': 'person', 'lid': 'a', 'attributes': {'name': 'atomic'}}},
+            {'op': 'add', 'data': {'type': 'computer',
+                                   'attributes': {'serial': 'atomic'},
+                                   'relationships': {'owner': {'data': {'type': 'person', 'lid': 'a'}}}}},
+            {'op': 'update', 'data': {'type': 'person', 'lid': 'a', 'attributes': {'name': 'atomic updated'}}}
+        ]
+    }
+
+    with client:
+        response = client.post('/operations', data=json.dumps(payload), content_type=content_type)
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == content_type
+        results = json.loads(response.get_data())['atomic:results']
+        assert [result['data']['type'] for result in results] == ['person', 'computer', 'person']
+        assert results[2]['data']['attributes']['name'] == 'atomic updated'
+
+    person_ = session.query(person_model).filter_by(name='atomic updated').one()
+    assert [computer_.serial for computer_ in person_.computers] == ['atomic']
+
+    payload = {
+        'atomic:operations': [
+            {'op': 'add', 'data': {'type': 'person', 'attributes': {'name': 'rolled back'}}},
+            {'op': 'remove', 'ref': {'type': 'person', 'id': str(person_.person_id)}},
+            {'op': 'update', 'ref': {'type': 'person', 'id': '0'},
+             'data': {'type': 'person', 'id': '0', 'attributes': {'name': 'missing'}}}
+        ]
+    }
+
+    with client:
+        response = client.post('/operations', data=json.dumps(payload), content_type=content_type)
+        assert response.status_code == 404
+        error = json.loads(response.get_data())['errors'][0]
+        assert error['source']['pointer'].startswith('/atomic:operations/2')
+
+    assert session.query(person_model).filter_by(name='rolled back').count() == 0
+    assert session.query(person_model).filter_by(name='atomic updated').count() == 1
+
+    payload = {'atomic:operations': [{'op': 'add', 'data': {'type': 'person', 'attributes': {}}}]}
+
+    with client:
+        response = client.post('/operations', data=json.dumps(payload), content_type=content_type)
+        assert response.status_code == 422
+        error = json.loads(response.get_data())['errors'][0]
+        assert error['source']['pointer'] == '/atomic:operations/0/data/attributes/name'
+
+    session.delete(person_.computers[0])
+    session.delete(person_)
+    session.commit()
+
+
+def test_operations_access_controls(app, client, register_routes, session, person_model, person, person_list,
+                                    person_detail, monkeypatch):
+    content_type = 'application/vnd.api+json; ext="https://jsonapi.org/ext/atomic"'
+
+    monkeypatch.setattr(person_detail, 'methods', ['GET', 'PATCH'])
+    payload = {'atomic:operations': [{'op': 'remove', 'ref': {'type': 'person', 'id': str(person.person_id)}}]}
+    with client:
+        response = client.post('/operations', data=json.dumps(payload), content_type=content_type)
+        assert response.status_code == 405
+    assert session.query(person_model).filter_by(person_id=person.person_id).count() == 1
+
+    updates = []
+
+    def update_object(self, data, qs, kwargs):
+        updates.append(kwargs)
+        return self._data_layer.get_object(kwargs)
+
+    monkeypatch.setattr(person_detail, 'update_object', update_object)
+    payload = {'atomic:operations': [{'op': 'update', 'data': {'type': 'person', 'id': str(person.person_id),
+                                                               'attributes': {'name': 'ignored'}}}]}
+    with client:
+        response = client.post('/operations', data=json.dumps(payload), content_type=content_type)
+        assert response.status_code == 200
+    assert updates == [{'person_id': str(person.person_id)}]
+
+    def deny(view):
+        def wrapper(*args, **kwargs):
+            abort(403)
+        return wrapper
+
+    monkeypatch.setattr(person_list, 'decorators', person_list.decorators + (deny,))
+    payload = {'atomic:operations': [{'op': 'add', 'data': {'type': 'person', 'attributes': {'name': 'denied'}}}]}
+    with client:
+        response = client.post('/operations', data=json.dumps(payload), content_type=content_type)
+        assert response.status_code == 403
+    assert session.query(person_model).filter_by(name='denied').count() == 0
+
+    class PersonDetailPermission(person_detail):
+        pass
+
+    def check_permissions(view, view_args, view_kwargs, *args, **kwargs):
+        assert view.__name__ == 'patch' and isinstance(view_args[0], PersonDetailPermission)
+        raise AccessDenied('Access denied')
+
+    api = Api()
+    api.route(PersonDetailPermission, 'person_detail_permission', '/persons_permission/<int:person_id>')
+    api.permission_manager(check_permissions)
+
+    def patch(resource, *args, **kwargs):
+        return kwargs
+
+    with app.test_request_context():
+        with pytest.raises(AccessDenied):
+            Operations(api).dispatch(PersonDetailPermission(), 'PATCH', patch, {'person_id': person.person_id})
+
+
+def test_server_timing(app, client, register_routes, person, monkeypatch):
+    metrics = []
+    monkeypatch.setitem(app.config, 'SERVER_TIMING', True)
+    monkeypatch.setitem(app.extensions['flask-rest-jsonapi'], 'metrics_callback',
+                        lambda *args: metrics.append(args))
+
+    with client:
+        response = client.get('/persons/' + str(person.person_id), content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        phases = [phase.split(';')[0] for phase in response.headers['Server-Timing'].split(', ')]
+        assert {'querystring', 'query', 'schema', 'dump', 'encode'} <= set(phases)
+        assert phases[-1] == 'total'
+
+    assert metrics[0][:3] == ('api.person_detail', 'GET', 200)
+    assert metrics[0][3]['total'] > 0
+
+    monkeypatch.setitem(app.config, 'SERVER_TIMING', False)
+    with client:
+        response = client.patch('/persons/' + str(person.person_id),
+                                data=json.dumps({'data': {'type': 'person', 'id': str(person.person_id),
+                                                          'attributes': {'name': 'timed'}}}),
+                                content_type='application/vnd.api+json')
+        assert 'Server-Timing' not in response.headers
+    assert metrics[1][:3] == ('api.person_detail', 'PATCH', 200)
+    assert {'load', 'commit', 'dump'} <= set(metrics[1][3])
+
+
+def test_operations_transactions(client, register_routes, engine, session, person_model, computer_list,
+                                 monkeypatch):
+    content_type = 'application/vnd.api+json; ext="https://jsonapi.org/ext/atomic"'
+    monkeypatch.setattr(computer_list._data_layer, 'session', sessionmaker(bind=engine)())
+    payload = {
+        'atomic:operations': [
+            {'op': 'add', 'data': {'type': 'person', 'attributes': {'name': 'split'}}},
+            {'op': 'add', 'data': {'type': 'computer', 'attributes': {'serial': 'split'}}}
+        ]
+    }
+
+    with client:
+        response = client.post('/operations', data=json.dumps(payload), content_type=content_type)
+        assert response.status_code == 400
+        error = json.loads(response.get_data())['errors'][0]
+        assert error['source']['pointer'] == '/atomic:operations/1'
+
+    assert session.query(person_model).filter_by(name='split').count() == 0
+
+
+def test_query_counter(app, client, register_routes, session, person_model, person, person_2, computer,
+                       monkeypatch):
+    assert normalize("SELECT *  FROM person\nWHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10") ==\
+        "SELECT * FROM person WHERE id IN (?) AND name = ? LIMIT ?"
+
+    url = '/persons/{}?include=computers'.format(person.person_id)
+    with query_budget(3, max_repeated=1) as counter:
+        with client:
+            response = client.get(url, content_type='application/vnd.api+json')
+            assert response.status_code == 200
+            assert 'X-Query-Count' not in response.headers
+    assert counter.count > 0
+
+    monkeypatch.setitem(app.config, 'QUERY_COUNTER', True)
+    monkeypatch.setitem(app.config, 'N_PLUS_ONE_THRESHOLD', 0)
+    with client:
+        response = client.get(url, content_type='application/vnd.api+json')
+        assert response.headers['X-Query-Count'] == str(counter.count)
+        assert response.headers['X-N-Plus-One'] == '1'
+
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(max_repeated=1):
+            for person_ in (person, person_2):
+                session.expire(person_)
+                person_.name
+
+
 def test_patch_detail_incorrect_type(client, register_routes, computer, person):
     payload = {
         'data': {
@@ -1548,3 +2351,329 @@ def test_api_resources(app, person_list):
     api = Api()
     api.route(person_list, 'person_list2', '/persons', '/person_list')
     api.init_app(app)
+
+
+def test_memory_data_layer(app, register_routes, person_schema, computer_schema):
+    import threading
+    from datetime import datetime
+    persons = [MemoryObject(person_id=index, name=name, birth_date=None)
+               for (index, name) in enumerate(['Ada', 'Bob', 'ada', 'Carl'], 1)]
+    dl = MemoryDataLayer(dict(objects=persons, id_field='person_id', url_field='person_id', indexes=['name'],
+                              sort_indexes=['name']))
+    dl.resource = type('PersonMemory', (object,), dict(schema=person_schema))
+
+    with app.app_context():
+        qs = QSManager({'filter': json.dumps([{'name': 'name', 'op': 'in_', 'val': ['Ada', 'Bob']}]),
+                        'sort': '-name'})
+        assert dl.index_lookup(dl.store.storage, qs.filters) == {'1', '2'}
+        count, objects = dl.get_collection(qs, dict())
+        assert count == 2 and [obj.person_id for obj in objects] == [2, 1]
+
+        qs = QSManager({'filter': json.dumps([{'name': 'name', 'op': 'ilike', 'val': 'a%'}]),
+                        'sort': 'name,-id', 'page[size]': '1', 'page[number]': '2'})
+        count, objects = dl.get_collection(qs, dict())
+        assert count == 2 and [obj.person_id for obj in objects] == [3]
+        with pytest.raises(InvalidSort):
+            dl.get_collection(QSManager({'sort': 'password'}), dict())
+
+        obj = dl.create_object({'name': 'Dan'}, dict())
+        assert obj.person_id == 5 and dl.store.storage.objects['5'] is obj
+        assert MemoryDataLayer(dict(store=dl.store)).get_object({'id': 5}).name == 'Dan'
+
+        storage = dl.store.storage
+        obj = dl.get_object({'person_id': 5})
+        dl.update_object(obj, {'name': 'Abe'}, dict())
+        assert obj.name == 'Abe' and storage.objects['5'].name == 'Dan'
+        assert ((True, 'Dan'), '5') in storage.sorted_indexes['name']
+        count, objects = dl.get_collection(QSManager({'sort': 'name'}), dict())
+        assert [obj_.name for obj_ in objects] == ['Abe', 'Ada', 'Bob', 'Carl', 'ada']
+        assert dl.store.storage.hash_indexes['name']['Ada'] is storage.hash_indexes['name']['Ada']
+
+        storage = dl.store.storage
+        dl.update_object(dl.get_object({'person_id': 2}), {'birth_date': datetime(2017, 1, 1)}, dict())
+        assert dl.store.storage.hash_indexes is storage.hash_indexes
+        assert dl.store.storage.sorted_indexes is storage.sorted_indexes
+
+        dl.begin_operations()
+        dl.update_object(obj, {'name': 'Eve'}, dict())
+        objects = dl.store.storage.objects
+        dl.delete_object(persons[0], dict())
+        assert dl.store.storage.objects is objects and '1' not in objects
+        names = []
+        reader = threading.Thread(target=lambda: names.append(dl.store.storage.objects['5'].name))
+        reader.start()
+        reader.join()
+        assert names == ['Abe'] and dl.store.storage.objects['5'].name == 'Eve'
+        dl.rollback_operations()
+        assert dl.get_object({'person_id': 5}).name == 'Abe' and dl.store.storage.objects['1'] is persons[0]
+        assert dl.index_lookup(dl.store.storage, [{'name': 'name', 'op': 'eq', 'val': 'Abe'}]) == {'5'}
+
+        computers = MemoryDataLayer(dict(objects=[MemoryObject(id=1, serial='Amstrad', owner=persons[1])],
+                                         relationships={'owner': dl.store}))
+        computers.resource = type('ComputerMemory', (object,), dict(schema=computer_schema))
+        dl.update_object(dl.get_object({'person_id': 2}), {'name': 'Bea'}, dict())
+        assert persons[1].name == 'Bob' and computers.get_object({'id': 1}).owner.name == 'Bea'
+
+        storage = computers.store.storage
+        computers.update_relationship({'data': {'type': 'person', 'id': '1'}}, 'owner', 'id', {'id': 1})
+        assert storage.objects['1'].owner is persons[1] and computers.get_object({'id': 1}).owner is persons[0]
+
+
+def test_memory_data_layer_cache_invalidation(app, person_schema, monkeypatch):
+    cache_backend = MemoryCacheBackend()
+    monkeypatch.setitem(app.extensions['flask-rest-jsonapi'], 'cache_backend', cache_backend)
+    dl = MemoryDataLayer(dict(objects=[MemoryObject(person_id=1, name='Ada', birth_date=None)], id_field='person_id',
+                              url_field='person_id'))
+    dl.resource = type('PersonMemory', (object,), dict(schema=person_schema))
+
+    with app.app_context():
+        generations = [cache_backend.get_generations(['person'])]
+        obj = dl.create_object({'name': 'Bob'}, dict())
+        generations.append(cache_backend.get_generations(['person']))
+        dl.update_object(obj, {'name': 'Bea'}, dict())
+        generations.append(cache_backend.get_generations(['person']))
+        dl.delete_object(obj, dict())
+        generations.append(cache_backend.get_generations(['person']))
+        assert len(set(map(tuple, generations))) == 4
+
+        dl.begin_operations()
+        dl.update_object(dl.get_object({'person_id': 1}), {'name': 'Eve'}, dict())
+        assert cache_backend.get_generations(['person']) == generations[-1]
+        dl.commit_operations()
+        assert cache_backend.get_generations(['person']) != generations[-1]
+
+        generations = cache_backend.get_generations(['person', ALL_TYPES])
+        invalidate_resource(type('PersonDynamic', (object,), dict(schema=staticmethod(lambda *args: person_schema))))
+        assert cache_backend.get_generations(['person', ALL_TYPES]) == [generations[0], generations[1] + 1]
+
+
+def test_reader_sessions(app, engine, session, person_model, monkeypatch):
+    readers = [sessionmaker(bind=engine)(), sessionmaker(bind=engine)()]
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, reader_sessions=readers,
+                                  read_your_writes=10))
+
+    assert dl.session is session
+    with app.test_request_context('/persons', method='GET'):
+        assert dl.session is readers[0] and dl.session is readers[0]
+    with app.test_request_context('/persons', method='HEAD'):
+        assert dl.session is readers[1]
+    with app.test_request_context('/persons', method='PATCH'):
+        assert dl.session is session
+        dl.commit()
+        response = app.process_response(app.response_class())
+        assert READ_YOUR_WRITES_COOKIE in response.headers['Set-Cookie']
+    with app.test_request_context('/persons', method='GET', headers={'Cookie': response.headers['Set-Cookie']}):
+        assert dl.session is session
+    with app.test_request_context('/persons', method='GET', headers={'Cookie': READ_YOUR_WRITES_COOKIE + '=1.0'}):
+        assert dl.session is not session
+
+    dl.reader_selection = 'least_loaded'
+    monkeypatch.setattr(SqlalchemyDataLayer, 'get_session_load', staticmethod(lambda s: 0 if s is readers[1] else 1))
+    with app.test_request_context('/persons', method='GET'):
+        assert dl.session is readers[1]
+
+
+def test_response_cache(app, client, register_routes, person, person_detail, monkeypatch):
+    monkeypatch.setitem(app.extensions['flask-rest-jsonapi'], 'cache_backend', MemoryCacheBackend())
+    monkeypatch.setattr(person_detail, 'cache_ttl', 60)
+    monkeypatch.setattr(person_detail, 'etag', 'strong')
+    url = '/persons/' + str(person.person_id)
+
+    with client:
+        response = client.get(url, content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        with query_budget(0):
+            cached = client.get(url, content_type='application/vnd.api+json')
+        assert cached.status_code == 200 and cached.data == response.data
+        assert cached.headers['Content-Type'] == 'application/vnd.api+json'
+        assert cached.headers['ETag'] == response.headers['ETag']
+
+        with pytest.raises(QueryBudgetExceeded):
+            with query_budget(0):
+                client.get(url, content_type='application/vnd.api+json', headers={'Authorization': 'Bearer token'})
+
+        client.patch(url,
+                     data=json.dumps({'data': {'type': 'person', 'id': str(person.person_id),
+                                               'attributes': {'name': 'cached'}}}),
+                     content_type='application/vnd.api+json')
+        response = client.get(url, content_type='application/vnd.api+json')
+        assert json.loads(response.get_data())['data']['attributes']['name'] == 'cached'
+
+        monkeypatch.setattr(person_detail, 'cache_vary', ('Authorization', 'Accept-Language'))
+        client.get(url, content_type='application/vnd.api+json', headers={'Accept-Language': 'en'})
+        with query_budget(0):
+            client.get(url, content_type='application/vnd.api+json', headers={'Accept-Language': 'en'})
+        with pytest.raises(QueryBudgetExceeded):
+            with query_budget(0):
+                client.get(url, content_type='application/vnd.api+json', headers={'Accept-Language': 'fr'})
+
+        response = client.get(url + '?include=foo', content_type='application/vnd.api+json')
+        assert response.status_code == 400
+
+        def check_permissions(get):
+            def wrapper(*args, **kwargs):
+                if request.headers.get('X-Denied'):
+                    raise AccessDenied('Access denied')
+                return get(*args, **kwargs)
+            return wrapper
+
+        monkeypatch.setattr(person_detail, 'get', check_permissions(person_detail.get))
+        response = client.get(url, content_type='application/vnd.api+json', headers={'X-Denied': '1'})
+        assert response.status_code == 403
+
+    schema = person_detail.schema
+    monkeypatch.setattr(person_detail, 'schema', staticmethod(lambda *args: schema))
+    with app.test_request_context(url, method='GET'):
+        with pytest.raises(Exception) as excinfo:
+            person_detail().get_cache_key(tuple(), {'person_id': person.person_id})
+        assert 'cache_ttl' in str(excinfo.value)
+
+
+def test_update_object_attributes(app, session, person_model, person, person_schema, monkeypatch):
+    dl = SqlalchemyDataLayer(dict(session=session, model=person_model, fast_update=True, url_field='person_id'))
+    dl.resource = type('PersonFast', (object,), dict(schema=person_schema))
+    view_kwargs = {'person_id': person.person_id}
+
+    with app.test_request_context('/persons/{}'.format(person.person_id), method='PATCH'):
+        with query_budget(2):
+            obj = dl.update_object_attributes({'name': 'fast'}, view_kwargs)
+        assert obj is person and obj.name == 'fast'
+        assert session.query(person_model.name).filter_by(person_id=person.person_id).scalar() == 'fast'
+
+        assert dl.update_object_attributes({'computers': []}, view_kwargs) is None
+        with pytest.raises(ObjectNotFound):
+            dl.update_object_attributes({'name': 'fast'}, {'person_id': person.person_id + 100})
+
+        monkeypatch.setattr(session.get_bind().dialect, 'implicit_returning', True, raising=False)
+        monkeypatch.setattr(session.get_bind().dialect, 'update_returning', True, raising=False)
+        with query_budget(2):
+            obj = dl.update_object_attributes({'name': 'compiled'}, view_kwargs)
+        assert obj is person and obj.name == 'compiled'
+        monkeypatch.undo()
+
+        dl.before_update_object = lambda *args: None
+        assert dl.update_object_attributes({'name': 'slow'}, view_kwargs) is None
+
+
+def test_delete_list(app, client, register_routes, session, computer_model, person_model, computer_list,
+                     monkeypatch):
+    session.add_all([computer_model(serial='bulk 1'), computer_model(serial='bulk 2'), computer_model(serial='keep')])
+    session.commit()
+    url = '/computers?' + urlencode({'filter': json.dumps([{'name': 'serial', 'op': 'like', 'val': 'bulk%'}])})
+
+    with client:
+        response = client.delete(url, content_type='application/vnd.api+json')
+        assert response.status_code == 405
+
+        monkeypatch.setattr(computer_list, 'allow_bulk_delete', True, raising=False)
+        monkeypatch.setattr(computer_list._data_layer, 'query', lambda view_kwargs: session.query(computer_model))
+        response = client.delete('/computers', content_type='application/vnd.api+json')
+        assert response.status_code == 400
+
+        with query_budget(1):
+            response = client.delete(url, content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        assert json.loads(response.get_data())['meta']['count'] == 2
+
+    assert session.query(computer_model.serial).filter(computer_model.serial.in_(['bulk 1', 'bulk 2', 'keep']))\
+        .all() == [('keep',)]
+
+    dl = SqlalchemyDataLayer(dict(session=session, model=computer_model, fast_delete=True))
+    keep_id = session.query(computer_model.id).filter_by(serial='keep').scalar()
+    with app.test_request_context('/computers/{}'.format(keep_id), method='DELETE'):
+        assert SqlalchemyDataLayer(dict(session=session, model=person_model, fast_delete=True))\
+            .delete_object_directly({'id': 1}) is False
+        with query_budget(1):
+            assert dl.delete_object_directly({'id': keep_id}) is True
+        with pytest.raises(ObjectNotFound):
+            dl.delete_object_directly({'id': keep_id})
+    assert session.query(computer_model).filter_by(serial='keep').count() == 0
+
+
+def test_patch_list(client, register_routes, session, person_model, person, person_2, person_list, monkeypatch):
+    def payload(*items):
+        return json.dumps({'data': [dict(type='person', id=str(id_), attributes=attributes)
+                                    for (id_, attributes) in items]})
+    person_id, person_2_id = person.person_id, person_2.person_id
+
+    with client:
+        response = client.patch('/persons', data=payload((person_id, {'name': 'bulk'})),
+                                content_type='application/vnd.api+json')
+        assert response.status_code == 405
+
+        monkeypatch.setattr(person_list, 'allow_bulk_update', True, raising=False)
+        with query_budget(2):
+            response = client.patch('/persons',
+                                    data=payload((person_id, {'name': 'bulk 1'}),
+                                                 (person_2_id, {'name': 'bulk 2'})),
+                                    content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        assert json.loads(response.get_data())['meta']['count'] == 2
+        assert session.query(person_model.name).filter(person_model.person_id.in_([person_id,
+                                                                                    person_2_id]))\
+            .order_by(person_model.person_id).all() == [('bulk 1',), ('bulk 2',)]
+
+        response = client.patch('/persons',
+                                data=payload((person_id, {'name': 'bulk'}),
+                                             (person_2_id, {'birth_date': 'never'})),
+                                content_type='application/vnd.api+json')
+        assert response.status_code == 422
+        assert json.loads(response.get_data())['errors'][0]['source']['pointer'] == '/data/1/attributes/birth_date'
+
+        response = client.patch('/persons',
+                                data=payload((person_id, {'name': 'bulk'}), (person_2_id + 100, {})),
+                                content_type='application/vnd.api+json')
+        assert response.status_code == 404
+        assert json.loads(response.get_data())['errors'][0]['source']['pointer'] == '/data/1/id'
+
+        response = client.patch('/persons',
+                                data=json.dumps({'data': [{'type': 'person', 'id': str(person_id),
+                                                           'attributes': {'name': 'bulk 1'},
+                                                           'relationships': {'computers': {'data': []}}}]}),
+                                content_type='application/vnd.api+json')
+        assert response.status_code == 200
+
+        response = client.patch('/persons', data=json.dumps({'data': {'type': 'person', 'attributes': {}}}),
+                                content_type='application/vnd.api+json')
+        assert response.status_code == 400
+
+        url = '/persons?' + urlencode({'filter': json.dumps([{'name': 'name', 'op': 'like', 'val': 'bulk%'}])})
+        with query_budget(1):
+            response = client.patch(url, data=json.dumps({'data': {'type': 'person', 'attributes': {'name': 'done'}}}),
+                                    content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        assert json.loads(response.get_data())['meta']['count'] == 2
+        assert session.query(person_model).filter_by(name='done').count() == 2
+
+        response = client.patch(url, data=json.dumps({'data': {'type': 'person', 'id': str(person_id),
+                                                               'attributes': {'name': 'done'}}}),
+                                content_type='application/vnd.api+json')
+        assert response.status_code == 400
+        assert json.loads(response.get_data())['errors'][0]['source']['pointer'] == '/data/id'
+
+    qs = QSManager({'filter': json.dumps([{'name': 'name', 'op': 'eq', 'val': 'done'}])})
+    assert person_list._data_layer.update_collection(qs, {'person_id': 0, 'name': 'kept'}, dict()) == 2
+    assert session.query(person_model.person_id).filter_by(name='kept').order_by(person_model.person_id).all() ==\
+        [(person_id,), (person_2_id,)]
+
+
+def test_get_relationship_linkage(session, client, register_routes, computer, person):
+    person.computers = [computer]
+    session.commit()
+    person_id, computer_id = person.person_id, computer.id
+    session.expire_all()
+
+    with client:
+        with query_budget(2) as counter:
+            response = client.get('/persons/{}/relationships/computers'.format(person_id),
+                                  content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        assert json.loads(response.get_data())['data'] == [{'type': 'computer', 'id': computer_id}]
+        assert not any('serial' in shape for shape in counter.shapes)
+
+        with query_budget(1) as counter:
+            response = client.get('/computers/{}/relationships/owner'.format(computer_id),
+                                  content_type='application/vnd.api+json')
+        assert response.status_code == 200
+        assert json.loads(response.get_data())['data'] == {'type': 'person', 'id': person_id}
+        assert not any('FROM person' in shape for shape in counter.shapes)